@@ -27,6 +27,19 @@ class Settings:
             "SQLITE_DB_PATH", "data/werbisci-app.db"
         )
 
+        # In-process cache of address list/search responses
+        self.address_cache_max_entries: int = int(
+            os.environ.get("ADDRESS_CACHE_MAX_ENTRIES", "512")
+        )
+        self.address_cache_ttl_seconds: float = float(
+            os.environ.get("ADDRESS_CACHE_TTL_SECONDS", "300")
+        )
+
+        # Worker processes for ODT letter archives (0 = one per CPU)
+        self.address_import_workers: int = int(
+            os.environ.get("ADDRESS_IMPORT_WORKERS", "0")
+        )
+
         # CORS
         cors_env: str = os.environ.get(
             "CORS_ORIGINS",
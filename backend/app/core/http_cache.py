@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import hashlib
+from typing import Dict
+
+from fastapi import Request, Response, status
+
+
+# Query parameters that do not influence the response body
+_IGNORED_PARAMS = {"token"}
+
+
+def etag_headers(version: int, request: Request) -> Dict[str, str]:
+    """ETag (data version + query params) and revalidation headers.
+
+    Read the version before querying so the tag never claims newer data
+    than the body it is sent with.
+    """
+    params = sorted(
+        (key, value)
+        for key, value in request.query_params.multi_items()
+        if key not in _IGNORED_PARAMS
+    )
+    digest = hashlib.blake2b(
+        repr((request.url.path, params)).encode("utf-8"), digest_size=8
+    ).hexdigest()
+    return {
+        "ETag": f'"{version:x}-{digest}"',
+        # Let the browser keep the body but always revalidate it
+        "Cache-Control": "private, no-cache",
+    }
+
+
+def not_modified(
+    request: Request, headers: Dict[str, str]
+) -> Response | None:
+    """304 response when If-None-Match already names our ETag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    # If-None-Match uses weak comparison (RFC 9110 13.1.2)
+    candidates = {
+        tag.strip().removeprefix("W/") for tag in header.split(",")
+    }
+    if "*" in candidates or headers["ETag"] in candidates:
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers=headers
+        )
+    return None
+
+
+__all__ = ["etag_headers", "not_modified"]
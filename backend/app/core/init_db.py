@@ -9,6 +9,7 @@ from app.modules.users.models import User, UserRole
 from app.modules.users.repositories import UserRepository
 from app.core.security import hash_password
 from app.modules.addresses.models import Address
+from app.modules.addresses.search_index import ensure_search_index
 from app.modules.login_sessions.models import LoginSession
 
 
@@ -72,6 +73,9 @@ def main() -> None:
     try:
         _seed_admin(db)
         _seed_addresses(db)
+        # After seeding, so the sample rows get their folded search and
+        # identity columns
+        ensure_search_index(engine)
         # Print brief summary
         users_count = db.scalar(select(func.count()).select_from(User))
         addresses_count = db.scalar(select(func.count()).select_from(Address))
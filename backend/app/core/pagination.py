@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Generic, List, Sequence, TypeVar
+
+from sqlalchemy import Select, and_, or_, tuple_
+
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class Cursor:
+    """Position after the last row of a page: its sort value and id."""
+
+    sort_field: str
+    sort_direction: str
+    value: Any
+    last_id: int
+
+
+@dataclass
+class Page(Generic[T]):
+    items: List[T]
+    next_cursor: str | None
+
+
+def encode_cursor(cursor: Cursor) -> str:
+    value = cursor.value
+    kind = None
+    if isinstance(value, datetime):
+        value, kind = value.isoformat(), "datetime"
+    payload = [
+        cursor.sort_field, cursor.sort_direction, value, cursor.last_id, kind
+    ]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> Cursor:
+    """Parse an opaque cursor; raises ValueError when it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        sort_field, sort_direction, value, last_id, kind = json.loads(raw)
+        if kind == "datetime":
+            value = datetime.fromisoformat(value)
+        return Cursor(
+            sort_field=str(sort_field),
+            sort_direction=str(sort_direction),
+            value=value,
+            last_id=int(last_id),
+        )
+    except Exception as exc:  # noqa: BLE001
+        raise ValueError("Invalid cursor") from exc
+
+
+def keyset_predicate(
+    sort_column: Any, id_column: Any, cursor: Cursor, *, nullable: bool
+) -> Any:
+    """Rows strictly after ``cursor`` in ORDER BY (sort_column, id).
+
+    Uses a row-value comparison so SQLite can seek in the sort column's
+    index (which implicitly ends with the rowid). SQLite sorts NULLs
+    first, which nullable columns have to account for explicitly.
+    """
+    descending = cursor.sort_direction == "desc"
+    if cursor.value is None:
+        same_null = and_(
+            sort_column.is_(None),
+            id_column < cursor.last_id if descending
+            else id_column > cursor.last_id,
+        )
+        if descending:
+            return same_null
+        return or_(same_null, sort_column.is_not(None))
+
+    if descending:
+        after = tuple_(sort_column, id_column) < (cursor.value, cursor.last_id)
+        return or_(after, sort_column.is_(None)) if nullable else after
+    return tuple_(sort_column, id_column) > (cursor.value, cursor.last_id)
+
+
+def apply_keyset(
+    stmt: Select,
+    *,
+    sort_field: str,
+    sort_column: Any,
+    id_column: Any,
+    sort_direction: str,
+    limit: int,
+    offset: int = 0,
+    after: Cursor | None = None,
+    nullable: bool = False,
+) -> Select:
+    """Order ``stmt`` by (sort_column, id) and page it.
+
+    With ``after`` the page starts right behind the cursor (keyset seek),
+    otherwise ``offset`` is used as before.
+    """
+    sort_direction = "desc" if sort_direction.lower() == "desc" else "asc"
+    if after is not None:
+        if (after.sort_field, after.sort_direction) != (
+            sort_field, sort_direction
+        ):
+            raise ValueError("Cursor does not match the requested sort order")
+        stmt = stmt.where(
+            keyset_predicate(sort_column, id_column, after, nullable=nullable)
+        )
+    if sort_direction == "desc":
+        stmt = stmt.order_by(sort_column.desc(), id_column.desc())
+    else:
+        stmt = stmt.order_by(sort_column.asc(), id_column.asc())
+    stmt = stmt.limit(limit)
+    if after is None and offset:
+        stmt = stmt.offset(offset)
+    return stmt
+
+
+def build_page(
+    rows: Sequence[Any],
+    *,
+    limit: int,
+    sort_field: str,
+    sort_direction: str,
+) -> Page:
+    """Turn (item, sort_value) rows into a page with its next cursor."""
+    items = [row[0] for row in rows]
+    next_cursor = None
+    if rows and len(rows) >= limit:
+        last_item, last_value = rows[-1][0], rows[-1][1]
+        next_cursor = encode_cursor(Cursor(
+            sort_field=sort_field,
+            sort_direction=(
+                "desc" if sort_direction.lower() == "desc" else "asc"
+            ),
+            value=last_value,
+            last_id=last_item.id,
+        ))
+    return Page(items=items, next_cursor=next_cursor)
+
+
+__all__ = [
+    "Cursor",
+    "Page",
+    "apply_keyset",
+    "build_page",
+    "decode_cursor",
+    "encode_cursor",
+    "keyset_predicate",
+]
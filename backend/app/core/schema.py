@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from typing import List
+
+from sqlalchemy import Table, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateColumn
+
+
+def add_missing_columns(conn: Connection, table: Table) -> List[str]:
+    """Bring an existing SQLite table up to its model definition.
+
+    ``Base.metadata.create_all`` never alters existing tables, so columns
+    added to a model later are appended here with ALTER TABLE, and any
+    missing indexes are created. Returns the names of added columns.
+    """
+    existing = {
+        row[1]
+        for row in conn.execute(text(f"PRAGMA table_info({table.name})"))
+    }
+    added: List[str] = []
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        ddl = CreateColumn(column).compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+        added.append(column.name)
+    for index in table.indexes:
+        index.create(conn, checkfirst=True)
+    return added
@@ -11,6 +11,7 @@ from app.modules.users.services import UserService
 from app.api.auth import router as auth_router
 from app.modules.users.api import router as users_router
 from app.modules.addresses.api import router as addresses_router
+from app.modules.addresses.search_index import ensure_search_index
 from app.modules.login_sessions.api import router as login_sessions_router
 from app.modules.printing.api import router as printing_router
 
@@ -74,6 +75,10 @@ def startup_event() -> None:
     # Create all tables if they don't exist
     print("Initializing database tables...")
     Base.metadata.create_all(bind=engine)
+
+    # Full-text index for address search (FTS5 table + sync triggers)
+    print("Ensuring address search index...")
+    ensure_search_index(engine)
     
     # Bootstrap admin user if missing
     db: Session = SessionLocal()
@@ -1,47 +1,148 @@
 from __future__ import annotations
 
-from typing import List
+from collections import Counter
+from typing import Iterator, List, Sequence, Union
 from io import StringIO, BytesIO
 import csv
+import os
+import zipfile
 
 import logging
 
 from fastapi import (
-    APIRouter, Depends, HTTPException, Query, Response, status, UploadFile,
-    File,
+    APIRouter, Depends, HTTPException, Query, Request, Response, status,
+    UploadFile, File,
 )
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
 
+from app.core.config import get_settings
+from app.core.db import SessionLocal
 from app.core.deps import (
-    get_db, require_user, require_manager_qh, require_admin
+    get_db, require_user, require_manager, require_manager_qh,
+    require_admin,
+)
+from app.core.http_cache import etag_headers, not_modified
+from app.core.pagination import Cursor, decode_cursor
+from .cache import address_data_version
+from .fuzzy import fuzzy_index
+from .importing import (
+    REQUIRED_COLUMNS, ImportResult, SheetSource, import_odt_archive,
+    import_rows, open_csv, open_ods,
 )
 from .models import Address
-from .repositories import AddressRepository
-from .schemas import AddressCreate, AddressRead, AddressUpdate
+from .odt_extraction import archive_members
+from .ods_writer import MIMETYPE as ODS_MIMETYPE, iter_ods
+from .repositories import READ_FIELDS, AddressRepository
+from .duplicates import DEFAULT_MIN_SCORE
+from .schemas import (
+    AddressCreate, AddressPage, AddressRead, AddressSuggestion,
+    AddressUpdate, BulkRequest, DuplicateMergeRequest, DuplicateReport,
+    LabelMarkRequest,
+)
+from .search_index import ensure_search_index
 from .services import AddressService
+from .suggest import suggest_index
 
 logger = logging.getLogger("addresses.import")
 router = APIRouter(prefix="/api/addresses", tags=["addresses"])
 
 
-@router.get("", response_model=List[AddressRead])
+def _decode_cursor_param(cursor: str | None) -> Cursor | None:
+    # "?cursor=" (empty) requests the first page in cursor mode
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+def _parse_fields_param(fields: str | None) -> List[str]:
+    """``fields=id,last_name,city`` -> column names; 400 on unknown."""
+    if fields is None or not fields.strip():
+        return READ_FIELDS
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in READ_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                f"Unknown field(s): {', '.join(unknown)}; "
+                f"allowed: {', '.join(READ_FIELDS)}"
+            ),
+        )
+    return list(dict.fromkeys(names))
+
+
+def _json_response(body: bytes, headers: dict) -> Response:
+    # Bodies are pre-serialized from column tuples (AddressRow), so the
+    # response_model above only documents the shape
+    return Response(
+        content=body, media_type="application/json", headers=headers
+    )
+
+
+@router.get("", response_model=Union[List[AddressRead], AddressPage])
 def list_addresses(
+    request: Request,
     db: Session = Depends(get_db),
     _: object = Depends(require_user),
     limit: int = Query(default=50, ge=1, le=500),
     offset: int = Query(default=0, ge=0),
     sort_field: str = Query(default="id"),
     sort_direction: str = Query(default="asc"),
-) -> List[Address]:
+    cursor: str | None = Query(default=None),
+    with_total: bool = Query(default=False),
+    fields: str | None = Query(
+        default=None,
+        description="Comma-separated subset of address fields to return",
+    ),
+    layout: str = Query(
+        default="rows",
+        alias="format",
+        pattern="^(rows|columns)$",
+        description="columns: field names once, then one array per field",
+    ),
+) -> Response:
+    columns = _parse_fields_param(fields)
+    cache_headers = etag_headers(address_data_version.value, request)
+    cached = not_modified(request, cache_headers)
+    if cached is not None:
+        return cached
+
     repo = AddressRepository()
-    return repo.list(
-        db,
-        limit=limit,
-        offset=offset,
-        sort_field=sort_field,
-        sort_direction=sort_direction
+    if cursor is None and not with_total:
+        body = AddressService(repo).list_json(
+            db,
+            limit=limit,
+            offset=offset,
+            sort_field=sort_field,
+            sort_direction=sort_direction,
+            columns=columns,
+            layout=layout,
+        )
+        return _json_response(body, cache_headers)
+    try:
+        page = repo.list_page(
+            db,
+            limit=limit,
+            offset=offset,
+            sort_field=sort_field,
+            sort_direction=sort_direction,
+            after=_decode_cursor_param(cursor),
+            columns=columns,
+            raw=layout == "columns",
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    stats = AddressService(repo).search_stats(db) if with_total else None
+    body = AddressService.page_json(
+        page, stats, columns if layout == "columns" else None
     )
+    return _json_response(body, cache_headers)
 
 
 @router.post(
@@ -71,27 +172,315 @@ def create_address(
     return address
 
 
-@router.get("/search", response_model=List[AddressRead])
+@router.post("/label-marked", response_model=dict)
+def set_addresses_label_marked(
+    payload: LabelMarkRequest,
+    db: Session = Depends(get_db),
+    _: object = Depends(require_user),
+) -> dict:
+    """Mark or unmark many addresses at once.
+
+    Targets ``ids``, every address matching ``filter`` (same fields as
+    /search) or, with ``all: true``, the whole table. Runs as a single
+    UPDATE and returns how many rows changed.
+    """
+    targets = [
+        payload.ids is not None, payload.filter is not None, payload.all
+    ]
+    if sum(targets) != 1:
+        raise HTTPException(
+            status_code=400,
+            detail="Provide exactly one of ids, filter or all",
+        )
+    updated = AddressService().set_label_marked(
+        db,
+        payload.label_marked,
+        ids=payload.ids,
+        search_filter=(
+            payload.filter.model_dump(exclude={"limit", "offset"})
+            if payload.filter else None
+        ),
+        match_all=payload.all,
+    )
+    return {"updated": updated, "label_marked": payload.label_marked}
+
+
+@router.get("/search", response_model=Union[List[AddressRead], AddressPage])
 def search_addresses(
+    request: Request,
     db: Session = Depends(get_db),
     _: object = Depends(require_user),
     q: str | None = Query(default=None),
     label_marked: bool | None = Query(default=None),
+    first_name: str | None = Query(default=None),
+    last_name: str | None = Query(default=None),
+    city: str | None = Query(default=None),
+    street: str | None = Query(default=None),
     limit: int = Query(default=50, ge=1, le=500),
     offset: int = Query(default=0, ge=0),
     sort_field: str = Query(default="id"),
     sort_direction: str = Query(default="asc"),
-) -> List[Address]:
+    cursor: str | None = Query(default=None),
+    with_total: bool = Query(default=False),
+    fuzzy: bool = Query(default=False),
+    fields_param: str | None = Query(
+        default=None,
+        alias="fields",
+        description="Comma-separated subset of address fields to return",
+    ),
+    layout: str = Query(
+        default="rows",
+        alias="format",
+        pattern="^(rows|columns)$",
+        description="columns: field names once, then one array per field",
+    ),
+) -> Response:
+    """Search addresses.
+
+    ``q`` accepts free text plus ``field:value`` terms (first, last,
+    street, city, postal), ``value*`` prefixes, "quoted phrases" and
+    ``-negation``, e.g. ``city:Lublin postal:20-* last:Kow*``.
+    ``fields=id,last_name,city`` returns only those keys and
+    ``format=columns`` returns them column-wise.
+    """
+    columns = _parse_fields_param(fields_param)
+    fields = {
+        "first_name": first_name,
+        "last_name": last_name,
+        "city": city,
+        "street": street,
+    }
+    cache_headers = etag_headers(address_data_version.value, request)
+    cached = not_modified(request, cache_headers)
+    if cached is not None:
+        return cached
+
     service = AddressService()
-    return service.search(
+    if fuzzy and q:
+        # Ranked by similarity, so sort_field and cursors do not apply
+        if cursor is not None or with_total:
+            raise HTTPException(
+                status_code=400,
+                detail="fuzzy search supports only limit/offset paging",
+            )
+        # Nor do the per-field filters; reject them rather than return
+        # rows they would have excluded
+        filtered = [
+            name for name, value in fields.items()
+            if value and value.strip()
+        ]
+        if filtered or (sort_field, sort_direction) != ("id", "asc"):
+            raise HTTPException(
+                status_code=400,
+                detail=(
+                    "fuzzy search takes only q and label_marked filters "
+                    "and is ordered by similarity"
+                ),
+            )
+        found = service.fuzzy_search(
+            db,
+            q=q,
+            label_marked=label_marked,
+            limit=limit,
+            offset=offset,
+            columns=columns,
+        )
+        if layout == "columns":
+            data = {name: [row[name] for row in found] for name in columns}
+            body = AddressService.columns_json(columns, data)
+        else:
+            body = AddressService.rows_json(found)
+        return _json_response(body, cache_headers)
+    if cursor is None and not with_total:
+        body = service.search_json(
+            db,
+            q=q,
+            label_marked=label_marked,
+            fields=fields,
+            limit=limit,
+            offset=offset,
+            sort_field=sort_field,
+            sort_direction=sort_direction,
+            columns=columns,
+            layout=layout,
+        )
+        return _json_response(body, cache_headers)
+    try:
+        page = service.search_page(
+            db,
+            q=q,
+            label_marked=label_marked,
+            fields=fields,
+            limit=limit,
+            offset=offset,
+            sort_field=sort_field,
+            sort_direction=sort_direction,
+            after=_decode_cursor_param(cursor),
+            columns=columns,
+            raw=layout == "columns",
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    stats = (
+        service.search_stats(
+            db, q=q, label_marked=label_marked, fields=fields
+        )
+        if with_total else None
+    )
+    body = AddressService.page_json(
+        page, stats, columns if layout == "columns" else None
+    )
+    return _json_response(body, cache_headers)
+
+
+@router.get("/bulk", response_class=Response)
+def bulk_read_addresses(
+    request: Request,
+    db: Session = Depends(get_db),
+    _: object = Depends(require_user),
+    ids: str | None = Query(
+        default=None, description="Comma-separated address ids"
+    ),
+    label_marked: bool | None = Query(default=None),
+    fields: str | None = Query(default=None),
+    layout: str = Query(
+        default="columns", alias="format", pattern="^(rows|columns)$"
+    ),
+) -> Response:
+    """Every matching address in one response, ordered by id.
+
+    Meant for full-table pulls; the default ``format=columns`` returns
+    ``{"columns": [...], "data": {"id": [...], ...}}``.
+    """
+    columns = _parse_fields_param(fields)
+    id_list = None
+    if ids is not None:
+        try:
+            id_list = [int(v) for v in ids.split(",") if v.strip()]
+        except ValueError:
+            raise HTTPException(
+                status_code=400, detail="ids must be comma-separated integers"
+            )
+    cache_headers = etag_headers(address_data_version.value, request)
+    cached = not_modified(request, cache_headers)
+    if cached is not None:
+        return cached
+    body = AddressService().bulk_json(
         db,
-        q=q,
+        columns=columns,
+        ids=id_list,
         label_marked=label_marked,
-        limit=limit,
-        offset=offset,
-        sort_field=sort_field,
-        sort_direction=sort_direction,
+        layout=layout,
     )
+    return _json_response(body, cache_headers)
+
+
+@router.post("/bulk", response_model=dict)
+def bulk_modify_addresses(
+    payload: BulkRequest,
+    db: Session = Depends(get_db),
+    _: object = Depends(require_user),
+) -> dict:
+    """Update and/or delete many addresses in one transaction.
+
+    Returns a status per operation (updated, deleted, not_found, error,
+    or skipped when an atomic batch was cancelled).
+    """
+    operations = [
+        {
+            "op": item.op,
+            "id": item.id,
+            "changes": (
+                item.changes.model_dump(exclude_none=True)
+                if item.changes else None
+            ),
+        }
+        for item in payload.operations
+    ]
+    try:
+        return AddressService().bulk(
+            db, operations, atomic=payload.mode == "atomic"
+        )
+    except SQLAlchemyError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Bulk operation failed, nothing was changed: {exc}",
+        )
+
+
+@router.get("/suggest", response_model=List[AddressSuggestion])
+def suggest_address_values(
+    db: Session = Depends(get_db),
+    _: object = Depends(require_user),
+    field: str = Query(pattern="^(city|street|postal_code|last_name)$"),
+    prefix: str = Query(default=""),
+    limit: int = Query(default=10, ge=1, le=50),
+) -> List[dict]:
+    """Most frequent existing values of ``field`` starting with ``prefix``.
+
+    Served from an in-memory index (diacritic-insensitive prefix match).
+    """
+    service = AddressService()
+    return service.suggest(db, field=field, prefix=prefix, limit=limit)
+
+
+@router.get("/duplicates", response_model=DuplicateReport)
+def list_duplicates(
+    db: Session = Depends(get_db),
+    _: object = Depends(require_manager),
+    min_score: float = Query(default=DEFAULT_MIN_SCORE, ge=0.5, le=1.0),
+    limit: int = Query(default=100, ge=1, le=1000),
+) -> dict:
+    """Groups of likely duplicate addresses.
+
+    Rows are only compared within blocks sharing the postal code and a
+    folded surname (or first name, for swapped fields), so the scan stays
+    far below quadratic; results are cached until the next write.
+    """
+    return AddressService().duplicates(db, min_score=min_score, limit=limit)
+
+
+@router.post("/duplicates/merge", response_model=dict)
+def merge_duplicates(
+    payload: DuplicateMergeRequest,
+    db: Session = Depends(get_db),
+    _: object = Depends(require_manager),
+) -> dict:
+    """Collapse a duplicate cluster into ``keep_id`` in one transaction."""
+    repo = AddressRepository()
+    ids = [payload.keep_id, *payload.merge_ids]
+    missing = sorted(set(ids) - repo.existing_ids(db, ids))
+    if missing:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Address(es) not found: {', '.join(map(str, missing))}",
+        )
+    if not set(payload.merge_ids) - {payload.keep_id}:
+        raise HTTPException(
+            status_code=400, detail="merge_ids must name other addresses"
+        )
+    try:
+        deleted = AddressService(repo).merge_duplicates(
+            db, payload.keep_id, payload.merge_ids
+        )
+    except SQLAlchemyError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Merge failed, nothing was changed: {exc}",
+        )
+    kept = repo.get_by_id(db, payload.keep_id)
+    return {
+        "kept": AddressRead.model_validate(kept).model_dump(),
+        "deleted_ids": deleted,
+    }
+
+
+@router.get("/cache-stats", response_model=dict)
+def address_cache_stats(
+    _: object = Depends(require_admin),
+) -> dict:
+    """Hit/miss counters of the list/search response cache."""
+    return AddressService().cache_stats()
 
 
 @router.patch("/{address_id}", response_model=AddressRead)
@@ -134,6 +523,9 @@ def clear_addresses_data(
         # Delete all records from addresses table
         db.execute(text("DELETE FROM addresses"))
         db.commit()
+        address_data_version.bump()
+        fuzzy_index.invalidate()
+        suggest_index.invalidate()
 
         return {
             "message": "All addresses data has been cleared successfully",
@@ -157,111 +549,109 @@ def delete_address(
     db: Session = Depends(get_db),
     _: object = Depends(require_user),
 ) -> Response:
-    repo = AddressRepository()
-    repo.delete(db, address_id)
+    service = AddressService()
+    service.delete(db, address_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
-def _addresses_as_rows(addresses: List[Address]) -> list[list[str]]:
-    rows: list[list[str]] = []
-    for a in addresses:
-        rows.append([
-            str(a.id),
-            a.first_name,
-            a.last_name,
-            a.street,
-            a.apartment_no or "",
-            a.city,
-            a.postal_code,
-            a.description or "",
-            "1" if a.label_marked else "0",
-        ])
-    return rows
-
-
-@router.get("/export.csv", response_class=Response)
+# Rows fetched from the cursor (and encoded) per streamed chunk
+EXPORT_BATCH_SIZE = 1000
+
+
+def _export_row(row: Sequence) -> list[str]:
+    # READ_FIELDS tuple -> CSV/ODS cells; NULLs empty, label_marked 1/0
+    *values, label_marked = row
+    return [
+        "" if value is None else str(value) for value in values
+    ] + ["1" if label_marked else "0"]
+
+
+def _csv_export_chunks() -> Iterator[bytes]:
+    # The request's session is closed once the endpoint returns, before
+    # the body is sent, so the stream opens its own
+    db = SessionLocal()
+    try:
+        buf = StringIO(newline="")
+        writer = csv.writer(buf)
+        writer.writerow(READ_FIELDS)
+        # BOM (for Excel) on the first chunk only
+        yield buf.getvalue().encode("utf-8-sig")
+        batches = AddressRepository().iter_export_batches(
+            db, EXPORT_BATCH_SIZE
+        )
+        for batch in batches:
+            buf.seek(0)
+            buf.truncate()
+            writer.writerows(_export_row(row) for row in batch)
+            yield buf.getvalue().encode("utf-8")
+    finally:
+        db.close()
+
+
+@router.get("/export.csv", response_class=StreamingResponse)
 def export_addresses_csv(
-    db: Session = Depends(get_db),
+    request: Request,
     _: object = Depends(require_manager_qh),
 ) -> Response:
-    repo = AddressRepository()
-    items = repo.list_all(db)
-
-    headers = [
-        "id",
-        "first_name",
-        "last_name",
-        "street",
-        "apartment_no",
-        "city",
-        "postal_code",
-        "description",
-        "label_marked",
-    ]
-    buf = StringIO(newline="")
-    writer = csv.writer(buf)
-    writer.writerow(headers)
-    writer.writerows(_addresses_as_rows(items))
-    # Include BOM for Excel compatibility
-    content = buf.getvalue().encode("utf-8-sig")
-    return Response(
-        content=content,
+    cache_headers = etag_headers(address_data_version.value, request)
+    cached = not_modified(request, cache_headers)
+    if cached is not None:
+        return cached
+    return StreamingResponse(
+        _csv_export_chunks(),
         media_type="text/csv; charset=utf-8",
         headers={
             "Content-Disposition": "attachment; filename=addresses.csv",
+            **cache_headers,
         },
     )
 
 
-@router.get("/export.ods", response_class=Response)
-def export_addresses_ods(
-    db: Session = Depends(get_db),
-    _: object = Depends(require_manager_qh),
-) -> Response:
-    from collections import OrderedDict
+def _ods_export_chunks() -> Iterator[bytes]:
+    # Own session for the same reason as _csv_export_chunks
+    db = SessionLocal()
     try:
-        from pyexcel_ods3 import save_data  # type: ignore
-    except Exception as exc:  # pragma: no cover
-        raise HTTPException(
-            status_code=500,
-            detail="ODS export not available",
-        ) from exc
-
-    repo = AddressRepository()
-    items = repo.list_all(db)
+        batches = AddressRepository().iter_export_batches(
+            db, EXPORT_BATCH_SIZE
+        )
+        yield from iter_ods(
+            READ_FIELDS,
+            ([_export_row(row) for row in batch] for batch in batches),
+            sheet_name="Addresses",
+        )
+    finally:
+        db.close()
 
-    headers_row = [
-        "id",
-        "first_name",
-        "last_name",
-        "street",
-        "apartment_no",
-        "city",
-        "postal_code",
-        "description",
-        "label_marked",
-    ]
-    rows = _addresses_as_rows(items)
 
-    data = OrderedDict()
-    data.update({"Addresses": [headers_row, *rows]})
-    out = BytesIO()
-    save_data(out, data)
-    content = out.getvalue()
-    return Response(
-        content=content,
-        media_type="application/vnd.oasis.opendocument.spreadsheet",
+@router.get("/export.ods", response_class=StreamingResponse)
+def export_addresses_ods(
+    request: Request,
+    _: object = Depends(require_manager_qh),
+) -> Response:
+    cache_headers = etag_headers(address_data_version.value, request)
+    cached = not_modified(request, cache_headers)
+    if cached is not None:
+        return cached
+    return StreamingResponse(
+        _ods_export_chunks(),
+        media_type=ODS_MIMETYPE,
         headers={
             "Content-Disposition": "attachment; filename=addresses.ods",
+            **cache_headers,
         },
     )
 
 
 @router.get("/export.pdf", response_class=Response)
 def export_addresses_pdf(
+    request: Request,
     db: Session = Depends(get_db),
     _: object = Depends(require_manager_qh),
 ) -> Response:
+    cache_headers = etag_headers(address_data_version.value, request)
+    cached = not_modified(request, cache_headers)
+    if cached is not None:
+        return cached
     # Simple tabular PDF using reportlab canvas
     from reportlab.lib.pagesizes import A4  # type: ignore
     from reportlab.pdfgen import canvas  # type: ignore
@@ -327,198 +717,278 @@ def export_addresses_pdf(
         media_type="application/pdf",
         headers={
             "Content-Disposition": "attachment; filename=addresses.pdf",
+            **cache_headers,
         },
     )
 
 
+def _import_error_report(result: ImportResult) -> dict:
+    # One header, then [line, column, code] per rejected row
+    return {
+        "columns": ["line", "column", "code"],
+        "rows": [[e.line, e.column, e.code] for e in result.errors],
+    }
+
+
+def _import_errors_csv(result: ImportResult) -> Response:
+    buf = StringIO(newline="")
+    writer = csv.writer(buf)
+    writer.writerow(["line", "column", "code", "message"])
+    for error in result.errors:
+        writer.writerow([error.line, error.column, error.code, error.args[0]])
+    return Response(
+        content=buf.getvalue().encode("utf-8-sig"),
+        media_type="text/csv; charset=utf-8",
+        headers={
+            "Content-Disposition": "attachment; filename=import_errors.csv",
+            "X-Import-Valid-Rows": str(result.valid_rows),
+            "X-Import-Error-Count": str(len(result.errors)),
+        },
+    )
+
+
+def _run_import(
+    db: Session,
+    source: SheetSource,
+    *,
+    kind: str,
+    filename: str,
+    dry_run: bool,
+    report: str,
+    mode: str,
+) -> dict | Response:
+    # Shared by the CSV and ODS uploads once the header row is read
+    delimiter = getattr(source, "delimiter", None)
+    normalized_headers = source.headers
+
+    logger.info(
+        "IMPORT %s start file=%s delim=%s",  # noqa: G004
+        kind,
+        filename,
+        delimiter,
+    )
+    logger.info("RAW HEADER: %s", source.raw_headers)  # noqa: G004
+
+    missing = [
+        h for h in REQUIRED_COLUMNS if h not in normalized_headers
+    ]
+    logger.info(
+        "NORMALIZED HEADER: %s (missing=%s)",  # noqa: G004
+        normalized_headers,
+        missing,
+    )
+    if missing:
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                "Missing required columns: "
+                + ', '.join(sorted(missing))
+            )
+        )
+
+    logger.info(
+        "BEGIN ROW PARSE has_description=%s",  # noqa: G004
+        'description' in normalized_headers,
+    )
+
+    # Rows go from the upload through the decoder and parser straight
+    # into the batch inserter
+    result = import_rows(db, source.rows, dry_run=dry_run, mode=mode)
+    if report == "csv":
+        return _import_errors_csv(result)
+    errors = [str(error) for error in result.errors]
+
+    logger.info(
+        "IMPORT FINISHED mode=%s inserted=%s updated=%s unchanged=%s "
+        "skipped=%s errors=%s rows/s=%.0f",  # noqa: G004
+        result.mode,
+        result.inserted,
+        result.updated,
+        result.unchanged,
+        len(result.skipped),
+        len(errors),
+        result.rows_per_second,
+    )
+    return {
+        'imported_count': result.imported,
+        'mode': result.mode,
+        'inserted_count': result.inserted,
+        'updated_count': result.updated,
+        'unchanged_count': result.unchanged,
+        # Merge lines replaced by a later line for the same address
+        'skipped_count': len(result.skipped),
+        'skipped_lines': result.skipped[:10],
+        'total_rows': result.total_rows,
+        'errors': errors[:10],
+        'has_more_errors': len(errors) > 10,
+        **({'used_delimiter': delimiter} if delimiter else {}),
+        'has_description_column': 'description' in normalized_headers,
+        'description_columns_used': (
+            ['description'] if 'description' in normalized_headers else []
+        ),
+        'elapsed_seconds': round(result.elapsed_seconds, 3),
+        'rows_per_second': round(result.rows_per_second, 1),
+        'dry_run': dry_run,
+        'valid_rows': result.valid_rows,
+        'error_count': len(errors),
+        **({'error_report': _import_error_report(result)}
+           if dry_run else {}),
+    }
+
+
 @router.post("/import.csv", response_model=dict)
 def import_addresses_csv(
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     _: object = Depends(require_manager_qh),
-) -> dict:
+    dry_run: bool = Query(default=False),
+    report: str = Query(default="json", pattern="^(json|csv)$"),
+    mode: str = Query(default="insert", pattern="^(insert|merge)$"),
+) -> dict | Response:
     """Import addresses from CSV file (simple deterministic path).
 
         Wymagane kolumny:
             first_name,last_name,street,apartment_no,city,postal_code,label_marked
         Opcjonalna kolumna: description (aliasy: opis, uwagi, uwaga,
             notatka, notatki, notes)
-    Kolumna id – ignorowana.
+    Kolumna id – ignorowana, chyba że ``mode=merge``.
+
+    ``mode=merge`` matches rows to existing addresses by id, otherwise by
+    folded name + street + apartment + postal code; unchanged rows are
+    left alone, changed ones updated (label_marked of existing rows is
+    kept) and the rest inserted. A line for the same address as a later
+    line of its batch is skipped (``skipped_lines``).
+
+    ``dry_run=true`` validates every row without writing and returns the
+    complete error report (line, column, code); ``report=csv`` returns
+    that report as a CSV download instead.
     """
     if not file.filename or not file.filename.lower().endswith('.csv'):
         raise HTTPException(status_code=400, detail="File must be a CSV file")
 
     try:
-        content_raw = file.file.read().decode('utf-8-sig')
-        if not content_raw.strip():
-            raise HTTPException(status_code=400, detail="CSV file is empty")
-
-        # delimiter detection
-        head = content_raw[:2048]
-        delimiter = ','
         try:
-            delimiter = csv.Sniffer().sniff(head, delimiters=',;').delimiter
-        except Exception:
-            if (
-                head.splitlines()
-                and head.splitlines()[0].count(';')
-                > head.splitlines()[0].count(',')
-            ):
-                delimiter = ';'
-
-        # Prepare DictReader with normalized header mapping
-        alias_map = {
-            'opis': 'description',
-            'uwagi': 'description',
-            'uwaga': 'description',
-            'notatka': 'description',
-            'notatki': 'description',
-            'notes': 'description',
-        }
+            source = open_csv(file.file)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        return _run_import(
+            db, source, kind="CSV", filename=file.filename,
+            dry_run=dry_run, report=report, mode=mode,
+        )
+    except HTTPException:
+        raise
+    except Exception as exc:  # noqa: BLE001
+        raise HTTPException(
+            status_code=400,
+            detail=f"Error processing CSV file: {exc}"
+        )
 
-        # Manually parse first line to normalize headers, then rebuild CSV
-        sio_all = StringIO(content_raw)
-        raw_reader = csv.reader(sio_all, delimiter=delimiter)
-        try:
-            raw_headers = next(raw_reader)
-        except StopIteration:
-            raise HTTPException(
-                status_code=400, detail="CSV has no header row"
-            )
 
-        logger.info(
-            "IMPORT CSV start file=%s delim=%s",  # noqa: G004
-            file.filename,
-            delimiter,
-        )
-        logger.info("RAW HEADER: %s", raw_headers)  # noqa: G004
+@router.post("/import.ods", response_model=dict)
+def import_addresses_ods(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    _: object = Depends(require_manager_qh),
+    dry_run: bool = Query(default=False),
+    report: str = Query(default="json", pattern="^(json|csv)$"),
+    mode: str = Query(default="insert", pattern="^(insert|merge)$"),
+) -> dict | Response:
+    """Import addresses from the first sheet of an ODS spreadsheet.
 
-        normalized_headers = []
-        for h in raw_headers:
-            norm = h.strip().lower()
-            norm = alias_map.get(norm, norm)
-            normalized_headers.append(norm)
+    Same columns, header aliases, validation and options as import.csv;
+    a file saved from export.ods can be imported back unchanged.
+    """
+    if not file.filename or not file.filename.lower().endswith('.ods'):
+        raise HTTPException(status_code=400, detail="File must be an ODS file")
 
-        required = {
-            'first_name', 'last_name', 'street', 'apartment_no', 'city',
-            'postal_code', 'label_marked'
-        }
-        missing = [h for h in required if h not in normalized_headers]
-        logger.info(
-            "NORMALIZED HEADER: %s (missing=%s)",  # noqa: G004
-            normalized_headers,
-            missing,
+    try:
+        try:
+            source = open_ods(file.file)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        return _run_import(
+            db, source, kind="ODS", filename=file.filename,
+            dry_run=dry_run, report=report, mode=mode,
         )
-        if missing:
-            raise HTTPException(
-                status_code=400,
-                detail=(
-                    "Missing required columns: "
-                    + ', '.join(sorted(missing))
-                )
-            )
+    except HTTPException:
+        raise
+    except Exception as exc:  # noqa: BLE001
+        raise HTTPException(
+            status_code=400,
+            detail=f"Error processing ODS file: {exc}"
+        )
+
+
+@router.post("/import.odt-archive", response_model=dict)
+def import_addresses_odt_archive(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    _: object = Depends(require_manager_qh),
+    dry_run: bool = Query(default=False),
+    mode: str = Query(default="insert", pattern="^(insert|merge)$"),
+) -> dict:
+    """Import the addresses of ODT letters uploaded as one ZIP archive.
 
-    # Reconstruct CSV with normalized headers so DictReader keys are std
-        rebuilt = StringIO()
-        writer = csv.writer(rebuilt, delimiter=delimiter)
-        writer.writerow(normalized_headers)
-        for row in raw_reader:
-            writer.writerow(row)
-        rebuilt.seek(0)
-
-        reader = csv.DictReader(rebuilt, delimiter=delimiter)
-        logger.info(
-            "BEGIN ROW PARSE has_description=%s",  # noqa: G004
-            'description' in normalized_headers,
+    Each letter goes through the support script's heuristics (address
+    block after "Sz. P.", name and street/number split) in a worker pool;
+    the addresses go through the same validation and batched insert as
+    import.csv. ``files`` reports the outcome per letter.
+    """
+    if not file.filename or not file.filename.lower().endswith('.zip'):
+        raise HTTPException(status_code=400, detail="File must be a ZIP file")
+    try:
+        archive = zipfile.ZipFile(file.file)
+    except zipfile.BadZipFile:
+        raise HTTPException(
+            status_code=400, detail="File is not a ZIP archive"
+        )
+    names = archive_members(archive)
+    if not names:
+        raise HTTPException(
+            status_code=400, detail="Archive contains no .odt files"
         )
 
-        service = AddressService()
-        imported = 0
-        errors: list[str] = []
-        for line_no, row in enumerate(reader, start=2):  # start=2 (1=header)
-            try:
-                if not any((v or '').strip() for v in row.values()):
-                    continue
-                first_name = (row.get('first_name') or '').strip()
-                last_name = (row.get('last_name') or '').strip()
-                street = (row.get('street') or '').strip()
-                apartment_no = (row.get('apartment_no') or '').strip() or None
-                city = (row.get('city') or '').strip()
-                postal_code = (row.get('postal_code') or '').strip()
-                description = (row.get('description') or '').strip() or None
-                if description:
-                    description = description[:500]
-                label_marked_raw = (
-                    (row.get('label_marked') or '').strip().lower()
-                )
-                label_marked = label_marked_raw in {
-                    '1', 'true', 'yes', 'tak', 'y', 't'
-                }
-
-                # validations
-                if not first_name:
-                    raise ValueError('first_name is required')
-                if not last_name:
-                    raise ValueError('last_name is required')
-                if not street:
-                    raise ValueError('street is required')
-                if not city:
-                    raise ValueError('city is required')
-                if not postal_code:
-                    raise ValueError('postal_code is required')
-
-                address = service.create(
-                    db,
-                    first_name=first_name,
-                    last_name=last_name,
-                    street=street,
-                    apartment_no=apartment_no,
-                    city=city,
-                    postal_code=postal_code,
-                    description=description,
-                )
-                if label_marked:
-                    # don't touch description
-                    service.update(
-                        db,
-                        address,
-                        label_marked=True,
-                        description=...,  # sentinel keep
-                    )
-                imported += 1
-            except Exception as exc:  # noqa: BLE001
-                logger.warning(
-                    "IMPORT ROW ERROR line=%s err=%s row=%s",  # noqa: G004
-                    line_no,
-                    exc,
-                    row,
-                )
-                errors.append(f"Row {line_no}: {exc}")
-                continue
-
-        logger.info(
-            "IMPORT FINISHED imported=%s errors=%s",  # noqa: G004
-            imported,
-            len(errors),
+    workers = get_settings().address_import_workers or os.cpu_count() or 1
+    logger.info(
+        "IMPORT ODT archive=%s files=%s workers=%s",  # noqa: G004
+        file.filename,
+        len(names),
+        workers,
+    )
+    try:
+        result, outcomes = import_odt_archive(
+            db, archive, names,
+            workers=min(workers, len(names)), dry_run=dry_run, mode=mode,
         )
-        return {
-            'imported_count': imported,
-            'total_rows': line_no - 1 if 'line_no' in locals() else 0,
-            'errors': errors[:10],
-            'has_more_errors': len(errors) > 10,
-            'used_delimiter': delimiter,
-            'has_description_column': 'description' in normalized_headers,
-            'description_columns_used': (
-                ['description'] if 'description' in normalized_headers else []
-            ),
-        }
-    except HTTPException:
-        raise
     except Exception as exc:  # noqa: BLE001
         raise HTTPException(
             status_code=400,
-            detail=f"Error processing CSV file: {exc}"
+            detail=f"Error processing ODT archive: {exc}"
         )
+    counts = Counter(outcome["status"] for outcome in outcomes)
+    logger.info(
+        "IMPORT FINISHED mode=%s inserted=%s updated=%s unchanged=%s "
+        "outcomes=%s rows/s=%.0f",  # noqa: G004
+        result.mode,
+        result.inserted,
+        result.updated,
+        result.unchanged,
+        dict(counts),
+        result.rows_per_second,
+    )
+    return {
+        'imported_count': result.imported,
+        'mode': result.mode,
+        'inserted_count': result.inserted,
+        'updated_count': result.updated,
+        'unchanged_count': result.unchanged,
+        'skipped_count': len(result.skipped),
+        'total_files': len(names),
+        'outcome_counts': dict(counts),
+        'elapsed_seconds': round(result.elapsed_seconds, 3),
+        'dry_run': dry_run,
+        'files': outcomes,
+    }
 
 
 @router.post("/recreate-schema", status_code=status.HTTP_200_OK)
@@ -536,6 +1006,11 @@ def recreate_addresses_schema(
         # Recreate the table using SQLAlchemy metadata
         from app.core.db import Base
         Base.metadata.create_all(bind=db.bind, tables=[Address.__table__])
+        # Dropping the table also dropped the FTS sync triggers
+        ensure_search_index(db.bind)
+        address_data_version.bump()
+        fuzzy_index.invalidate()
+        suggest_index.invalidate()
 
         return {
             "message": "Addresses table has been recreated successfully",
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Tuple
+
+
+class DataVersion:
+    """Monotonic per-process version of the addresses table.
+
+    Every write path bumps it after committing, so anything derived from
+    the table (cached counts, ETags, in-memory indexes) can tell whether
+    it is stale by comparing versions. Seeded from the clock so values
+    keep increasing across restarts.
+    """
+
+    def __init__(self) -> None:
+        self._value = time.time_ns() // 1000
+        self._lock = threading.Lock()
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+    def bump(self) -> int:
+        with self._lock:
+            self._value += 1
+            return self._value
+
+
+address_data_version = DataVersion()
+
+
+class VersionedCache:
+    """Small bounded cache that empties itself when the data version moves."""
+
+    def __init__(self, version: DataVersion, max_entries: int = 256) -> None:
+        self._version = version
+        self._max_entries = max_entries
+        self._seen_version = version.value
+        self._entries: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+
+    def _sync(self) -> None:
+        if self._seen_version != self._version.value:
+            self._entries.clear()
+            self._seen_version = self._version.value
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            self._sync()
+            return self._entries.get(key)
+
+    def set(self, key: Hashable, value: Any, version: int) -> None:
+        """Store ``value`` computed while the data was at ``version``."""
+        with self._lock:
+            self._sync()
+            if version != self._seen_version:
+                # A write landed while the value was being computed
+                return
+            if len(self._entries) >= self._max_entries:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = value
+
+
+class ResultCache:
+    """LRU cache of serialized responses, bounded by size and age.
+
+    Entries are dropped as a whole when the data version moves, so any
+    write through the addresses module invalidates them; the TTL only
+    bounds how long an unused entry lingers. Hit/miss counters show
+    whether the cache pays off.
+    """
+
+    def __init__(
+        self,
+        version: DataVersion,
+        *,
+        max_entries: int = 512,
+        ttl_seconds: float = 300.0,
+    ) -> None:
+        self._version = version
+        self._max_entries = max_entries
+        self._ttl = ttl_seconds
+        self._seen_version = version.value
+        self._entries: OrderedDict[Hashable, Tuple[float, bytes]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _sync(self) -> None:
+        if self._seen_version != self._version.value:
+            self._entries.clear()
+            self._seen_version = self._version.value
+
+    def get(self, key: Hashable) -> bytes | None:
+        with self._lock:
+            self._sync()
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: bytes, version: int) -> None:
+        """Store ``value`` computed while the data was at ``version``."""
+        with self._lock:
+            self._sync()
+            if version != self._seen_version or self._max_entries <= 0:
+                return
+            self._entries[key] = (time.monotonic() + self._ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._sync()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": sum(len(v) for _, v in self._entries.values()),
+                "max_entries": self._max_entries,
+                "ttl_seconds": self._ttl,
+            }
+
+
+__all__ = [
+    "DataVersion",
+    "ResultCache",
+    "VersionedCache",
+    "address_data_version",
+]
@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import re
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+from itertools import combinations
+from typing import Dict, Iterator, List, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .folding import fold_text
+from .models import Address
+
+
+# Pairs scoring at least this much are linked into one cluster
+DEFAULT_MIN_SCORE = 0.85
+# Blocks up to this size are compared pair by pair; larger ones (a very
+# common name in a big postal district) only within a sliding window
+# over rows sorted by street, which keeps the work linear in the block
+MAX_BLOCK_SIZE = 200
+WINDOW_SIZE = 20
+
+# Weights of the per-field similarities in a pair score
+NAME_WEIGHT = 0.5
+STREET_WEIGHT = 0.25
+NUMBER_WEIGHT = 0.15
+APARTMENT_WEIGHT = 0.1
+
+_STREET_PREFIX_RE = re.compile(
+    r"^(?:ul|ulica|al|aleja|aleje|os|osiedle|pl|plac)\b\s*"
+)
+# "lipowa 10/5", "lipowa 10 m 5", "lipowa 10 lok 5", "lipowa 10a"
+_HOUSE_NUMBER_RE = re.compile(
+    r"\s(\d+\s?[a-z]?)(?:\s*(?:/|\bm\b|\bmieszk\b|\blok\b)\s*"
+    r"(\d+\s?[a-z]?))?$"
+)
+_APARTMENT_PREFIX_RE = re.compile(r"^(?:m|mieszk|lok|lokal)\b\s*")
+_PUNCTUATION_RE = re.compile(r"[^\w/]+")
+
+
+@dataclass(frozen=True)
+class AddressKey:
+    """Comparable parts of one address, folded and split."""
+
+    id: int
+    names: Tuple[str, ...]
+    street: str
+    number: str
+    apartment: str
+    postal_code: str
+
+
+@dataclass
+class DuplicateScan:
+    clusters: List[Tuple[List[int], float]] = field(default_factory=list)
+    rows_scanned: int = 0
+    pairs_compared: int = 0
+    elapsed_seconds: float = 0.0
+
+
+def _clean(value: str | None) -> str:
+    text = _PUNCTUATION_RE.sub(" ", fold_text(value) or "")
+    return " ".join(text.split())
+
+
+def split_street(street: str | None) -> Tuple[str, str, str]:
+    """'ul. Lipowa 10 m. 5' -> ('lipowa', '10', '5')."""
+    text = _STREET_PREFIX_RE.sub("", _clean(street))
+    match = _HOUSE_NUMBER_RE.search(text)
+    if match is None:
+        return text, "", ""
+    number = match.group(1).replace(" ", "")
+    apartment = (match.group(2) or "").replace(" ", "")
+    return text[:match.start()].strip(), number, apartment
+
+
+def address_key(
+    row_id: int,
+    first_name: str | None,
+    last_name: str | None,
+    street: str | None,
+    apartment_no: str | None,
+    postal_code: str | None,
+) -> AddressKey:
+    street_name, number, apartment = split_street(street)
+    extra = _APARTMENT_PREFIX_RE.sub("", _clean(apartment_no))
+    return AddressKey(
+        id=row_id,
+        names=tuple(sorted(filter(None, (
+            _clean(first_name), _clean(last_name)
+        )))),
+        street=street_name,
+        number=number,
+        apartment=(extra or apartment).replace(" ", ""),
+        postal_code=(postal_code or "").replace(" ", "").upper(),
+    )
+
+
+def _ratio(a: str, b: str, floor: float = 0.0) -> float:
+    """SequenceMatcher ratio, or 0.0 once it provably falls below
+    ``floor`` (the cheap upper bounds are checked first)."""
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    matcher = SequenceMatcher(None, a, b)
+    if matcher.real_quick_ratio() < floor or matcher.quick_ratio() < floor:
+        return 0.0
+    return matcher.ratio()
+
+
+def _name_similarity(
+    a: Tuple[str, ...], b: Tuple[str, ...], floor: float = 0.0
+) -> float:
+    if len(a) != len(b):
+        return _ratio(" ".join(a), " ".join(b), floor)
+    # The weakest name part counts, so "Jan Kowalski" and "Janina
+    # Kowalska" (one family, one address) stay apart
+    weakest = 1.0
+    for x, y in zip(a, b):
+        weakest = min(weakest, _ratio(x, y, floor))
+        if weakest < floor:
+            return 0.0
+    return weakest
+
+
+def pair_score(
+    a: AddressKey, b: AddressKey, min_score: float = 0.0
+) -> float:
+    """Similarity in [0, 1]; first/last name order does not matter.
+
+    Cheap parts are scored first: once ``min_score`` is out of reach the
+    remaining string comparisons are skipped and 0.0 is returned.
+    """
+    number = 1.0 if a.number == b.number else 0.0
+    if not number:
+        # Apartments of different buildings are not comparable
+        apartment = 0.0
+    elif a.apartment == b.apartment:
+        apartment = 1.0
+    elif not a.apartment or not b.apartment:
+        # Apartment given on one copy only
+        apartment = 0.5
+    else:
+        apartment = 0.0
+    score = NUMBER_WEIGHT * number + APARTMENT_WEIGHT * apartment
+    needed = (min_score - score - STREET_WEIGHT) / NAME_WEIGHT
+    if needed > 1.0:
+        return 0.0
+    score += NAME_WEIGHT * _name_similarity(a.names, b.names, needed)
+    needed = (min_score - score) / STREET_WEIGHT
+    if needed > 1.0:
+        return 0.0
+    return score + STREET_WEIGHT * _ratio(a.street, b.street, needed)
+
+
+def _blocks(keys: List[AddressKey]) -> Dict[tuple, List[AddressKey]]:
+    # Blocked on postal code plus the rarer of the two names, which is
+    # the surname nearly always; picking by frequency instead of by field
+    # puts rows with swapped first/last names in the same block. A second
+    # pass over each building catches misspelt surnames.
+    frequency = Counter(name for key in keys for name in set(key.names))
+    blocks: Dict[tuple, List[AddressKey]] = defaultdict(list)
+    for key in keys:
+        name = min(key.names, key=lambda n: (frequency[n], n), default="")
+        blocks[("name", key.postal_code, name)].append(key)
+        if key.number:
+            building = ("building", key.postal_code, key.street, key.number)
+            blocks[building].append(key)
+    return blocks
+
+
+def _candidate_pairs(
+    block: List[AddressKey],
+) -> Iterator[Tuple[AddressKey, AddressKey]]:
+    if len(block) <= MAX_BLOCK_SIZE:
+        yield from combinations(block, 2)
+        return
+    ordered = sorted(block, key=lambda k: (k.street, k.number, k.id))
+    for i, key in enumerate(ordered):
+        for other in ordered[i + 1:i + WINDOW_SIZE]:
+            yield key, other
+
+
+class _UnionFind:
+    def __init__(self) -> None:
+        self._parent: Dict[int, int] = {}
+
+    def find(self, item: int) -> int:
+        parent = self._parent.setdefault(item, item)
+        if parent != item:
+            parent = self._parent[item] = self.find(parent)
+        return parent
+
+    def union(self, a: int, b: int) -> None:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self._parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    def groups(self) -> Dict[int, List[int]]:
+        groups: Dict[int, List[int]] = defaultdict(list)
+        for item in self._parent:
+            groups[self.find(item)].append(item)
+        return groups
+
+
+def cluster_keys(
+    keys: List[AddressKey], min_score: float = DEFAULT_MIN_SCORE
+) -> DuplicateScan:
+    """Link pairs scoring >= ``min_score`` and return the clusters.
+
+    Each cluster is (sorted ids, weakest link score); largest first.
+    """
+    scan = DuplicateScan(rows_scanned=len(keys))
+    compared: set[Tuple[int, int]] = set()
+    links = _UnionFind()
+    weakest: Dict[int, float] = {}
+    for block in _blocks(keys).values():
+        for a, b in _candidate_pairs(block):
+            pair = (a.id, b.id) if a.id < b.id else (b.id, a.id)
+            if pair in compared:
+                continue
+            compared.add(pair)
+            score = pair_score(a, b, min_score)
+            if score < min_score:
+                continue
+            links.union(*pair)
+            for row_id in pair:
+                weakest[row_id] = min(weakest.get(row_id, 1.0), score)
+    scan.pairs_compared = len(compared)
+    for ids in links.groups().values():
+        ids.sort()
+        scan.clusters.append(
+            (ids, round(min(weakest[i] for i in ids), 3))
+        )
+    scan.clusters.sort(key=lambda c: (-len(c[0]), c[0][0]))
+    return scan
+
+
+def find_duplicates(
+    db: Session, min_score: float = DEFAULT_MIN_SCORE
+) -> DuplicateScan:
+    """Scan the whole table for clusters of likely duplicates."""
+    started = time.perf_counter()
+    rows = db.execute(select(
+        Address.id, Address.first_name, Address.last_name, Address.street,
+        Address.apartment_no, Address.postal_code,
+    ))
+    scan = cluster_keys([address_key(*row) for row in rows], min_score)
+    scan.elapsed_seconds = time.perf_counter() - started
+    return scan
+
+
+__all__ = [
+    "DEFAULT_MIN_SCORE",
+    "AddressKey",
+    "DuplicateScan",
+    "address_key",
+    "cluster_keys",
+    "find_duplicates",
+    "pair_score",
+    "split_street",
+]
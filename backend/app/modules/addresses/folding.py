@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import unicodedata
+from typing import Mapping
+
+from sqlalchemy import bindparam, or_, select, update
+from sqlalchemy.engine import Connection
+
+from .models import Address
+
+
+# Source column -> shadow column holding its case/diacritic-folded form
+FOLDED_COLUMNS = {
+    "first_name": "first_name_folded",
+    "last_name": "last_name_folded",
+    "street": "street_folded",
+    "city": "city_folded",
+    "description": "description_folded",
+}
+
+# Letters that carry no combining mark in Unicode and so survive NFKD
+_EXTRA_FOLDS = str.maketrans({"ł": "l", "Ł": "l", "đ": "d", "Đ": "d"})
+
+# Upper bound for prefix ranges: sorts after any folded string continuation
+_PREFIX_END = "\U0010ffff"
+
+
+def fold_text(value: str | None) -> str | None:
+    """Lower-case and strip diacritics: 'ŁÓDŹ' -> 'lodz'."""
+    if value is None:
+        return None
+    decomposed = unicodedata.normalize("NFKD", value.translate(_EXTRA_FOLDS))
+    stripped = "".join(
+        ch for ch in decomposed if not unicodedata.combining(ch)
+    )
+    return stripped.casefold()
+
+
+def folded_values(values: Mapping[str, str | None]) -> dict[str, str | None]:
+    """Shadow column values for the foldable fields present in ``values``."""
+    return {
+        FOLDED_COLUMNS[name]: fold_text(value)
+        for name, value in values.items()
+        if name in FOLDED_COLUMNS
+    }
+
+
+def prefix_range(column, prefix: str):
+    """Index-friendly ``column LIKE 'prefix%'`` for folded columns."""
+    return (column >= prefix) & (column < prefix + _PREFIX_END)
+
+
+def backfill_folded_columns(conn: Connection) -> int:
+    """Fill shadow columns for rows written before they existed."""
+    folded_cols = [getattr(Address, c) for c in FOLDED_COLUMNS.values()]
+    source_cols = [getattr(Address, c) for c in FOLDED_COLUMNS]
+    rows = conn.execute(
+        select(Address.id, *source_cols).where(
+            # description_folded is legitimately NULL with no description
+            or_(*(col.is_(None) for col in folded_cols[:-1]))
+        )
+    ).all()
+    if not rows:
+        return 0
+    params = []
+    for row in rows:
+        values = folded_values(dict(zip(FOLDED_COLUMNS, row[1:])))
+        values["_id"] = row[0]
+        params.append(values)
+    conn.execute(
+        update(Address.__table__)
+        .where(Address.__table__.c.id == bindparam("_id"))
+        .values({c: bindparam(c) for c in FOLDED_COLUMNS.values()}),
+        params,
+    )
+    return len(params)
+
+
+__all__ = [
+    "FOLDED_COLUMNS",
+    "backfill_folded_columns",
+    "fold_text",
+    "folded_values",
+    "prefix_range",
+]
@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import heapq
+import math
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .folding import fold_text
+from .models import Address
+
+
+# Fields whose words are indexed for typo-tolerant search
+FUZZY_FIELDS = ["first_name", "last_name", "street", "city"]
+# Minimum trigram similarity (Jaccard) for a word to count as a match;
+# same default as PostgreSQL pg_trgm
+SIMILARITY_THRESHOLD = 0.3
+
+_WORD_RE = re.compile(r"[^\W\d_]{2,}")
+
+
+def _words(text: str | None) -> Set[str]:
+    return set(_WORD_RE.findall(fold_text(text) or ""))
+
+
+def _trigrams(word: str) -> Set[str]:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _push_best(
+    best: List[Tuple[float, int]], item: Tuple[float, int],
+    limit: int | None,
+) -> None:
+    # ``best`` is a min-heap holding the ``limit`` best items seen
+    if limit is None or len(best) < limit:
+        heapq.heappush(best, item)
+    elif item > best[0]:
+        heapq.heapreplace(best, item)
+
+
+class TrigramIndex:
+    """In-memory trigram index over the words of each address.
+
+    Trigrams point at distinct *words* rather than rows, so a lookup
+    scores a vocabulary that is far smaller than the table and only then
+    fans out to the rows containing the matched words. A query scores
+    each row by the average, over query words, of the best similarity
+    reached by any of the row's words. With a ``limit`` only the rows
+    that can still reach the top are fanned out to.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._built = False
+        self._word_trigrams: Dict[str, Set[str]] = {}
+        self._trigram_words: Dict[str, Set[str]] = defaultdict(set)
+        self._word_rows: Dict[str, Set[int]] = defaultdict(set)
+        self._row_words: Dict[int, Set[str]] = {}
+
+    @property
+    def built(self) -> bool:
+        return self._built
+
+    def build(self, db: Session) -> None:
+        cols = [getattr(Address, f) for f in FUZZY_FIELDS]
+        # Load under the lock so concurrent upserts wait for the snapshot
+        with self._lock:
+            rows = db.execute(select(Address.id, *cols)).all()
+            self._clear()
+            for row in rows:
+                self._add(row[0], row[1:])
+            self._built = True
+
+    def invalidate(self) -> None:
+        """Forget everything; the next search rebuilds from the table."""
+        with self._lock:
+            self._clear()
+            self._built = False
+
+    def upsert(self, address: Address) -> None:
+        with self._lock:
+            if not self._built:
+                return
+            self._remove(address.id)
+            self._add(
+                address.id, [getattr(address, f) for f in FUZZY_FIELDS]
+            )
+
+    def remove(self, address_id: int) -> None:
+        with self._lock:
+            if self._built:
+                self._remove(address_id)
+
+    def search(
+        self,
+        db: Session,
+        q: str,
+        *,
+        threshold: float = SIMILARITY_THRESHOLD,
+        limit: int | None = None,
+    ) -> List[Tuple[int, float]]:
+        """(address id, score) pairs, best first; the top ``limit`` only
+        when given, which lets common words skip their fan-out."""
+        query_words = sorted(_words(q))
+        if not query_words:
+            return []
+        with self._lock:
+            if not self._built:
+                self.build(db)
+            similar = [
+                dict(self._similar_words(word, threshold))
+                for word in query_words
+            ]
+            if len(similar) == 1:
+                return self._rank_single(similar[0], limit)
+            return self._rank_many(similar, threshold, limit)
+
+    def _rank_single(
+        self, similar: Dict[str, float], limit: int | None
+    ) -> List[Tuple[int, float]]:
+        # A row scores the similarity of its best matching word
+        best: List[Tuple[float, int]] = []
+        self._rank_best_word(similar, 1, 0.0, limit, set(), best)
+        best.sort(reverse=True)
+        return [(-neg_id, score) for score, neg_id in best]
+
+    def _rank_best_word(
+        self,
+        similar: Dict[str, float],
+        n: int,
+        threshold: float,
+        limit: int | None,
+        seen: Set[int],
+        best: List[Tuple[float, int]],
+    ) -> None:
+        """Push rows outside ``seen`` scored by their best word alone.
+
+        Words are taken best first, so a row's first match is its score
+        and, once ``best`` is full, only the smallest ids of a word group
+        can still get in.
+        """
+        by_sim: Dict[float, List[str]] = defaultdict(list)
+        for word, sim in similar.items():
+            by_sim[sim].append(word)
+        for sim in sorted(by_sim, reverse=True):
+            score = sim / n
+            if score < threshold:
+                break
+            if limit is not None and len(best) >= limit and (
+                score < best[0][0]
+            ):
+                break
+            words = by_sim[sim]
+            if len(words) == 1 and not seen:
+                rows = self._word_rows[words[0]]
+            else:
+                rows = set().union(*(self._word_rows[w] for w in words))
+                rows -= seen
+            for row_id in (
+                rows if limit is None else heapq.nsmallest(limit, rows)
+            ):
+                _push_best(best, (score, -row_id), limit)
+            if limit is not None and len(best) >= limit:
+                # Later groups score lower and cannot get in
+                break
+            seen |= rows
+
+    def _rank_many(
+        self,
+        similar: List[Dict[str, float]],
+        threshold: float,
+        limit: int | None,
+    ) -> List[Tuple[int, float]]:
+        # Query words are expanded to their rows rarest first and every
+        # row reached is scored exactly from its own words. A row first
+        # reached by a later word has no match among the earlier ones,
+        # and once the best ``limit`` scores beat what the words left
+        # could add up to, common words like a city name are never
+        # expanded at all.
+        n = len(similar)
+        fanout = [
+            sum(len(self._word_rows[word]) for word in words)
+            for words in similar
+        ]
+        order = sorted(range(n), key=fanout.__getitem__)
+        top_sim = [max(words.values(), default=0.0) for words in similar]
+        seen: Set[int] = set()
+        best: List[Tuple[float, int]] = []  # min-heap of (score, -id)
+        for pos, i in enumerate(order):
+            # Best score a row matching only words from here on can reach
+            bound = sum(top_sim[j] for j in order[pos:]) / n
+            if bound < threshold:
+                break
+            if limit is not None and len(best) >= limit and (
+                best[0][0] > bound
+            ):
+                break
+            if pos == n - 1:
+                self._rank_best_word(
+                    similar[i], n, threshold, limit, seen, best
+                )
+                break
+            rows: Set[int] = set()
+            for word in similar[i]:
+                rows |= self._word_rows[word]
+            rows -= seen
+            seen |= rows
+            scores = dict.fromkeys(rows, 0.0)
+            for j in order[pos:]:
+                for row_id, sim in self._best_sims(similar[j], rows).items():
+                    scores[row_id] += sim
+            for row_id, total in scores.items():
+                score = total / n
+                if score >= threshold:
+                    _push_best(best, (score, -row_id), limit)
+        best.sort(reverse=True)
+        return [(-neg_id, score) for score, neg_id in best]
+
+    def _best_sims(
+        self, similar: Dict[str, float], rows: Set[int]
+    ) -> Dict[int, float]:
+        # Best similarity each of ``rows`` reaches among ``similar``;
+        # intersecting whole row sets keeps the per-row work in C
+        found: Dict[int, float] = {}
+        for word, sim in sorted(similar.items(), key=lambda ws: -ws[1]):
+            for row_id in rows & self._word_rows[word]:
+                found.setdefault(row_id, sim)
+        return found
+
+    def _similar_words(
+        self, word: str, threshold: float
+    ) -> Iterable[Tuple[str, float]]:
+        grams = _trigrams(word)
+        # Similarity >= threshold needs at least ``need`` shared trigrams,
+        # so every match holds one of the len - need + 1 rarest ones and
+        # the long lists of common trigrams ("ski", "ki ") are not read
+        need = max(1, math.ceil(threshold * len(grams) - 1e-9))
+        postings = sorted(
+            (self._trigram_words.get(gram, ()) for gram in grams), key=len
+        )
+        candidates: Set[str] = set()
+        for words in postings[:len(grams) - need + 1]:
+            candidates.update(words)
+        for candidate in candidates:
+            other = self._word_trigrams[candidate]
+            common = len(grams & other)
+            sim = common / (len(grams) + len(other) - common)
+            if sim >= threshold:
+                yield candidate, sim
+
+    def _add(self, row_id: int, values: Iterable[str | None]) -> None:
+        words: Set[str] = set()
+        for value in values:
+            words |= _words(value)
+        self._row_words[row_id] = words
+        for word in words:
+            if word not in self._word_trigrams:
+                grams = _trigrams(word)
+                self._word_trigrams[word] = grams
+                for gram in grams:
+                    self._trigram_words[gram].add(word)
+            self._word_rows[word].add(row_id)
+
+    def _remove(self, row_id: int) -> None:
+        for word in self._row_words.pop(row_id, ()):
+            rows = self._word_rows.get(word)
+            if rows is None:
+                continue
+            rows.discard(row_id)
+            if not rows:
+                # Last row using this word: drop it from the vocabulary
+                del self._word_rows[word]
+                for gram in self._word_trigrams.pop(word, ()):
+                    words = self._trigram_words[gram]
+                    words.discard(word)
+                    if not words:
+                        del self._trigram_words[gram]
+
+    def _clear(self) -> None:
+        self._word_trigrams.clear()
+        self._trigram_words.clear()
+        self._word_rows.clear()
+        self._row_words.clear()
+
+
+fuzzy_index = TrigramIndex()
+
+
+__all__ = ["SIMILARITY_THRESHOLD", "TrigramIndex", "fuzzy_index"]
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import hashlib
+from typing import Any, Dict, Iterable, Mapping
+
+from sqlalchemy import bindparam, or_, select, update
+from sqlalchemy.engine import Connection
+
+from .folding import fold_text
+from .models import Address
+
+
+# Fields that make two rows "the same person at the same address";
+# city is implied by the postal code
+NATURAL_KEY_FIELDS = (
+    "first_name", "last_name", "street", "apartment_no", "postal_code",
+)
+# Fields covered by row_hash. label_marked is working state set in the
+# app, so re-importing an older file never resets it.
+CONTENT_FIELDS = (
+    "first_name", "last_name", "street", "apartment_no", "city",
+    "postal_code", "description",
+)
+IDENTITY_COLUMNS = ("natural_key", "row_hash")
+
+_SEPARATOR = "\x1f"
+
+
+def _digest(parts: Iterable[str]) -> str:
+    data = _SEPARATOR.join(parts).encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _key_part(value: Any) -> str:
+    # Folded with whitespace collapsed: "Jan  KOWALSKI" == "jan kowalski"
+    return " ".join((fold_text(value) or "").split())
+
+
+def natural_key(values: Mapping[str, Any]) -> str:
+    """Hash of the folded name, street, apartment and postal code."""
+    parts = [_key_part(values.get(name)) for name in NATURAL_KEY_FIELDS]
+    parts[-1] = parts[-1].replace(" ", "")
+    return _digest(parts)
+
+
+def row_hash(values: Mapping[str, Any]) -> str:
+    """Hash of the stored content, to skip rows that did not change."""
+    return _digest(
+        "" if values.get(name) is None else str(values[name])
+        for name in CONTENT_FIELDS
+    )
+
+
+def identity_values(values: Mapping[str, Any]) -> Dict[str, str]:
+    """natural_key/row_hash column values for a complete set of fields."""
+    return {"natural_key": natural_key(values), "row_hash": row_hash(values)}
+
+
+def address_identity(address: Address) -> Dict[str, str]:
+    return identity_values(
+        {name: getattr(address, name) for name in CONTENT_FIELDS}
+    )
+
+
+def refresh_identity_columns(
+    conn: Connection, ids: Iterable[int] | None = None
+) -> int:
+    """Recompute natural_key/row_hash from the stored fields.
+
+    ``ids`` limits the refresh to rows just changed by partial updates;
+    without it only rows written before the columns existed are filled.
+    """
+    content = [getattr(Address, name) for name in CONTENT_FIELDS]
+    stmt = select(Address.id, *content)
+    if ids is None:
+        stmt = stmt.where(
+            or_(Address.natural_key.is_(None), Address.row_hash.is_(None))
+        )
+    else:
+        ids = list(ids)
+        if not ids:
+            return 0
+        stmt = stmt.where(Address.id.in_(ids))
+    params = []
+    for row in conn.execute(stmt):
+        values = identity_values(dict(zip(CONTENT_FIELDS, row[1:])))
+        values["_id"] = row[0]
+        params.append(values)
+    if params:
+        table = Address.__table__
+        conn.execute(
+            update(table)
+            .where(table.c.id == bindparam("_id"))
+            .values({c: bindparam(c) for c in IDENTITY_COLUMNS}),
+            params,
+        )
+    return len(params)
+
+
+__all__ = [
+    "CONTENT_FIELDS",
+    "IDENTITY_COLUMNS",
+    "NATURAL_KEY_FIELDS",
+    "address_identity",
+    "identity_values",
+    "natural_key",
+    "refresh_identity_columns",
+    "row_hash",
+]
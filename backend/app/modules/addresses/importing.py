@@ -0,0 +1,512 @@
+from __future__ import annotations
+
+import csv
+import io
+import itertools
+import logging
+import time
+import zipfile
+from xml.etree import ElementTree
+from dataclasses import dataclass, field
+from typing import (
+    Any, BinaryIO, Dict, Iterable, Iterator, List, Mapping, Optional,
+    Tuple,
+)
+
+from sqlalchemy.orm import Session
+
+from .cache import address_data_version
+from .folding import folded_values
+from .fuzzy import fuzzy_index
+from .identity import identity_values
+from .odt_extraction import extract_archive, record_to_address
+from .repositories import AddressRepository
+from .services import normalize_postal_code
+from .suggest import suggest_index
+
+logger = logging.getLogger("addresses.import")
+
+# Rows per executemany INSERT; all batches share one transaction
+IMPORT_BATCH_SIZE = 1000
+# insert: every valid row is added; merge: rows matching an existing
+# address (by id, else by natural key) update it or are skipped
+IMPORT_MODES = ("insert", "merge")
+
+REQUIRED_COLUMNS = {
+    "first_name", "last_name", "street", "apartment_no", "city",
+    "postal_code", "label_marked",
+}
+HEADER_ALIASES = {
+    "opis": "description",
+    "uwagi": "description",
+    "uwaga": "description",
+    "notatka": "description",
+    "notatki": "description",
+    "notes": "description",
+}
+TRUE_VALUES = {"1", "true", "yes", "tak", "y", "t"}
+# Characters read ahead (then up to the end of that line) for sniffing
+SNIFF_SIZE = 4096
+
+_TABLE_NS = "urn:oasis:names:tc:opendocument:xmlns:table:1.0"
+_TEXT_NS = "urn:oasis:names:tc:opendocument:xmlns:text:1.0"
+_OFFICE_NS = "urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+_TABLE = f"{{{_TABLE_NS}}}table"
+_ROW = f"{{{_TABLE_NS}}}table-row"
+_CELLS = {f"{{{_TABLE_NS}}}table-cell", f"{{{_TABLE_NS}}}covered-table-cell"}
+_ROWS_REPEATED = f"{{{_TABLE_NS}}}number-rows-repeated"
+_COLUMNS_REPEATED = f"{{{_TABLE_NS}}}number-columns-repeated"
+_VALUE_TYPE = f"{{{_OFFICE_NS}}}value-type"
+_VALUE = f"{{{_OFFICE_NS}}}value"
+_BOOLEAN_VALUE = f"{{{_OFFICE_NS}}}boolean-value"
+_ANNOTATION = f"{{{_OFFICE_NS}}}annotation"
+_PARAGRAPH = f"{{{_TEXT_NS}}}p"
+_SPACES = f"{{{_TEXT_NS}}}s"
+_SPACE_COUNT = f"{{{_TEXT_NS}}}c"
+_TAB = f"{{{_TEXT_NS}}}tab"
+_LINE_BREAK = f"{{{_TEXT_NS}}}line-break"
+
+
+class ImportRowError(ValueError):
+    """A rejected row: which column failed and a stable error code."""
+
+    def __init__(self, column: str, code: str, message: str) -> None:
+        super().__init__(message)
+        self.column = column
+        self.code = code
+        self.line = 0
+
+    def __str__(self) -> str:
+        return f"Row {self.line}: {self.args[0]}"
+
+
+@dataclass
+class ImportResult:
+    # Rows written: inserted + updated
+    imported: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    # Merge lines dropped for a later line with the same address
+    skipped: List[int] = field(default_factory=list)
+    # Data lines read, blank ones included (same count as before)
+    total_rows: int = 0
+    # Rows that passed validation (written unless dry_run)
+    valid_rows: int = 0
+    errors: List[ImportRowError] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+    dry_run: bool = False
+    mode: str = "insert"
+
+    @property
+    def rows_per_second(self) -> float:
+        if self.elapsed_seconds <= 0:
+            return 0.0
+        return self.total_rows / self.elapsed_seconds
+
+
+def normalize_header(name: str) -> str:
+    norm = name.strip().lower()
+    return HEADER_ALIASES.get(norm, norm)
+
+
+@dataclass
+class SheetSource:
+    raw_headers: List[str]
+    headers: List[str]
+    # (record number, row keyed by normalized header), read lazily
+    rows: Iterator[Tuple[int, Dict[str, str | None]]]
+
+
+@dataclass
+class CsvSource(SheetSource):
+    delimiter: str
+
+
+def open_csv(binary: BinaryIO) -> CsvSource:
+    """Stream an uploaded CSV without loading it into memory.
+
+    The file is decoded incrementally (UTF-8, optional BOM); only the
+    first few kilobytes are buffered to sniff the delimiter. Raises
+    ValueError when the file is empty or has no header row.
+    """
+    text = io.TextIOWrapper(binary, encoding="utf-8-sig", newline="")
+    head = text.read(SNIFF_SIZE) + text.readline()
+    if not head.strip():
+        raise ValueError("CSV file is empty")
+
+    delimiter = ","
+    try:
+        delimiter = csv.Sniffer().sniff(head, delimiters=",;").delimiter
+    except csv.Error:
+        first_line = head.splitlines()[0]
+        if first_line.count(";") > first_line.count(","):
+            delimiter = ";"
+
+    # The sniffed head goes back in front of the rest of the stream
+    lines = itertools.chain(io.StringIO(head, newline=""), text)
+    reader = csv.DictReader(lines, delimiter=delimiter)
+    raw_headers = reader.fieldnames
+    if not raw_headers:
+        raise ValueError("CSV has no header row")
+    reader.fieldnames = [normalize_header(h) for h in raw_headers]
+    return CsvSource(
+        delimiter=delimiter,
+        raw_headers=list(raw_headers),
+        headers=list(reader.fieldnames),
+        rows=enumerate(reader, start=2),  # 1 = header
+    )
+
+
+def _ods_text(element: ElementTree.Element) -> str:
+    # Paragraph text with <text:s c="N"/>, tabs and line breaks expanded;
+    # cell comments are not part of the value
+    parts = [element.text or ""]
+    for child in element:
+        if child.tag == _SPACES:
+            parts.append(" " * int(child.get(_SPACE_COUNT, "1")))
+        elif child.tag == _TAB:
+            parts.append("\t")
+        elif child.tag == _LINE_BREAK:
+            parts.append("\n")
+        elif child.tag != _ANNOTATION:
+            parts.append(_ods_text(child))
+        parts.append(child.tail or "")
+    return "".join(parts)
+
+
+def _ods_cell_value(cell: ElementTree.Element) -> str:
+    value_type = cell.get(_VALUE_TYPE)
+    if value_type == "boolean":
+        return cell.get(_BOOLEAN_VALUE, "")
+    if value_type == "float":
+        # The stored value, not the locale-formatted display text
+        value = cell.get(_VALUE, "")
+        return value[:-2] if value.endswith(".0") else value
+    return "\n".join(
+        _ods_text(p) for p in cell if p.tag == _PARAGRAPH
+    )
+
+
+def _ods_rows(content: BinaryIO) -> Iterator[List[str]]:
+    """Cell values of the first sheet in content.xml, row by row.
+
+    Each row is dropped from the tree once read. Repeated cells are
+    expanded, trailing empty ones dropped; repeated empty rows are only
+    produced when more data follows them.
+    """
+    stack: List[ElementTree.Element] = []
+    cells: List[str] = []
+    pending_blank = 0
+    seen_table = False
+    for event, elem in ElementTree.iterparse(content, ("start", "end")):
+        if event == "start":
+            if elem.tag == _TABLE:
+                if seen_table:
+                    return
+                seen_table = True
+            stack.append(elem)
+            continue
+        stack.pop()
+        if elem.tag in _CELLS:
+            repeat = int(elem.get(_COLUMNS_REPEATED, "1"))
+            value = _ods_cell_value(elem)
+            cells.extend([value] * repeat)
+            elem.clear()
+        elif elem.tag == _ROW:
+            while cells and not cells[-1]:
+                cells.pop()
+            repeat = int(elem.get(_ROWS_REPEATED, "1"))
+            if cells:
+                for _ in range(pending_blank):
+                    yield []
+                pending_blank = 0
+                for _ in range(repeat):
+                    yield cells
+            else:
+                pending_blank += repeat
+            cells = []
+            if stack:
+                stack[-1].remove(elem)
+
+
+def open_ods(binary: BinaryIO) -> SheetSource:
+    """Stream the first sheet of an uploaded ODS spreadsheet.
+
+    content.xml is parsed incrementally straight from the zip archive;
+    the first row is the header. Raises ValueError for files that are
+    not an ODS document or have no header row.
+    """
+    try:
+        archive = zipfile.ZipFile(binary)
+        content = archive.open("content.xml")
+    except (zipfile.BadZipFile, KeyError) as exc:
+        raise ValueError("File is not an ODS spreadsheet") from exc
+
+    rows = _ods_rows(content)
+    try:
+        raw_headers = next(rows)
+    except StopIteration:
+        raise ValueError("Spreadsheet has no header row") from None
+    except ElementTree.ParseError as exc:
+        raise ValueError(f"Invalid ODS content: {exc}") from exc
+    headers = [normalize_header(h) for h in raw_headers]
+
+    def records() -> Iterator[Tuple[int, Dict[str, str | None]]]:
+        for line_no, cells in enumerate(rows, start=2):
+            row: Dict[str, str | None] = dict.fromkeys(headers)
+            row.update(zip(headers, cells))
+            yield line_no, row
+
+    return SheetSource(
+        raw_headers=list(raw_headers), headers=headers, rows=records()
+    )
+
+
+def _is_blank(row: Mapping[Any, Any]) -> bool:
+    # csv.DictReader puts fields past the header in a list under None,
+    # e.g. the ";;;;;;;;" rows spreadsheets leave below a 7-column sheet
+    for value in row.values():
+        values = value if isinstance(value, list) else (value,)
+        if any((v or "").strip() for v in values):
+            return False
+    return True
+
+
+def validate_row(row: Mapping[str, str | None]) -> Dict[str, Any]:
+    """Normalized address fields of one import row.
+
+    Same rules as AddressService.create; raises ImportRowError.
+    """
+    def value(name: str) -> str:
+        return (row.get(name) or "").strip()
+
+    fields = {
+        "first_name": value("first_name"),
+        "last_name": value("last_name"),
+        "street": value("street"),
+        "apartment_no": value("apartment_no") or None,
+        "city": value("city"),
+        "postal_code": value("postal_code"),
+        "description": value("description")[:500] or None,
+        "label_marked": value("label_marked").lower() in TRUE_VALUES,
+    }
+    for name in ("first_name", "last_name", "street", "city", "postal_code"):
+        if not fields[name]:
+            raise ImportRowError(name, "required", f"{name} is required")
+    try:
+        fields["postal_code"] = normalize_postal_code(fields["postal_code"])
+    except ValueError as exc:
+        raise ImportRowError("postal_code", "invalid_format", str(exc))
+    return fields
+
+
+def row_id(row: Mapping[str, str | None]) -> Optional[int]:
+    """The optional ``id`` column, used by merge imports."""
+    raw = (row.get("id") or "").strip()
+    if not raw:
+        return None
+    if not raw.isdigit():
+        raise ImportRowError("id", "invalid_format", "id must be a number")
+    return int(raw)
+
+
+def prepare_row(row: Mapping[str, str | None]) -> Dict[str, Any]:
+    """Validate one import row and build its INSERT values.
+
+    label_marked is written with the row instead of by a follow-up
+    update; the folded search and identity columns are filled in.
+    """
+    fields = validate_row(row)
+    return {**fields, **folded_values(fields), **identity_values(fields)}
+
+
+def _merge_batch(
+    repo: AddressRepository,
+    db: Session,
+    batch: List[Tuple[int, Optional[int], Dict[str, Any]]],
+    result: ImportResult,
+) -> None:
+    """Insert, update or skip each row of one batch.
+
+    Existing rows are looked up with two indexed IN queries; rows whose
+    row_hash matches are left alone and label_marked of existing rows is
+    kept. Earlier batches are visible through the open transaction.
+    Lines aimed at the same address as a later line of the batch are
+    dropped and reported in ``result.skipped``.
+    """
+    by_id = repo.identities_by_id(
+        db, [target for _, target, _ in batch if target is not None]
+    )
+    by_key = repo.identities_by_key(
+        db,
+        [values["natural_key"] for _, target, values in batch
+         if target not in by_id],
+    )
+    # Existing id, or natural key of a new row -> its last line
+    latest: Dict[Any, Tuple[int, Optional[int], Any, Dict[str, Any]]] = {}
+    for line_no, target, values in batch:
+        key = values["natural_key"]
+        if target in by_id:
+            digest = by_id[target]
+        elif key in by_key:
+            target, digest = by_key[key]
+        else:
+            target, digest = None, None
+        slot = key if target is None else target
+        if slot in latest:
+            result.skipped.append(latest[slot][0])
+        latest[slot] = (line_no, target, digest, values)
+
+    inserts: List[Dict[str, Any]] = []
+    updates: List[Dict[str, Any]] = []
+    for _, target, digest, values in latest.values():
+        if target is None:
+            inserts.append(values)
+            result.inserted += 1
+        elif digest == values["row_hash"]:
+            result.unchanged += 1
+        else:
+            changes = {
+                k: v for k, v in values.items() if k != "label_marked"
+            }
+            updates.append({**changes, "id": target})
+            result.updated += 1
+    repo.insert_many(db, inserts)
+    repo.update_many(db, updates)
+
+
+def import_rows(
+    db: Session,
+    rows: Iterable[Tuple[int, Mapping[str, str | None]]],
+    *,
+    batch_size: int = IMPORT_BATCH_SIZE,
+    dry_run: bool = False,
+    mode: str = "insert",
+) -> ImportResult:
+    """Write ``(line_no, row)`` pairs in executemany batches.
+
+    Invalid rows are skipped and reported by line number; the valid
+    ones are committed together at the end, so a failed import leaves
+    the table untouched. ``dry_run`` only validates and writes nothing.
+    ``mode="merge"`` updates matching rows instead of adding duplicates.
+    """
+    repo = AddressRepository()
+    merge = mode == "merge"
+    result = ImportResult(dry_run=dry_run, mode=mode)
+    batch: List[Tuple[int, Optional[int], Dict[str, Any]]] = []
+    started = time.perf_counter()
+
+    def flush() -> None:
+        if merge:
+            _merge_batch(repo, db, batch, result)
+        else:
+            repo.insert_many(db, [values for _, _, values in batch])
+            result.inserted += len(batch)
+        batch.clear()
+
+    try:
+        for line_no, row in rows:
+            result.total_rows += 1
+            if _is_blank(row):
+                continue
+            try:
+                values = validate_row(row) if dry_run else prepare_row(row)
+                target = row_id(row) if merge else None
+            except ImportRowError as exc:
+                exc.line = line_no
+                if not dry_run:
+                    logger.warning(
+                        "IMPORT ROW ERROR line=%s err=%s row=%s",  # noqa: G004
+                        line_no,
+                        exc,
+                        row,
+                    )
+                result.errors.append(exc)
+                continue
+            result.valid_rows += 1
+            if dry_run:
+                continue
+            batch.append((line_no, target, values))
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    result.imported = result.inserted + result.updated
+    result.skipped.sort()
+    result.elapsed_seconds = time.perf_counter() - started
+
+    if result.imported:
+        address_data_version.bump()
+        # Rebuilt lazily on the next fuzzy search / suggestion
+        fuzzy_index.invalidate()
+        suggest_index.invalidate()
+    return result
+
+
+def import_odt_archive(
+    db: Session,
+    archive: zipfile.ZipFile,
+    names: List[str],
+    *,
+    workers: int = 1,
+    dry_run: bool = False,
+    mode: str = "insert",
+) -> Tuple[ImportResult, List[Dict[str, Any]]]:
+    """Extract the address of every letter in ``archive`` and import it.
+
+    Letters are parsed in a worker pool and their addresses streamed
+    into import_rows (record number = position in ``names``), marked for
+    labels as in the support script's CSV. Returns the result and one
+    outcome per file: imported (merged in merge mode, valid with
+    dry_run), invalid, no_address or error.
+    """
+    outcomes: List[Dict[str, Any]] = []
+
+    def rows() -> Iterator[Tuple[int, Dict[str, str | None]]]:
+        records = extract_archive(archive, names, workers=workers)
+        for line_no, record in enumerate(records, start=1):
+            outcome: Dict[str, Any] = {"file": record["source"]}
+            outcomes.append(outcome)
+            if not (record["name"] or record["street"] or record["postcode"]):
+                error = record["city"]
+                if error.startswith("ERROR: "):
+                    outcome.update(status="error", detail=error[7:])
+                else:
+                    outcome["status"] = "no_address"
+                continue
+            outcome["status"] = (
+                "valid" if dry_run
+                else "merged" if mode == "merge" else "imported"
+            )
+            address = record_to_address(record)
+            outcome["name"] = record["name"]
+            yield line_no, {**address, "label_marked": "1"}
+
+    result = import_rows(db, rows(), dry_run=dry_run, mode=mode)
+    for error in result.errors:
+        outcomes[error.line - 1].update(status="invalid", detail=error.args[0])
+    return result, outcomes
+
+
+__all__ = [
+    "CsvSource",
+    "HEADER_ALIASES",
+    "IMPORT_BATCH_SIZE",
+    "IMPORT_MODES",
+    "REQUIRED_COLUMNS",
+    "ImportResult",
+    "ImportRowError",
+    "SheetSource",
+    "import_odt_archive",
+    "import_rows",
+    "normalize_header",
+    "open_csv",
+    "open_ods",
+    "prepare_row",
+    "row_id",
+    "validate_row",
+]
@@ -32,6 +32,29 @@ class Address(Base):
     description: Mapped[str | None] = mapped_column(
         String(500), nullable=True
     )
+    # Case- and diacritic-folded copies used by search (see folding.py);
+    # written together with the source column, never computed at query time
+    first_name_folded: Mapped[str | None] = mapped_column(
+        String(100), nullable=True, index=True
+    )
+    last_name_folded: Mapped[str | None] = mapped_column(
+        String(100), nullable=True, index=True
+    )
+    street_folded: Mapped[str | None] = mapped_column(
+        String(200), nullable=True, index=True
+    )
+    city_folded: Mapped[str | None] = mapped_column(
+        String(120), nullable=True, index=True
+    )
+    description_folded: Mapped[str | None] = mapped_column(
+        String(500), nullable=True
+    )
+    # Merge-import identity (see identity.py): hash of the folded name and
+    # address, and of the stored content to skip unchanged rows
+    natural_key: Mapped[str | None] = mapped_column(
+        String(32), nullable=True, index=True
+    )
+    row_hash: Mapped[str | None] = mapped_column(String(32), nullable=True)
     label_marked: Mapped[bool] = mapped_column(
         Boolean, nullable=False, default=False, index=True
     )
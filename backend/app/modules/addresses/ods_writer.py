@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import io
+import re
+import zipfile
+from typing import Iterable, Iterator, Sequence
+from xml.sax.saxutils import escape, quoteattr
+
+
+MIMETYPE = "application/vnd.oasis.opendocument.spreadsheet"
+
+_MANIFEST = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<manifest:manifest xmlns:manifest='
+    '"urn:oasis:names:tc:opendocument:xmlns:manifest:1.0"'
+    ' manifest:version="1.2">'
+    '<manifest:file-entry manifest:full-path="/"'
+    f' manifest:version="1.2" manifest:media-type="{MIMETYPE}"/>'
+    '<manifest:file-entry manifest:full-path="content.xml"'
+    ' manifest:media-type="text/xml"/>'
+    "</manifest:manifest>"
+)
+_CONTENT_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    "<office:document-content"
+    ' xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"'
+    ' xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0"'
+    ' xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0"'
+    ' office:version="1.2">'
+    "<office:body><office:spreadsheet>"
+    "<table:table table:name={name}>"
+    '<table:table-column table:number-columns-repeated="{columns}"/>'
+)
+_CONTENT_TAIL = (
+    "</table:table></office:spreadsheet></office:body>"
+    "</office:document-content>"
+)
+_CELL = (
+    '<table:table-cell office:value-type="string">'
+    "<text:p>{}</text:p></table:table-cell>"
+)
+
+# Not allowed anywhere in XML 1.0, so dropped from cell text
+_INVALID_XML_RE = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+# Whitespace a reader would collapse: leading, trailing or repeated
+# spaces, tabs and line breaks
+_WHITESPACE_RE = re.compile(r"^ +| +$| {2,}|\t|\r\n?|\n")
+
+
+def _whitespace(match: re.Match) -> str:
+    run = match.group()
+    if run == "\t":
+        return "<text:tab/>"
+    if run[0] != " ":
+        return "<text:line-break/>"
+    # Inside the text the first space stays literal, as LibreOffice
+    # writes it; at either end every space is encoded
+    edge = match.start() == 0 or match.end() == len(match.string)
+    literal = "" if edge else " "
+    count = len(run) - len(literal)
+    if count == 1:
+        return f"{literal}<text:s/>"
+    return f'{literal}<text:s text:c="{count}"/>'
+
+
+def _paragraph(value: str) -> str:
+    text = escape(_INVALID_XML_RE.sub("", value))
+    return _WHITESPACE_RE.sub(_whitespace, text)
+
+
+def _row(values: Sequence[str]) -> str:
+    cells = "".join(_CELL.format(_paragraph(value)) for value in values)
+    return f"<table:table-row>{cells}</table:table-row>"
+
+
+class _Sink:
+    """File object that hands back what zipfile wrote, chunk by chunk.
+
+    It can seek only within bytes not drained yet: enough for zipfile to
+    patch the header of a small entry written in one go, never a header
+    already sent.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = io.BytesIO()
+        self._sent = 0
+
+    def write(self, data: bytes) -> int:
+        return self._buffer.write(data)
+
+    def tell(self) -> int:
+        return self._sent + self._buffer.tell()
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence != io.SEEK_SET or offset < self._sent:
+            raise io.UnsupportedOperation("seek before drained data")
+        return self._sent + self._buffer.seek(offset - self._sent)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = self._buffer.getvalue()
+        self._sent += len(data)
+        self._buffer = io.BytesIO()
+        return data
+
+
+def iter_ods(
+    header: Sequence[str],
+    batches: Iterable[Iterable[Sequence[str]]],
+    sheet_name: str = "Sheet1",
+) -> Iterator[bytes]:
+    """Yield a one-sheet .ods file of string cells, chunk by chunk.
+
+    ``header`` is the first row; each batch of rows is compressed into
+    content.xml as it arrives and whatever the zip stream produced is
+    yielded, so only one batch is held in memory.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as archive:
+        # Must be the first entry, stored and without an extra field, so
+        # the type can be sniffed at a fixed offset
+        archive.writestr(
+            "mimetype", MIMETYPE, compress_type=zipfile.ZIP_STORED
+        )
+        archive.writestr("META-INF/manifest.xml", _MANIFEST)
+        # Both headers above carry their real CRC and sizes. content.xml
+        # is streamed, so its header is sent before they are known: from
+        # here on zipfile must write a data descriptor instead of seeking
+        # back
+        archive._seekable = False
+        with archive.open("content.xml", "w") as content:
+            content.write(_CONTENT_HEAD.format(
+                name=quoteattr(sheet_name), columns=len(header)
+            ).encode("utf-8"))
+            content.write(_row(header).encode("utf-8"))
+            for batch in batches:
+                content.write(
+                    "".join(_row(values) for values in batch).encode("utf-8")
+                )
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+            content.write(_CONTENT_TAIL.encode("utf-8"))
+    yield sink.drain()
+
+
+__all__ = ["MIMETYPE", "iter_ods"]
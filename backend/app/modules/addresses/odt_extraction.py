@@ -0,0 +1,372 @@
+from __future__ import annotations
+
+import io
+import multiprocessing
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import PurePosixPath
+from typing import (
+    IO, Dict, Iterable, Iterator, List, Optional, Tuple, Union,
+)
+from xml.etree import ElementTree as ET
+
+
+# Address extraction from ODT letters: the address block follows
+# "Sz. P." (or surrounds the first line with a postal code). Shared by
+# POST /import.odt-archive and support/skrypty/odt_extract_addresses.py,
+# so it depends on the standard library only.
+
+NS = {"text": "urn:oasis:names:tc:opendocument:xmlns:text:1.0"}
+TEXT_P = "{%s}p" % NS["text"]
+SZP_RE = re.compile(r"\bSz\.\s*P\.", re.I)
+# Paragraphs after "Sz. P." taken by extract_from_paras
+BLOCK_LINES = 5
+ZIP_RE = re.compile(r"\b\d{2}\s*[-–]?\s*\d{3}\b")
+NAME_RE = re.compile(
+    r"^[A-ZĄĆĘŁŃÓŚŹŻ][a-ząćęłńóśźż]+"
+    r"(?:\s+[A-ZĄĆĘŁŃÓŚŹŻ][a-ząćęłńóśźż]+)+$"
+)
+STREET_HINT = re.compile(r"\b(ul\.|ulica|al\.|aleja|pl\.)\b", re.I)
+_SPACED_LETTERS_RE = re.compile(
+    r"(?:[A-Za-zĄĆĘŁŃÓŚŹŻąćęłńóśźż]\s+){3,}[A-Za-zĄĆĘŁŃÓŚŹŻąćęłńóśźż]"
+    r"(?:\s+[A-Za-zĄĆĘŁŃÓŚŹŻąćęłńóśźż]+)*"
+)
+
+# krótka lista popularnych imion PL do detekcji kolejności (możesz rozszerzyć)
+COMMON_FIRST_NAMES = {
+    "Anna", "Agnieszka", "Barbara", "Katarzyna", "Maria", "Małgorzata",
+    "Ewa", "Joanna", "Elżbieta", "Zofia", "Iwona", "Halina", "Danuta",
+    "Beata", "Grażyna", "Teresa", "Monika", "Jadwiga", "Magdalena",
+    "Renata", "Krzysztof", "Piotr", "Tomasz", "Paweł", "Marek", "Andrzej",
+    "Jan", "Adam", "Rafał", "Grzegorz", "Łukasz", "Mariusz", "Maciej",
+    "Marcin", "Mateusz", "Dariusz", "Wojciech", "Jarosław", "Jerzy",
+}
+
+RECORD_FIELDS = ["source", "name", "street", "postcode", "city"]
+# Files handed to one worker at a time by extract_archive
+ARCHIVE_CHUNK_SIZE = 16
+
+OdtSource = Union[str, "os.PathLike[str]", IO[bytes]]
+Record = Dict[str, str]
+
+
+def read_paragraphs_from_odt(
+    odt: OdtSource, stop_at_block: bool = False
+) -> List[str]:
+    """Czyta paragrafy (text:p) z content.xml w kolejności wystąpień.
+
+    content.xml jest czytany strumieniowo (iterparse). Przy
+    stop_at_block=True czytanie kończy się, gdy za 'Sz. P.' jest już
+    BLOCK_LINES akapitów - reszta listu nie jest potrzebna.
+    """
+    paras: List[str] = []
+    open_ps = 0  # zagnieżdżone text:p (np. w ramkach)
+    slots: List[ET.Element] = []  # kolejność jak w findall
+    szp_idx = None
+    with zipfile.ZipFile(odt, "r") as z, z.open("content.xml") as f:
+        for event, el in ET.iterparse(f, ("start", "end")):
+            if el.tag != TEXT_P:
+                continue
+            if event == "start":
+                slots.append(el)
+                open_ps += 1
+                continue
+            open_ps -= 1
+            if open_ps:
+                continue
+            # domknięty akapit najwyższego poziomu: wszystkie zaczęte gotowe
+            for p in slots:
+                t = re.sub(r"\s+", " ", "".join(p.itertext())).strip()
+                if t:
+                    paras.append(t)
+                    if szp_idx is None and SZP_RE.search(t):
+                        szp_idx = len(paras) - 1
+            slots = []
+            el.clear()
+            if (stop_at_block and szp_idx is not None
+                    and len(paras) > szp_idx + BLOCK_LINES):
+                break
+    return paras
+
+
+def fix_spaced_letters(s: str) -> str:
+    """Składa rozstrzelone litery: 'Ś w i d n i k' -> 'Świdnik',
+    'I r e n a  G u z y' -> 'Irena Guzy'."""
+    t = s.strip()
+    if _SPACED_LETTERS_RE.fullmatch(t):
+        t2 = re.sub(r"\s+", "", t)
+        t2 = re.sub(r"(?<=[a-ząćęłńóśźż])(?=[A-ZĄĆĘŁŃÓŚŹŻ])", " ", t2)
+        return t2
+    return s
+
+
+def extract_from_paras(paras: List[str], src_file: str) -> Optional[Record]:
+    """Ekstrakcja bloku po 'Sz. P.' lub wokół linii z kodem pocztowym."""
+    idx = next((i for i, p in enumerate(paras) if SZP_RE.search(p)), None)
+    if idx is None:
+        for i, p in enumerate(paras):
+            if ZIP_RE.search(p):
+                idx = max(0, i - 2)
+                break
+    if idx is None:
+        return None
+
+    block = paras[idx + 1: idx + 1 + BLOCK_LINES]  # zwykle 3–4 linie
+    if not block:
+        return None
+
+    name = fix_spaced_letters(block[0])
+    if not NAME_RE.match(name):
+        for ln in block[1:3]:
+            cand = fix_spaced_letters(ln)
+            if NAME_RE.match(cand):
+                name = cand
+                break
+
+    street = ""
+    postcode = ""
+    city = ""
+
+    for ln in block:
+        ln_norm = ln.replace("–", "-").replace("—", "-")
+        if not street and (
+            STREET_HINT.search(ln_norm) or re.search(r"\d", ln_norm)
+        ):
+            street = ln_norm
+        m = ZIP_RE.search(ln_norm)
+        if m and not postcode:
+            code = m.group(0)
+            postcode = re.sub(
+                r"\s+", "", code.replace("–", "-").replace("—", "-")
+            )
+            tail = ln_norm[m.end():].strip()
+            if tail:
+                city = tail
+
+    if postcode and not city:
+        for i, ln in enumerate(block):
+            if ZIP_RE.search(ln):
+                if i + 1 < len(block):
+                    city = block[i + 1].strip()
+                break
+
+    # sanity: jeśli "street" wygląda jak imię+nazwisko, wyzeruj
+    if street and NAME_RE.match(fix_spaced_letters(street)):
+        street = ""
+
+    # normalizacja końcowa
+    name = name.strip()
+    street = fix_spaced_letters(street.strip())
+    city = fix_spaced_letters(city.strip())
+    return {
+        "source": src_file,
+        "name": name,
+        "street": street,
+        "postcode": postcode.strip(),
+        "city": city,
+    }
+
+
+def empty_record(source: str, error: str | None = None) -> Record:
+    """Record of a letter without a recognizable address block."""
+    return {
+        "source": source, "name": "", "street": "", "postcode": "",
+        "city": "" if error is None else f"ERROR: {error}",
+    }
+
+
+def extract_file(path: str) -> Record:
+    """Rekord dla jednego pliku .odt (także pusty / z błędem)."""
+    try:
+        paras = read_paragraphs_from_odt(path, stop_at_block=True)
+        return (
+            extract_from_paras(paras, str(path)) or empty_record(str(path))
+        )
+    except Exception as e:  # noqa: BLE001
+        return empty_record(str(path), str(e))
+
+
+def split_name(full_name: str) -> Tuple[str, str]:
+    """
+    Heurystyka:
+      - standard: first = pierwszy token, last = reszta,
+      - jeśli DOKŁADNIE dwa tokeny i drugi jest znanym polskim imieniem
+        (a pierwszy nie), to zamieniamy kolejność (obsługa
+        'Tujaka Agnieszka' -> first='Agnieszka', last='Tujaka').
+    """
+    if not full_name:
+        return ("", "")
+    parts = full_name.split()
+    if len(parts) == 1:
+        return (parts[0], "")
+    if len(parts) == 2:
+        a, b = parts[0], parts[1]
+        if (b in COMMON_FIRST_NAMES) and (a not in COMMON_FIRST_NAMES):
+            return (b, a)
+        return (a, b)
+    return (parts[0], " ".join(parts[1:]))
+
+
+def split_street_and_number(street: str) -> Tuple[str, str]:
+    """
+    Zwraca (street_without_number, number_combined).
+    Zasada 'więcej do numeru':
+      - 'ul. 3-go Maja 10 / 15' -> ('ul. 3-go Maja', '10/15')
+      - 'Narutowicza 3, 7A'     -> ('Narutowicza', '3/7A')
+      - 'Lipowa 10'             -> ('Lipowa', '10')
+      - 'Jarosławiec 86 A'      -> ('Jarosławiec', '86 A')
+      - 'Bazylianówka 81/12 A'  -> ('Bazylianówka', '81/12A')
+    """
+    if not street:
+        return ("", "")
+    s = street.strip()
+    s = s.replace("–", "-").replace("—", "-")
+    s = re.sub(r"\s+", " ", s)
+    s = re.sub(r"\s*/\s*", "/", s)    # "10 / 15" -> "10/15"
+    s = re.sub(r"\s*,\s*", ", ", s)   # przecinki
+
+    # 1) num/apt + opcjonalna litera po spacji: "... 81/12 A" -> "81/12A"
+    m = re.match(
+        r"^(?P<st>.+?)\s+(?P<n1>\d+[\w\-]*)/(?P<n2>[\w\-]+)"
+        r"(?:\s*(?P<let>[A-Za-zĄĆĘŁŃÓŚŹŻ]))?$",
+        s,
+    )
+    if m:
+        n1, n2, ltr = m.group("n1"), m.group("n2"), m.group("let") or ""
+        return (m.group("st").strip(), f"{n1}/{n2}{ltr}")
+
+    # 2) "..., apt" i numer domu tuż przed przecinkiem -> "house/apt"
+    m = re.match(
+        r"^(?P<st_no>.+?)\s+(?P<house>\d+[\w\-]*)\s*,\s*(?P<apt>[\w\-]+)$",
+        s,
+    )
+    if m:
+        return (
+            m.group("st_no").strip(), f"{m.group('house')}/{m.group('apt')}"
+        )
+
+    # 3) "..., coś" (bez numeru domu po nazwie ulicy)
+    m = re.match(r"^(?P<st>.+?),\s*(?P<tail>[\w\-]+)$", s)
+    if m:
+        return (m.group("st").strip(), m.group("tail"))
+
+    # 4) numer na końcu z literą oddzieloną spacją: "... 86 A"
+    m = re.match(r"^(?P<st>.+?)\s+(?P<num>\d+\s*[A-Za-zĄĆĘŁŃÓŚŹŻ])$", s)
+    if m:
+        return (
+            m.group("st").strip(),
+            re.sub(r"\s+", " ", m.group("num")).strip(),
+        )
+
+    # 5) numer na końcu z literą zbitą lub myślnikiem: "... 86A" / "... 86-A"
+    m = re.match(r"^(?P<st>.+?)\s+(?P<num>\d+[\w\-]*)$", s)
+    if m:
+        return (m.group("st").strip(), m.group("num").strip())
+
+    # 6) nic nie pasuje – zwróć wszystko jako ulicę
+    return (s, "")
+
+
+def record_to_address(record: Record) -> Dict[str, str]:
+    """Address fields of an extracted record (addresses-format.csv).
+
+    The combined house/apartment number goes to apartment_no, as in the
+    CSVs the letters have always been imported from.
+    """
+    first_name, last_name = split_name(record.get("name", ""))
+    street, number = split_street_and_number(record.get("street", ""))
+    return {
+        "first_name": first_name,
+        "last_name": last_name,
+        "street": street,
+        "apartment_no": number,
+        "city": fix_spaced_letters(record.get("city", "")),
+        "postal_code": record.get("postcode", ""),
+    }
+
+
+def _extract_members(members: List[Tuple[str, bytes]]) -> List[Record]:
+    # Runs in a worker process: one chunk of (name, .odt bytes)
+    records = []
+    for name, data in members:
+        try:
+            paras = read_paragraphs_from_odt(
+                io.BytesIO(data), stop_at_block=True
+            )
+            record = extract_from_paras(paras, name) or empty_record(name)
+        except Exception as e:  # noqa: BLE001
+            record = empty_record(name, str(e))
+        records.append(record)
+    return records
+
+
+def archive_members(archive: zipfile.ZipFile) -> List[str]:
+    """The .odt files of an uploaded ZIP, in archive order."""
+    return [
+        info.filename for info in archive.infolist()
+        if not info.is_dir()
+        and info.filename.lower().endswith(".odt")
+        and "__MACOSX" not in PurePosixPath(info.filename).parts
+    ]
+
+
+def _chunks(
+    archive: zipfile.ZipFile, names: List[str], size: int
+) -> Iterator[List[Tuple[str, bytes]]]:
+    for start in range(0, len(names), size):
+        yield [(n, archive.read(n)) for n in names[start:start + size]]
+
+
+def extract_archive(
+    archive: zipfile.ZipFile,
+    names: Iterable[str] | None = None,
+    *,
+    workers: int = 1,
+) -> Iterator[Record]:
+    """Records of the .odt files in ``archive``, in archive order.
+
+    With ``workers`` > 1 chunks of files are parsed in a process pool;
+    only a few chunks per worker are read ahead, so memory stays bounded
+    however large the archive is.
+    """
+    names = list(archive_members(archive) if names is None else names)
+    chunks = _chunks(archive, names, ARCHIVE_CHUNK_SIZE)
+    if workers <= 1:
+        for chunk in chunks:
+            yield from _extract_members(chunk)
+        return
+
+    # spawn, not fork: the web server process is multi-threaded and a
+    # forked child could inherit a lock held by another thread
+    pool = ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    )
+    try:
+        pending = []
+        for chunk in chunks:
+            pending.append(pool.submit(_extract_members, chunk))
+            if len(pending) >= 2 * workers:
+                yield from pending.pop(0).result()
+        for future in pending:
+            yield from future.result()
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+__all__ = [
+    "BLOCK_LINES",
+    "COMMON_FIRST_NAMES",
+    "RECORD_FIELDS",
+    "archive_members",
+    "empty_record",
+    "extract_archive",
+    "extract_file",
+    "extract_from_paras",
+    "fix_spaced_letters",
+    "read_paragraphs_from_odt",
+    "record_to_address",
+    "split_name",
+    "split_street_and_number",
+]
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Mapping, Tuple
+
+from sqlalchemy import not_, or_
+
+from .folding import fold_text, prefix_range
+from .models import Address
+from .search_index import MIN_TERM_LENGTH, match_ids
+
+
+# Search syntax for the contacts search box:
+#
+#   city:Lublin          exact value (equality on an indexed column)
+#   last:Kow*  postal:20-*   prefix (range scan on an indexed column)
+#   "Krakowskie Przedm"  phrase, matched as one substring
+#   -city:Lublin  -Nowak negation
+#   anything else        free text through the full-text index
+#
+# Values are compared case- and diacritic-insensitively (folded columns).
+FIELD_ALIASES = {
+    "first": "first_name",
+    "first_name": "first_name",
+    "imie": "first_name",
+    "last": "last_name",
+    "last_name": "last_name",
+    "nazwisko": "last_name",
+    "street": "street",
+    "ulica": "street",
+    "city": "city",
+    "miasto": "city",
+    "postal": "postal_code",
+    "postal_code": "postal_code",
+    "kod": "postal_code",
+}
+
+# Field -> (indexed column, normalization applied to the query value)
+_FIELD_COLUMNS: Dict[str, Tuple[Any, Callable[[str], str]]] = {
+    "first_name": (Address.first_name_folded, lambda v: fold_text(v) or ""),
+    "last_name": (Address.last_name_folded, lambda v: fold_text(v) or ""),
+    "street": (Address.street_folded, lambda v: fold_text(v) or ""),
+    "city": (Address.city_folded, lambda v: fold_text(v) or ""),
+    "postal_code": (Address.postal_code, lambda v: v.upper()),
+}
+
+_TOKEN_RE = re.compile(
+    r'(?P<neg>-)?(?:(?P<field>[A-Za-z_]+):)?'
+    r'(?:"(?P<phrase>[^"]*)"?|(?P<word>\S+))'
+)
+
+
+@dataclass
+class Term:
+    value: str
+    field: str | None = None
+    negated: bool = False
+    prefix: bool = False
+
+
+@dataclass
+class CompiledQuery:
+    # Predicates to AND into the WHERE clause
+    filters: List[Any] = field(default_factory=list)
+    # Folded free-text terms for the FTS MATCH (joined for bm25 ranking)
+    fts_terms: List[str] = field(default_factory=list)
+
+
+def parse_query(q: str | None) -> List[Term]:
+    terms: List[Term] = []
+    for match in _TOKEN_RE.finditer(q or ""):
+        negated = bool(match.group("neg"))
+        raw_field = match.group("field")
+        value = match.group("phrase")
+        if value is None:
+            value = match.group("word")
+        field_name = None
+        if raw_field:
+            field_name = FIELD_ALIASES.get(raw_field.lower())
+        if raw_field and field_name is None:
+            # Unknown qualifier ("foo:bar"): keep the text as typed
+            value = f"{raw_field}:{value}"
+        prefix = value.endswith("*")
+        value = value.rstrip("*").strip()
+        if not value:
+            continue
+        terms.append(Term(
+            value=value, field=field_name, negated=negated, prefix=prefix
+        ))
+    return terms
+
+
+def _field_predicate(term: Term) -> Any:
+    column, normalize = _FIELD_COLUMNS[term.field]
+    value = normalize(term.value)
+    if term.prefix:
+        return prefix_range(column, value)
+    return column == value
+
+
+def _short_text_predicate(term: str) -> Any:
+    # Too short for the trigram index: substring match on the folded
+    # columns, as the search did before the index ("a" finds "Nowak",
+    # "10" finds "Lipowa 10")
+    return or_(
+        Address.first_name_folded.contains(term, autoescape=True),
+        Address.last_name_folded.contains(term, autoescape=True),
+        Address.street_folded.contains(term, autoescape=True),
+        Address.city_folded.contains(term, autoescape=True),
+        Address.postal_code.contains(term.upper(), autoescape=True),
+    )
+
+
+def compile_query(
+    q: str | None,
+    fields: Mapping[str, str | None] | None = None,
+) -> CompiledQuery:
+    """Compile the search box text plus per-field parameters.
+
+    ``fields`` holds the explicit first_name/last_name/city/street query
+    parameters; they use the same exact/prefix (``*``) rules as
+    ``field:value`` terms.
+    """
+    terms = parse_query(q)
+    for name, value in (fields or {}).items():
+        if value and value.strip():
+            raw = value.strip()
+            terms.append(Term(
+                value=raw.rstrip("*"), field=name, prefix=raw.endswith("*")
+            ))
+
+    compiled = CompiledQuery()
+    for term in terms:
+        if term.field is not None:
+            predicate = _field_predicate(term)
+        else:
+            text = fold_text(term.value) or ""
+            if not any(ch.isalnum() for ch in text):
+                # Stray punctuation such as a lone "-" filters nothing
+                continue
+            if len(text) >= MIN_TERM_LENGTH:
+                if not term.negated:
+                    compiled.fts_terms.append(text)
+                    continue
+                predicate = Address.id.in_(match_ids([text]))
+            else:
+                predicate = _short_text_predicate(text)
+        compiled.filters.append(not_(predicate) if term.negated else predicate)
+    return compiled
+
+
+__all__ = [
+    "FIELD_ALIASES",
+    "CompiledQuery",
+    "Term",
+    "compile_query",
+    "parse_query",
+]
@@ -1,17 +1,69 @@
 from __future__ import annotations
 
-from typing import List, Optional, Union
+from typing import (
+    Any, Dict, Iterator, List, Mapping, Optional, Sequence, Union,
+)
 
-from sqlalchemy import Select, and_, delete, or_, select
+from sqlalchemy import (
+    Select, Subquery, and_, bindparam, delete, func, insert, select,
+    update,
+)
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Session
 
+from app.core.pagination import Cursor, Page, apply_keyset, build_page
+
+from .cache import address_data_version
+from .identity import address_identity, refresh_identity_columns
 from .models import Address
+from .query_language import compile_query
+from .search_index import match_subquery
+
+
+# Columns exposed by AddressRead, selectable one by one with ``columns``
+READ_FIELDS = [
+    "id", "first_name", "last_name", "street", "apartment_no",
+    "city", "postal_code", "description", "label_marked",
+]
+SORT_FIELDS = [*READ_FIELDS, "relevance"]
+NULLABLE_SORT_FIELDS = {"apartment_no", "description"}
 
 
 class AddressRepository:
     def get_by_id(self, db: Session, address_id: int) -> Optional[Address]:
         return db.get(Address, address_id)
 
+    def get_many(
+        self,
+        db: Session,
+        ids: List[int],
+        columns: Sequence[str] | None = None,
+    ) -> List[Any]:
+        """Addresses by id; with ``columns``, dicts of just those keys."""
+        if not ids:
+            return []
+        if columns:
+            stmt = select(*_columns(columns))
+            rows = db.execute(stmt.where(Address.id.in_(ids))).all()
+            return row_dicts(rows, columns)
+        return list(db.scalars(select(Address).where(Address.id.in_(ids))))
+
+    def filter_ids(
+        self, db: Session, ids: List[int], *, label_marked: bool
+    ) -> set[int]:
+        """Subset of ``ids`` whose label_marked equals the given value."""
+        if not ids:
+            return set()
+        stmt = select(Address.id).where(
+            Address.id.in_(ids), Address.label_marked == label_marked
+        )
+        return set(db.scalars(stmt))
+
+    def existing_ids(self, db: Session, ids: Sequence[int]) -> set[int]:
+        if not ids:
+            return set()
+        return set(db.scalars(select(Address.id).where(Address.id.in_(ids))))
+
     def list(
         self,
         db: Session,
@@ -19,32 +71,44 @@ class AddressRepository:
         limit: int = 50,
         offset: int = 0,
         sort_field: str = "id",
-        sort_direction: str = "asc"
-    ) -> List[Address]:
-        # Validate sort field
-        valid_fields = [
-            "id", "first_name", "last_name", "street", "apartment_no",
-            "city", "postal_code", "description", "label_marked"
-        ]
-        if sort_field not in valid_fields:
-            sort_field = "id"
-
-        # Get the column to sort by
-        sort_column = getattr(Address, sort_field)
-
-        # Apply sort direction
-        if sort_direction.lower() == "desc":
-            order_clause = sort_column.desc()
-        else:
-            order_clause = sort_column.asc()
+        sort_direction: str = "asc",
+        columns: Sequence[str] | None = None,
+        raw: bool = False,
+    ) -> List[Any]:
+        return self.list_page(
+            db,
+            limit=limit,
+            offset=offset,
+            sort_field=sort_field,
+            sort_direction=sort_direction,
+            columns=columns,
+            raw=raw,
+        ).items
 
-        stmt = (
-            select(Address)
-            .order_by(order_clause)
-            .limit(limit)
-            .offset(offset)
+    def list_page(
+        self,
+        db: Session,
+        *,
+        limit: int = 50,
+        offset: int = 0,
+        sort_field: str = "id",
+        sort_direction: str = "asc",
+        after: Cursor | None = None,
+        columns: Sequence[str] | None = None,
+        raw: bool = False,
+    ) -> Page[Any]:
+        return self._page(
+            db,
+            select(Address),
+            None,
+            limit=limit,
+            offset=offset,
+            sort_field=sort_field,
+            sort_direction=sort_direction,
+            after=after,
+            columns=columns,
+            raw=raw,
         )
-        return list(db.scalars(stmt).all())
 
     def create(
         self,
@@ -57,6 +121,7 @@ class AddressRepository:
         city: str,
         postal_code: str,
         description: str | None = None,
+        folded: Mapping[str, str | None] | None = None,
     ) -> Address:
         address = Address(
             first_name=first_name,
@@ -66,12 +131,26 @@ class AddressRepository:
             city=city,
             postal_code=postal_code,
             description=description,
+            **(folded or {}),
         )
+        for column_name, value in address_identity(address).items():
+            setattr(address, column_name, value)
         db.add(address)
         db.commit()
+        address_data_version.bump()
         db.refresh(address)
         return address
 
+    def insert_many(
+        self, db: Session, rows: Sequence[Mapping[str, Any]]
+    ) -> None:
+        """executemany INSERT of prebuilt column dicts; the caller commits.
+
+        All dicts must have the same keys (see importing.prepare_row).
+        """
+        if rows:
+            db.execute(insert(Address.__table__), rows)
+
     def list_all(self, db: Session) -> List[Address]:
         """Return all addresses ordered by last_name, first_name.
 
@@ -84,6 +163,25 @@ class AddressRepository:
         )
         return list(db.scalars(stmt).all())
 
+    def iter_export_batches(
+        self, db: Session, batch_size: int = 1000
+    ) -> Iterator[Sequence[Row]]:
+        """Yield READ_FIELDS tuples in list_all order, a batch at a time.
+
+        Rows come straight off the cursor (yield_per), so no ORM objects
+        are built and at most one batch is held in memory.
+        """
+        stmt = (
+            select(*(getattr(Address, name) for name in READ_FIELDS))
+            .order_by(
+                Address.last_name.asc(),
+                Address.first_name.asc(),
+                Address.id.asc(),
+            )
+            .execution_options(yield_per=batch_size)
+        )
+        yield from db.execute(stmt).partitions()
+
     def update(
         self,
         db: Session,
@@ -99,6 +197,7 @@ class AddressRepository:
         #   Ellipsis => leave unchanged; None => clear; str => set
         description: Union[str, None, object] = ...,  # Ellipsis value
         label_marked: bool | None = None,
+        folded: Mapping[str, str | None] | None = None,
     ) -> Address:
         if first_name is not None:
             address.first_name = first_name
@@ -117,16 +216,127 @@ class AddressRepository:
             address.description = description  # type: ignore[assignment]
         if label_marked is not None:
             address.label_marked = label_marked
+        for column_name, value in (folded or {}).items():
+            setattr(address, column_name, value)
+        for column_name, value in address_identity(address).items():
+            setattr(address, column_name, value)
 
         db.add(address)
         db.commit()
+        address_data_version.bump()
         db.refresh(address)
         return address
 
+    def update_many(
+        self, db: Session, updates: Sequence[Mapping[str, Any]]
+    ) -> None:
+        """executemany UPDATEs of column values keyed by name plus ``id``;
+        the caller commits.
+
+        Rows setting the same columns share one statement. Callers that
+        write only some fields refresh the identity columns afterwards.
+        """
+        table = Address.__table__
+        groups: Dict[tuple, List[Dict[str, Any]]] = {}
+        for values in updates:
+            params = {k: v for k, v in values.items() if k != "id"}
+            params["row_id"] = values["id"]
+            groups.setdefault(tuple(sorted(params)), []).append(params)
+        for batch in groups.values():
+            # SET is derived from the parameter keys
+            stmt = update(table).where(table.c.id == bindparam("row_id"))
+            db.execute(stmt, batch)
+
+    def apply_bulk(
+        self,
+        db: Session,
+        *,
+        updates: Sequence[Mapping[str, Any]] = (),
+        deletes: Sequence[int] = (),
+    ) -> None:
+        """Apply many updates/deletes in one transaction.
+
+        Updates go through update_many; deletes are a single
+        DELETE ... WHERE id IN (...).
+        """
+        table = Address.__table__
+        try:
+            self.update_many(db, updates)
+            refresh_identity_columns(
+                db.connection(), (values["id"] for values in updates)
+            )
+            if deletes:
+                db.execute(delete(table).where(table.c.id.in_(deletes)))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        address_data_version.bump()
+
+    def identities_by_id(
+        self, db: Session, ids: Sequence[int]
+    ) -> Dict[int, str | None]:
+        """row_hash of the existing rows among ``ids``."""
+        if not ids:
+            return {}
+        stmt = select(Address.id, Address.row_hash).where(Address.id.in_(ids))
+        return {row_id: digest for row_id, digest in db.execute(stmt)}
+
+    def identities_by_key(
+        self, db: Session, keys: Sequence[str]
+    ) -> Dict[str, tuple[int, str | None]]:
+        """(id, row_hash) per natural_key; the oldest row wins a tie."""
+        if not keys:
+            return {}
+        stmt = (
+            select(Address.natural_key, Address.id, Address.row_hash)
+            .where(Address.natural_key.in_(keys))
+            .order_by(Address.id.desc())
+        )
+        return {
+            key: (row_id, digest) for key, row_id, digest in db.execute(stmt)
+        }
+
     def delete(self, db: Session, address_id: int) -> None:
         stmt = delete(Address).where(Address.id == address_id)
         db.execute(stmt)
         db.commit()
+        address_data_version.bump()
+
+    def set_label_marked(
+        self,
+        db: Session,
+        value: bool,
+        *,
+        ids: Sequence[int] | None = None,
+        q: str | None = None,
+        label_marked: bool | None = None,
+        fields: Mapping[str, str | None] | None = None,
+        match_all: bool = False,
+    ) -> int:
+        """Set label_marked on many rows with one UPDATE; returns the
+        number of rows that changed.
+
+        Rows come from ``ids``, from the search filter, or from the whole
+        table with ``match_all``.
+        """
+        stmt = update(Address).where(Address.label_marked != value)
+        if ids is not None:
+            stmt = stmt.where(Address.id.in_(ids))
+        elif not match_all:
+            matches, _ = self._search_stmt(
+                q=q, label_marked=label_marked, fields=fields
+            )
+            stmt = stmt.where(
+                Address.id.in_(matches.with_only_columns(Address.id))
+            )
+        stmt = stmt.values(label_marked=value).execution_options(
+            synchronize_session=False
+        )
+        result = db.execute(stmt)
+        db.commit()
+        address_data_version.bump()
+        return result.rowcount
 
     def search(
         self,
@@ -134,49 +344,208 @@ class AddressRepository:
         *,
         q: str | None = None,
         label_marked: bool | None = None,
+        fields: Mapping[str, str | None] | None = None,
+        limit: int = 50,
+        offset: int = 0,
+        sort_field: str = "id",
+        sort_direction: str = "asc",
+        columns: Sequence[str] | None = None,
+        raw: bool = False,
+    ) -> List[Any]:
+        return self.search_page(
+            db,
+            q=q,
+            label_marked=label_marked,
+            fields=fields,
+            limit=limit,
+            offset=offset,
+            sort_field=sort_field,
+            sort_direction=sort_direction,
+            columns=columns,
+            raw=raw,
+        ).items
+
+    def search_page(
+        self,
+        db: Session,
+        *,
+        q: str | None = None,
+        label_marked: bool | None = None,
+        fields: Mapping[str, str | None] | None = None,
         limit: int = 50,
         offset: int = 0,
         sort_field: str = "id",
         sort_direction: str = "asc",
-    ) -> List[Address]:
-        filters: list = []
+        after: Cursor | None = None,
+        columns: Sequence[str] | None = None,
+        raw: bool = False,
+    ) -> Page[Any]:
+        """Search addresses; see query_language for the ``q`` syntax.
+
+        ``fields`` maps first_name/last_name/city/street to a value
+        (exact, or prefix with a trailing ``*``). ``columns`` narrows the
+        SELECT to those READ_FIELDS and yields dicts instead of entities,
+        or the bare column tuples with ``raw`` (see ``column_data``).
+        """
+        stmt, fts_match = self._search_stmt(
+            q=q, label_marked=label_marked, fields=fields
+        )
+        return self._page(
+            db,
+            stmt,
+            fts_match,
+            limit=limit,
+            offset=offset,
+            sort_field=sort_field,
+            sort_direction=sort_direction,
+            after=after,
+            columns=columns,
+            raw=raw,
+        )
+
+    def search_stats(
+        self,
+        db: Session,
+        *,
+        q: str | None = None,
+        label_marked: bool | None = None,
+        fields: Mapping[str, str | None] | None = None,
+    ) -> List[tuple[str, bool, int]]:
+        """(city, label_marked, count) groups for the search filter.
+
+        One grouped pass over the matching rows; the total and both
+        facets are sums over these groups.
+        """
+        stmt, _ = self._search_stmt(
+            q=q, label_marked=label_marked, fields=fields
+        )
+        stmt = stmt.with_only_columns(
+            Address.city, Address.label_marked, func.count()
+        ).group_by(Address.city, Address.label_marked)
+        return [tuple(row) for row in db.execute(stmt).all()]
+
+    def _search_stmt(
+        self,
+        *,
+        q: str | None,
+        label_marked: bool | None,
+        fields: Mapping[str, str | None] | None = None,
+    ) -> tuple[Select[tuple[Address]], Subquery | None]:
+        compiled = compile_query(q, fields)
+        filters: list = list(compiled.filters)
 
         if label_marked is not None:
             filters.append(Address.label_marked == label_marked)
 
-        if q:
-            q_filter = or_(
-                Address.first_name.ilike(f"%{q}%"),
-                Address.last_name.ilike(f"%{q}%"),
-                Address.street.ilike(f"%{q}%"),
-                Address.city.ilike(f"%{q}%"),
-                Address.postal_code.ilike(f"%{q}%"),
-            )
-            filters.append(q_filter)
+        fts_match = None
+        if compiled.fts_terms:
+            fts_match = match_subquery(compiled.fts_terms)
 
-        where_expr = and_(*filters) if filters else None
+        stmt: Select[tuple[Address]] = select(Address)
+        if fts_match is not None:
+            stmt = stmt.join(fts_match, fts_match.c.rowid == Address.id)
+        if filters:
+            stmt = stmt.where(and_(*filters))
+        return stmt, fts_match
 
+    def _page(
+        self,
+        db: Session,
+        stmt: Select[tuple[Address]],
+        fts_match: Subquery | None,
+        *,
+        limit: int,
+        offset: int,
+        sort_field: str,
+        sort_direction: str,
+        after: Cursor | None,
+        columns: Sequence[str] | None = None,
+        raw: bool = False,
+    ) -> Page[Any]:
         # Validate sort field
-        valid_fields = [
-            "id", "first_name", "last_name", "street", "apartment_no",
-            "city", "postal_code", "description", "label_marked"
-        ]
-        if sort_field not in valid_fields:
+        if sort_field not in SORT_FIELDS:
+            sort_field = "id"
+        # Relevance is only meaningful for a full-text query
+        if sort_field == "relevance" and fts_match is None:
             sort_field = "id"
 
-        # Get the column to sort by
-        sort_column = getattr(Address, sort_field)
-
-        # Apply sort direction
-        if sort_direction.lower() == "desc":
-            order_clause = sort_column.desc()
+        # Get the column to sort by (bm25: lower is better, so asc = best)
+        if sort_field == "relevance":
+            sort_column = fts_match.c.rank
         else:
-            order_clause = sort_column.asc()
+            sort_column = getattr(Address, sort_field)
 
-        stmt: Select[tuple[Address]] = select(Address)
-        if where_expr is not None:
-            stmt = stmt.where(where_expr)
-        stmt = stmt.order_by(order_clause)
-        stmt = stmt.limit(limit).offset(offset)
+        if columns:
+            # Plain column tuples instead of entities: no identity map,
+            # no attribute instrumentation, and only the requested fields
+            stmt = stmt.with_only_columns(*_columns(columns))
+        # The sort value rides along so the next cursor can be built
+        stmt = stmt.add_columns(sort_column.label("sort_value"))
+        stmt = apply_keyset(
+            stmt,
+            sort_field=sort_field,
+            sort_column=sort_column,
+            id_column=Address.id,
+            sort_direction=sort_direction,
+            limit=limit,
+            offset=offset,
+            after=after,
+            nullable=sort_field in NULLABLE_SORT_FIELDS,
+        )
+        rows = db.execute(stmt).all()
+        if columns:
+            # Rows expose .id, which is all build_page needs of an item
+            rows = [(row, row.sort_value) for row in rows]
+        page = build_page(
+            rows,
+            limit=limit,
+            sort_field=sort_field,
+            sort_direction=sort_direction,
+        )
+        if columns and not raw:
+            page.items = row_dicts(page.items, columns)
+        return page
 
-        return list(db.scalars(stmt).all())
+    def bulk_rows(
+        self,
+        db: Session,
+        *,
+        columns: Sequence[str],
+        ids: Sequence[int] | None = None,
+        label_marked: bool | None = None,
+    ) -> List[Any]:
+        """Column tuples (id first) of many addresses, ordered by id."""
+        stmt = select(*_columns(columns)).order_by(Address.id)
+        if ids is not None:
+            stmt = stmt.where(Address.id.in_(ids))
+        if label_marked is not None:
+            stmt = stmt.where(Address.label_marked == label_marked)
+        return db.execute(stmt).all()
+
+
+def _column_names(names: Sequence[str]) -> List[str]:
+    # id always comes first: cursors and lookups by id need it
+    return ["id", *(name for name in names if name != "id")]
+
+
+def _columns(names: Sequence[str]) -> List[Any]:
+    return [getattr(Address, name) for name in _column_names(names)]
+
+
+def column_data(
+    rows: Sequence[Any], names: Sequence[str]
+) -> Dict[str, List[Any]]:
+    """Transpose ``raw`` column tuples into one list per field."""
+    keys = _column_names(names)
+    by_key = dict(zip(keys, zip(*rows))) if rows else {}
+    return {name: list(by_key.get(name, ())) for name in names}
+
+
+def row_dicts(rows: Sequence[Any], names: Sequence[str]) -> List[Dict]:
+    keys = _column_names(names)
+    # zip() stops before any trailing sort_value column
+    items = [dict(zip(keys, row)) for row in rows]
+    if "id" not in names:
+        for item in items:
+            del item["id"]
+    return items
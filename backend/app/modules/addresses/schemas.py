@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+from typing import Any, Dict, List, Literal
+
 from pydantic import BaseModel, Field
+from typing_extensions import TypedDict
 
 
 class AddressBase(BaseModel):
@@ -43,6 +46,118 @@ class AddressRead(BaseModel):
         from_attributes = True
 
 
+class BulkOperation(BaseModel):
+    op: Literal["update", "delete"]
+    id: int
+    # Same semantics as PATCH /{address_id}; ignored for deletes
+    changes: AddressUpdate | None = None
+
+
+class BulkRequest(BaseModel):
+    """Operations for POST /bulk; ``atomic`` rolls back everything if
+    any item fails, ``best_effort`` applies the items that are valid."""
+
+    operations: List[BulkOperation] = Field(min_length=1, max_length=5000)
+    mode: Literal["atomic", "best_effort"] = "atomic"
+
+
+class AddressRow(TypedDict, total=False):
+    """AddressRead as a plain dict built from a column tuple.
+
+    Serialized through a cached TypeAdapter, skipping model instances;
+    ``total=False`` lets sparse fieldsets use it as well.
+    """
+
+    id: int
+    first_name: str
+    last_name: str
+    street: str
+    apartment_no: str | None
+    city: str
+    postal_code: str
+    description: str | None
+    label_marked: bool
+
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+
+class AddressFacets(BaseModel):
+    label_marked: Dict[str, int]
+    city: List[FacetCount]
+
+
+class AddressSuggestion(BaseModel):
+    value: str
+    count: int
+
+
+class AddressPage(BaseModel):
+    """Paged response for cursor mode and/or ``with_total=true``.
+
+    Pass ``next_cursor`` back as ``cursor`` for the following page.
+    """
+
+    items: List[AddressRead]
+    next_cursor: str | None = None
+    total: int | None = None
+    facets: AddressFacets | None = None
+
+
+class AddressPageBody(TypedDict):
+    """AddressPage over AddressRow items, for the same fast path."""
+
+    items: List[AddressRow]
+    next_cursor: str | None
+    total: int | None
+    facets: Dict[str, Any] | None
+
+
+class AddressColumns(TypedDict, total=False):
+    """``format=columns`` body: field names once, then one list each.
+
+    ``next_cursor``/``total``/``facets`` appear in cursor and
+    ``with_total`` mode, as in AddressPage.
+    """
+
+    columns: List[str]
+    data: Dict[str, List[Any]]
+    next_cursor: str | None
+    total: int | None
+    facets: Dict[str, Any] | None
+
+
+class DuplicateCluster(BaseModel):
+    """Addresses that look like one person at one address.
+
+    ``score`` is the weakest pair similarity linking the cluster;
+    ``keep_id`` is the most complete row, suggested as merge target.
+    """
+
+    ids: List[int]
+    score: float
+    keep_id: int
+    items: List[AddressRead]
+
+
+class DuplicateReport(BaseModel):
+    clusters: List[DuplicateCluster]
+    total_clusters: int
+    duplicate_rows: int
+    rows_scanned: int
+    pairs_compared: int
+    elapsed_seconds: float
+
+
+class DuplicateMergeRequest(BaseModel):
+    """Collapse ``merge_ids`` into ``keep_id``; the others are deleted."""
+
+    keep_id: int
+    merge_ids: List[int] = Field(min_length=1, max_length=500)
+
+
 class SearchQuery(BaseModel):
     q: str | None = None
     first_name: str | None = None
@@ -52,3 +167,17 @@ class SearchQuery(BaseModel):
     label_marked: bool | None = None
     limit: int | None = Field(default=50, ge=1, le=500)
     offset: int | None = Field(default=0, ge=0)
+
+
+class LabelMarkRequest(BaseModel):
+    """Target rows for a bulk label_marked change: exactly one of
+    ``ids``, ``filter`` (same parameters as /search) or ``all``.
+
+    Paging fields of ``filter`` are ignored; every matching row changes.
+    """
+
+    label_marked: bool
+    # Same cap as BulkRequest; the ids go into one IN (...) list
+    ids: List[int] | None = Field(default=None, max_length=5000)
+    filter: SearchQuery | None = None
+    all: bool = False
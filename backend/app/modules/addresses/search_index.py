@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from typing import List
+
+from sqlalchemy import (
+    Select, Subquery, column, func, literal_column, select, table, text,
+)
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.schema import add_missing_columns
+from .folding import backfill_folded_columns
+from .identity import refresh_identity_columns
+from .models import Address
+
+
+# Full-text index over the addresses table (SQLite FTS5, external content).
+# The trigram tokenizer gives substring matching, so the index answers the
+# same "%q%" questions as the old ilike search. It indexes the folded shadow
+# columns, so queries must be folded with fold_text() too.
+FTS_TABLE = "addresses_fts"
+FTS_COLUMNS = [
+    "first_name_folded",
+    "last_name_folded",
+    "street_folded",
+    "city_folded",
+    "postal_code",
+    "description_folded",
+]
+# Trigram tokens are 3 characters; shorter terms cannot use the index.
+MIN_TERM_LENGTH = 3
+
+_cols = ", ".join(FTS_COLUMNS)
+_new_cols = ", ".join(f"new.{c}" for c in FTS_COLUMNS)
+_old_cols = ", ".join(f"old.{c}" for c in FTS_COLUMNS)
+
+_FTS_DDL = (
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({_cols}, "
+    "content='addresses', content_rowid='id', tokenize='trigram')"
+)
+_TRIGGERS_DDL = {
+    "addresses_fts_ai": (
+        "CREATE TRIGGER addresses_fts_ai AFTER INSERT ON addresses BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, {_cols}) "
+        f"VALUES (new.id, {_new_cols}); "
+        "END"
+    ),
+    "addresses_fts_ad": (
+        "CREATE TRIGGER addresses_fts_ad AFTER DELETE ON addresses BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_cols}) "
+        f"VALUES ('delete', old.id, {_old_cols}); "
+        "END"
+    ),
+    # Only re-index when an indexed column changes (label toggles do not)
+    "addresses_fts_au": (
+        f"CREATE TRIGGER addresses_fts_au AFTER UPDATE OF {_cols} "
+        "ON addresses BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_cols}) "
+        f"VALUES ('delete', old.id, {_old_cols}); "
+        f"INSERT INTO {FTS_TABLE}(rowid, {_cols}) "
+        f"VALUES (new.id, {_new_cols}); "
+        "END"
+    ),
+}
+
+addresses_fts = table(FTS_TABLE, column("rowid"))
+
+
+def _existing_sql(conn: Connection, name: str) -> str | None:
+    return conn.execute(
+        text("SELECT sql FROM sqlite_master WHERE name = :name"),
+        {"name": name},
+    ).scalar()
+
+
+def ensure_search_index(bind: Engine | Connection) -> None:
+    """Create (or upgrade) the search columns, FTS table and triggers.
+
+    Adds the folded shadow and identity columns to databases created
+    before they existed and backfills them. Safe to call on every
+    startup. The index is rebuilt from the addresses table whenever the
+    virtual table or a trigger had to be (re)created, e.g. after the
+    addresses table was dropped.
+    """
+    if isinstance(bind, Engine):
+        with bind.begin() as conn:
+            ensure_search_index(conn)
+        return
+
+    conn = bind
+    add_missing_columns(conn, Address.__table__)
+    backfill_folded_columns(conn)
+    refresh_identity_columns(conn)
+
+    rebuild = False
+    if _existing_sql(conn, FTS_TABLE) != _FTS_DDL:
+        conn.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+        conn.execute(text(_FTS_DDL))
+        rebuild = True
+    for name, ddl in _TRIGGERS_DDL.items():
+        if rebuild or _existing_sql(conn, name) != ddl:
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+            conn.execute(text(ddl))
+            # Writes made without the trigger are missing from the index
+            rebuild = True
+    if rebuild:
+        conn.execute(
+            text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        )
+
+
+def _match_expression(terms: List[str]) -> str:
+    # Each term becomes a quoted phrase (substring for trigram); implicit AND
+    return " ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+
+def match_subquery(terms: List[str]) -> Subquery:
+    """Rows matching all terms, with their bm25 score as ``rank``.
+
+    Lower ``rank`` means a better match (FTS5 convention).
+    """
+    fts_ref = literal_column(FTS_TABLE)
+    stmt = select(
+        addresses_fts.c.rowid.label("rowid"),
+        func.bm25(fts_ref).label("rank"),
+    ).where(fts_ref.op("MATCH")(_match_expression(terms)))
+    return stmt.subquery("fts_match")
+
+
+def match_ids(terms: List[str]) -> Select:
+    """SELECT of the ids matching all terms (for IN / NOT IN filters)."""
+    fts_ref = literal_column(FTS_TABLE)
+    return select(addresses_fts.c.rowid).where(
+        fts_ref.op("MATCH")(_match_expression(terms))
+    )
+
+
+__all__ = [
+    "FTS_TABLE",
+    "MIN_TERM_LENGTH",
+    "ensure_search_index",
+    "match_ids",
+    "match_subquery",
+]
@@ -1,13 +1,99 @@
 from __future__ import annotations
 
 import re
-from typing import Optional
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence
 
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
+from app.core.config import get_settings
+from app.core.pagination import Page
+from .cache import ResultCache, VersionedCache, address_data_version
+from .duplicates import find_duplicates
+from .folding import folded_values
+from .fuzzy import fuzzy_index
 from .models import Address
-from .repositories import AddressRepository
+from .query_language import parse_query
+from .repositories import (
+    READ_FIELDS, SORT_FIELDS, AddressRepository, column_data, row_dicts,
+)
+from .schemas import AddressColumns, AddressPageBody, AddressRow
+from .suggest import SUGGEST_FIELDS, suggest_index
 POSTAL_CODE_RE = re.compile(r"^[0-9A-Za-z\-\s]{3,20}$")
+# Cities listed in search facets (most frequent first)
+FACET_CITY_LIMIT = 50
+# Ranked fuzzy hits checked against label_marked per query
+FUZZY_FETCH_CHUNK = 500
+
+# Totals/facets per filter, dropped on the next write to addresses
+_stats_cache = VersionedCache(address_data_version)
+# Duplicate scans per min_score; a full-table scan is worth keeping
+# until the next write
+_duplicates_cache = VersionedCache(address_data_version, max_entries=8)
+# Serialized list/search responses, dropped on the next write as well
+_result_cache = ResultCache(
+    address_data_version,
+    max_entries=get_settings().address_cache_max_entries,
+    ttl_seconds=get_settings().address_cache_ttl_seconds,
+)
+# Built once: serializing column-tuple dicts through these skips both
+# ORM hydration and per-row model validation
+_rows_adapter = TypeAdapter(List[AddressRow])
+_page_adapter = TypeAdapter(AddressPageBody)
+_columns_adapter = TypeAdapter(AddressColumns)
+
+
+def _filter_key(
+    q: str | None,
+    label_marked: bool | None,
+    fields: Mapping[str, str | None] | None,
+) -> tuple:
+    # Keyed on the parsed terms: spacing between terms does not change
+    # the result, spacing inside a "quoted phrase" does
+    terms = tuple(
+        (t.value, t.field, t.negated, t.prefix) for t in parse_query(q)
+    )
+    return (
+        terms,
+        label_marked,
+        tuple(sorted(
+            (k, v.strip()) for k, v in (fields or {}).items()
+            if v and v.strip()
+        )),
+    )
+
+
+def _order_key(sort_field: str, sort_direction: str) -> tuple:
+    # Same fallbacks as the repository, so equivalent requests share a key
+    field = sort_field if sort_field in SORT_FIELDS else "id"
+    direction = "desc" if sort_direction.lower() == "desc" else "asc"
+    return field, direction
+
+
+def normalize_postal_code(postal_code: str) -> str:
+    normalized = postal_code.strip()
+    if not POSTAL_CODE_RE.match(normalized):
+        # Leave validation lenient; API may apply stricter checks later
+        # but keep it within allowed charset/length
+        raise ValueError("Invalid postal code format")
+    # Uppercase letters; keep digits and dash/space as-is
+    return normalized.upper()
+
+
+def _most_complete(rows: Sequence[Mapping[str, Any]]) -> int:
+    # Most optional fields filled, then the oldest row
+    best = max(rows, key=lambda r: (
+        bool(r["apartment_no"]), bool(r["description"]), -r["id"]
+    ))
+    return best["id"]
+
+
+def _written(fields: Mapping[str, Any]) -> dict:
+    """The fields of an ``_update_fields`` result that get written."""
+    return {
+        name: value for name, value in fields.items()
+        if value is not None and value is not ...
+    }
 
 
 class AddressService:
@@ -15,13 +101,7 @@ class AddressService:
         self.repo = repo or AddressRepository()
 
     def _normalize_postal_code(self, postal_code: str) -> str:
-        normalized = postal_code.strip()
-        if not POSTAL_CODE_RE.match(normalized):
-            # Leave validation lenient; API may apply stricter checks later
-            # but keep it within allowed charset/length
-            raise ValueError("Invalid postal code format")
-        # Uppercase letters; keep digits and dash/space as-is
-        return normalized.upper()
+        return normalize_postal_code(postal_code)
 
     def create(
         self,
@@ -40,8 +120,7 @@ class AddressService:
             description.strip() if description and description.strip()
             else None
         )
-        return self.repo.create(
-            db,
+        fields = dict(
             first_name=first_name.strip(),
             last_name=last_name.strip(),
             street=street.strip(),
@@ -50,6 +129,12 @@ class AddressService:
             postal_code=normalized_postal,
             description=processed_description,
         )
+        address = self.repo.create(
+            db, **fields, folded=folded_values(fields)
+        )
+        fuzzy_index.upsert(address)
+        suggest_index.apply(None, suggest_index.snapshot(address))
+        return address
 
     def update(
         self,
@@ -65,13 +150,47 @@ class AddressService:
         description: str | None = None,
         label_marked: bool | None = None,
     ) -> Address:
+        fields = self._update_fields(
+            first_name=first_name,
+            last_name=last_name,
+            street=street,
+            apartment_no=apartment_no,
+            city=city,
+            postal_code=postal_code,
+            description=description,
+        )
+        # Only fields actually being written get their folded form refreshed
+        changed = _written(fields)
+        before = suggest_index.snapshot(address)
+        address = self.repo.update(
+            db,
+            address,
+            **fields,
+            label_marked=label_marked,
+            folded=folded_values(changed),
+        )
+        fuzzy_index.upsert(address)
+        suggest_index.apply(before, suggest_index.snapshot(address))
+        return address
+
+    def _update_fields(
+        self,
+        *,
+        first_name: str | None = None,
+        last_name: str | None = None,
+        street: str | None = None,
+        apartment_no: str | None = None,
+        city: str | None = None,
+        postal_code: str | None = None,
+        description: str | None = None,
+    ) -> dict:
+        """Normalized PATCH values: None = unchanged, and for description
+        Ellipsis = unchanged."""
         normalized_postal: str | None = None
         if postal_code is not None:
             normalized_postal = self._normalize_postal_code(postal_code)
 
-        return self.repo.update(
-            db,
-            address,
+        return dict(
             first_name=(
                 first_name.strip() if isinstance(first_name, str) else None
             ),
@@ -89,8 +208,449 @@ class AddressService:
                 if isinstance(description, str) and description.strip()
                 else ...
             ),
-            label_marked=label_marked,
         )
 
+    def delete(self, db: Session, address_id: int) -> None:
+        before = None
+        if suggest_index.built:
+            address = self.repo.get_by_id(db, address_id)
+            before = suggest_index.snapshot(address) if address else None
+        self.repo.delete(db, address_id)
+        fuzzy_index.remove(address_id)
+        suggest_index.apply(before, None)
+
+    def bulk(
+        self,
+        db: Session,
+        operations: Sequence[Mapping[str, Any]],
+        *,
+        atomic: bool = True,
+    ) -> dict:
+        """Run ``{"op": "update"|"delete", "id", "changes"}`` items in one
+        transaction and report a status per item.
+
+        Unknown ids, invalid values and repeated ids fail their item. With
+        ``atomic`` any failure cancels the whole batch; otherwise the valid
+        items are still applied.
+        """
+        results: List[Dict[str, Any]] = []
+        updates: List[Dict[str, Any]] = []
+        deletes: List[int] = []
+        seen: set[int] = set()
+        existing = self.repo.existing_ids(
+            db, [operation["id"] for operation in operations]
+        )
+        for index, operation in enumerate(operations):
+            address_id = operation["id"]
+            result = {"index": index, "id": address_id, "op": operation["op"]}
+            results.append(result)
+            if address_id in seen:
+                result.update(status="error", detail="Duplicate id in request")
+                continue
+            seen.add(address_id)
+            if address_id not in existing:
+                result.update(status="not_found", detail="Address not found")
+                continue
+            if operation["op"] == "delete":
+                deletes.append(address_id)
+                result["status"] = "deleted"
+                continue
+
+            changes = dict(operation.get("changes") or {})
+            label_marked = changes.pop("label_marked", None)
+            try:
+                written = _written(self._update_fields(**changes))
+            except ValueError as exc:
+                result.update(status="error", detail=str(exc))
+                continue
+            values = {**written, **folded_values(written)}
+            if label_marked is not None:
+                values["label_marked"] = label_marked
+            if not values:
+                result.update(status="error", detail="No changes given")
+                continue
+            updates.append({"id": address_id, **values})
+            result["status"] = "updated"
+
+        applied = {"updated", "deleted"}
+        failed = sum(1 for r in results if r["status"] not in applied)
+        committed = not (atomic and failed) and bool(updates or deletes)
+        if committed:
+            self._apply_bulk(db, updates, deletes)
+        elif failed:
+            for result in results:
+                if result["status"] in applied:
+                    result["status"] = "skipped"
+        return {
+            "mode": "atomic" if atomic else "best_effort",
+            "committed": committed,
+            "updated": len(updates) if committed else 0,
+            "deleted": len(deletes) if committed else 0,
+            "failed": failed,
+            "results": results,
+        }
+
+    def _apply_bulk(
+        self,
+        db: Session,
+        updates: List[Dict[str, Any]],
+        deletes: List[int],
+    ) -> None:
+        updated_ids = [values["id"] for values in updates]
+        before: Dict[int, dict] = {}
+        if suggest_index.built:
+            rows = self.repo.get_many(
+                db, updated_ids + deletes, ["id", *SUGGEST_FIELDS]
+            )
+            before = {row["id"]: row for row in rows}
+        self.repo.apply_bulk(db, updates=updates, deletes=deletes)
+        for address_id in deletes:
+            fuzzy_index.remove(address_id)
+            suggest_index.apply(before.get(address_id), None)
+        if updated_ids and (fuzzy_index.built or suggest_index.built):
+            for address in self.repo.get_many(db, updated_ids):
+                fuzzy_index.upsert(address)
+                suggest_index.apply(
+                    before.get(address.id), suggest_index.snapshot(address)
+                )
+
+    def duplicates(
+        self, db: Session, *, min_score: float, limit: int = 100
+    ) -> dict:
+        """Clusters of likely duplicates, largest first, with their rows."""
+        version = address_data_version.value
+        key = round(min_score, 3)
+        scan = _duplicates_cache.get(key)
+        if scan is None:
+            scan = find_duplicates(db, min_score)
+            _duplicates_cache.set(key, scan, version)
+        shown = scan.clusters[:limit]
+        rows = self.repo.get_many(
+            db, [i for ids, _ in shown for i in ids], READ_FIELDS
+        )
+        by_id = {row["id"]: row for row in rows}
+        clusters = []
+        for ids, score in shown:
+            items = [by_id[i] for i in ids if i in by_id]
+            if len(items) < 2:
+                continue
+            clusters.append({
+                "ids": ids,
+                "score": score,
+                "keep_id": _most_complete(items),
+                "items": items,
+            })
+        return {
+            "clusters": clusters,
+            "total_clusters": len(scan.clusters),
+            "duplicate_rows": sum(len(ids) for ids, _ in scan.clusters),
+            "rows_scanned": scan.rows_scanned,
+            "pairs_compared": scan.pairs_compared,
+            "elapsed_seconds": round(scan.elapsed_seconds, 3),
+        }
+
+    def merge_duplicates(
+        self, db: Session, keep_id: int, merge_ids: Sequence[int]
+    ) -> List[int]:
+        """Collapse ``merge_ids`` into ``keep_id`` in one transaction.
+
+        Empty apartment_no/description of the kept row are filled from
+        the merged ones (lowest id first) and it stays label-marked if
+        any of them was; the merged rows are deleted. Returns their ids.
+        """
+        deletes = sorted(set(merge_ids) - {keep_id})
+        rows = {a.id: a for a in self.repo.get_many(db, [keep_id, *deletes])}
+        keep = rows[keep_id]
+        others = [rows[i] for i in deletes]
+        values: Dict[str, Any] = {}
+        for name in ("apartment_no", "description"):
+            if getattr(keep, name):
+                continue
+            found = next(
+                (getattr(a, name) for a in others if getattr(a, name)), None
+            )
+            if found:
+                values[name] = found
+        if not keep.label_marked and any(a.label_marked for a in others):
+            values["label_marked"] = True
+        updates = []
+        if values:
+            updates.append({"id": keep_id, **values, **folded_values(values)})
+        self._apply_bulk(db, updates, deletes)
+        return deletes
+
+    def set_label_marked(
+        self,
+        db: Session,
+        value: bool,
+        *,
+        ids: Sequence[int] | None = None,
+        search_filter: Mapping[str, Any] | None = None,
+        match_all: bool = False,
+    ) -> int:
+        """Mark/unmark every address in ``ids``, matching
+        ``search_filter`` (the /search parameters) or, with ``match_all``,
+        the whole table."""
+        params = dict(search_filter or {})
+        return self.repo.set_label_marked(
+            db,
+            value,
+            ids=ids,
+            q=params.pop("q", None),
+            label_marked=params.pop("label_marked", None),
+            fields=params,
+            match_all=match_all,
+        )
+
+    def suggest(
+        self, db: Session, *, field: str, prefix: str, limit: int = 10
+    ) -> List[dict]:
+        return [
+            {"value": value, "count": count}
+            for value, count in suggest_index.suggest(
+                db, field, prefix, limit
+            )
+        ]
+
     def search(self, db: Session, **kwargs):
         return self.repo.search(db, **kwargs)
+
+    def list_json(
+        self,
+        db: Session,
+        *,
+        limit: int = 50,
+        offset: int = 0,
+        sort_field: str = "id",
+        sort_direction: str = "asc",
+        columns: Sequence[str] = READ_FIELDS,
+        layout: str = "rows",
+    ) -> bytes:
+        """JSON body of ``AddressRepository.list``, served from cache.
+
+        ``layout="columns"`` gives ``{"columns": [...], "data": {...}}``.
+        """
+        key = (
+            "list",
+            limit,
+            offset,
+            *_order_key(sort_field, sort_direction),
+            tuple(columns),
+            layout,
+        )
+        return self._cached_json(key, columns, layout, lambda raw: (
+            self.repo.list(
+                db,
+                limit=limit,
+                offset=offset,
+                sort_field=sort_field,
+                sort_direction=sort_direction,
+                columns=columns,
+                raw=raw,
+            )
+        ))
+
+    def search_json(
+        self,
+        db: Session,
+        *,
+        q: str | None = None,
+        label_marked: bool | None = None,
+        fields: Mapping[str, str | None] | None = None,
+        limit: int = 50,
+        offset: int = 0,
+        sort_field: str = "id",
+        sort_direction: str = "asc",
+        columns: Sequence[str] = READ_FIELDS,
+        layout: str = "rows",
+    ) -> bytes:
+        """JSON body of ``search``, served from cache."""
+        key = (
+            "search",
+            _filter_key(q, label_marked, fields),
+            limit,
+            offset,
+            *_order_key(sort_field, sort_direction),
+            tuple(columns),
+            layout,
+        )
+        return self._cached_json(key, columns, layout, lambda raw: (
+            self.repo.search(
+                db,
+                q=q,
+                label_marked=label_marked,
+                fields=fields,
+                limit=limit,
+                offset=offset,
+                sort_field=sort_field,
+                sort_direction=sort_direction,
+                columns=columns,
+                raw=raw,
+            )
+        ))
+
+    def bulk_json(
+        self,
+        db: Session,
+        *,
+        columns: Sequence[str] = READ_FIELDS,
+        ids: Sequence[int] | None = None,
+        label_marked: bool | None = None,
+        layout: str = "columns",
+    ) -> bytes:
+        """All matching addresses in one body, ordered by id."""
+        rows = self.repo.bulk_rows(
+            db, columns=columns, ids=ids, label_marked=label_marked
+        )
+        if layout == "columns":
+            return self.columns_json(columns, column_data(rows, columns))
+        return self.rows_json(row_dicts(rows, columns))
+
+    def cache_stats(self) -> dict:
+        return _result_cache.stats()
+
+    @staticmethod
+    def rows_json(rows: List[Dict[str, Any]]) -> bytes:
+        return _rows_adapter.dump_json(rows)
+
+    @staticmethod
+    def columns_json(
+        columns: Sequence[str],
+        data: Mapping[str, List[Any]],
+        *,
+        page: Page[Any] | None = None,
+        stats: dict | None = None,
+    ) -> bytes:
+        """Column-wise body: every key name appears once."""
+        body: Dict[str, Any] = {"columns": list(columns), "data": data}
+        if page is not None:
+            body.update(next_cursor=page.next_cursor, total=None, facets=None)
+            if stats is not None:
+                body.update(stats)
+        return _columns_adapter.dump_json(body)
+
+    @staticmethod
+    def page_json(
+        page: Page[Any],
+        stats: dict | None,
+        columns: Sequence[str] | None = None,
+    ) -> bytes:
+        """Envelope body; with ``columns``, items are raw column tuples."""
+        if columns is not None:
+            return AddressService.columns_json(
+                columns, column_data(page.items, columns),
+                page=page, stats=stats,
+            )
+        body = {
+            "items": page.items,
+            "next_cursor": page.next_cursor,
+            "total": None,
+            "facets": None,
+        }
+        if stats is not None:
+            body.update(stats)
+        return _page_adapter.dump_json(body)
+
+    def _cached_json(
+        self,
+        key: tuple,
+        columns: Sequence[str],
+        layout: str,
+        load: Callable[[bool], List[Any]],
+    ) -> bytes:
+        body = _result_cache.get(key)
+        if body is not None:
+            return body
+        version = address_data_version.value
+        if layout == "columns":
+            rows = load(True)
+            body = self.columns_json(columns, column_data(rows, columns))
+        else:
+            body = self.rows_json(load(False))
+        _result_cache.set(key, body, version)
+        return body
+
+    def fuzzy_search(
+        self,
+        db: Session,
+        *,
+        q: str,
+        label_marked: bool | None = None,
+        limit: int = 50,
+        offset: int = 0,
+        columns: Sequence[str] | None = None,
+    ) -> List[Any]:
+        """Typo-tolerant search ranked by trigram similarity."""
+        needed = offset + limit
+        fetch = needed
+        while True:
+            ranked = [
+                row_id
+                for row_id, _ in fuzzy_index.search(db, q, limit=fetch)
+            ]
+            exhausted = len(ranked) < fetch
+            if label_marked is not None:
+                # Filtered in chunks; a short result asks the index for a
+                # longer ranking
+                kept: set[int] = set()
+                for start in range(0, len(ranked), FUZZY_FETCH_CHUNK):
+                    kept |= self.repo.filter_ids(
+                        db, ranked[start:start + FUZZY_FETCH_CHUNK],
+                        label_marked=label_marked,
+                    )
+                ranked = [row_id for row_id in ranked if row_id in kept]
+            if exhausted or len(ranked) >= needed:
+                break
+            fetch *= 4
+        page_ids = ranked[offset:needed]
+        if columns:
+            wanted = list(dict.fromkeys(["id", *columns]))
+            by_id = {
+                row["id"]: {name: row[name] for name in columns}
+                for row in self.repo.get_many(db, page_ids, wanted)
+            }
+        else:
+            by_id = {a.id: a for a in self.repo.get_many(db, page_ids)}
+        return [by_id[row_id] for row_id in page_ids if row_id in by_id]
+
+    def search_page(self, db: Session, **kwargs):
+        return self.repo.search_page(db, **kwargs)
+
+    def search_stats(
+        self,
+        db: Session,
+        *,
+        q: str | None = None,
+        label_marked: bool | None = None,
+        fields: Mapping[str, str | None] | None = None,
+    ) -> dict:
+        """Total and label_marked/city facet counts for a search filter."""
+        key = _filter_key(q, label_marked, fields)
+        cached = _stats_cache.get(key)
+        if cached is not None:
+            return cached
+
+        version = address_data_version.value
+        groups = self.repo.search_stats(
+            db, q=q, label_marked=label_marked, fields=fields
+        )
+        total = 0
+        by_label = {"true": 0, "false": 0}
+        by_city: dict[str, int] = {}
+        for city, marked, count in groups:
+            total += count
+            by_label["true" if marked else "false"] += count
+            by_city[city] = by_city.get(city, 0) + count
+        top_cities = sorted(by_city.items(), key=lambda kv: (-kv[1], kv[0]))
+        stats = {
+            "total": total,
+            "facets": {
+                "label_marked": by_label,
+                "city": [
+                    {"value": city, "count": count}
+                    for city, count in top_cities[:FACET_CITY_LIMIT]
+                ],
+            },
+        }
+        _stats_cache.set(key, stats, version)
+        return stats
@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import bisect
+import heapq
+import threading
+from typing import Dict, List, Mapping, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from .folding import fold_text
+from .models import Address
+
+
+SUGGEST_FIELDS = ("city", "street", "postal_code", "last_name")
+
+_PREFIX_END = "\U0010ffff"
+# A lookup ranks the matching slice directly up to this many values.
+# Prefixes matching more (an empty or one-letter prefix over a large
+# table) keep their best values precomputed and updated in place.
+SCAN_LIMIT = 1000
+# Values kept per precomputed prefix: twice the largest /suggest limit,
+# so a few decrements do not force a rescan
+TOP_CAPACITY = 100
+# Prefixes up to this length are precomputed on load, longer ones when
+# first looked up
+EAGER_PREFIX = 2
+
+
+class _Top:
+    """Best values of one prefix as (-count, value), sorted ascending.
+
+    Always the first ``len(entries)`` matches in that order, and every
+    match when ``complete``.
+    """
+
+    __slots__ = ("entries", "complete")
+
+    def __init__(self, entries: List[Tuple[int, str]], complete: bool):
+        self.entries = entries
+        self.complete = complete
+
+    def update(self, value: str, old: int, new: int) -> None:
+        """Re-rank ``value`` after its count went from ``old`` to
+        ``new`` (0 = not indexed)."""
+        entries = self.entries
+        present = False
+        if old:
+            pos = bisect.bisect_left(entries, (-old, value))
+            present = pos < len(entries) and entries[pos] == (-old, value)
+            if present:
+                del entries[pos]
+        if not new:
+            return
+        key = (-new, value)
+        # Values outside an incomplete list rank after its last entry, so
+        # anything ranking before it (or rising from inside) belongs in
+        if (
+            self.complete
+            or (present and new > old)
+            or (entries and key < entries[-1])
+        ):
+            bisect.insort(entries, key)
+            if len(entries) > TOP_CAPACITY:
+                entries.pop()
+                self.complete = False
+
+
+class PrefixIndex:
+    """Distinct values of one column kept sorted by their folded form.
+
+    A prefix lookup is two bisects into the sorted keys followed by a
+    top-k by frequency over the matching slice; prefixes with large
+    slices answer from a precomputed ranking instead.
+    """
+
+    def __init__(self) -> None:
+        self._keys: List[Tuple[str, str]] = []
+        self._counts: Dict[str, int] = {}
+        self._top: Dict[str, _Top] = {}
+
+    def load(self, counts: Mapping[str, int]) -> None:
+        self._counts = {v: n for v, n in counts.items() if v and n > 0}
+        self._keys = sorted((fold_text(v) or "", v) for v in self._counts)
+        self._top = {}
+        for length in range(EAGER_PREFIX + 1):
+            for prefix in sorted({key[:length] for key, _ in self._keys}):
+                lo, hi = self._slice(prefix)
+                if hi - lo > SCAN_LIMIT:
+                    self._top[prefix] = self._rank(lo, hi)
+
+    def add(self, value: str | None) -> None:
+        if not value:
+            return
+        count = self._counts.get(value, 0)
+        self._counts[value] = count + 1
+        folded = fold_text(value) or ""
+        if not count:
+            bisect.insort(self._keys, (folded, value))
+        self._update_top(value, folded, count, count + 1)
+
+    def discard(self, value: str | None) -> None:
+        count = self._counts.get(value) if value else None
+        if count is None:
+            return
+        folded = fold_text(value) or ""
+        self._update_top(value, folded, count, count - 1)
+        if count > 1:
+            self._counts[value] = count - 1
+            return
+        del self._counts[value]
+        key = (folded, value)
+        pos = bisect.bisect_left(self._keys, key)
+        if pos < len(self._keys) and self._keys[pos] == key:
+            del self._keys[pos]
+
+    def top(self, prefix: str, limit: int) -> List[Tuple[str, int]]:
+        folded = fold_text(prefix.strip()) or ""
+        ranked = self._top.get(folded)
+        if ranked is None or (
+            len(ranked.entries) < limit and not ranked.complete
+        ):
+            lo, hi = self._slice(folded)
+            if hi - lo <= SCAN_LIMIT:
+                best = heapq.nsmallest(limit, (
+                    (-self._counts[key[1]], key[1])
+                    for key in self._keys[lo:hi]
+                ))
+                return [(v, -n) for n, v in best]
+            ranked = self._top[folded] = self._rank(lo, hi)
+        return [(v, -n) for n, v in ranked.entries[:limit]]
+
+    def _slice(self, folded: str) -> Tuple[int, int]:
+        lo = bisect.bisect_left(self._keys, (folded,))
+        hi = bisect.bisect_left(self._keys, (folded + _PREFIX_END,))
+        return lo, hi
+
+    def _rank(self, lo: int, hi: int) -> _Top:
+        entries = heapq.nsmallest(TOP_CAPACITY + 1, (
+            (-self._counts[key[1]], key[1]) for key in self._keys[lo:hi]
+        ))
+        complete = len(entries) <= TOP_CAPACITY
+        return _Top(entries[:TOP_CAPACITY], complete)
+
+    def _update_top(
+        self, value: str, folded: str, old: int, new: int
+    ) -> None:
+        if not self._top:
+            return
+        for length in range(len(folded) + 1):
+            ranked = self._top.get(folded[:length])
+            if ranked is not None:
+                ranked.update(value, old, new)
+
+
+class SuggestIndex:
+    """Autocomplete data for the address form, one PrefixIndex per field.
+
+    Built lazily from the addresses table on the first lookup and kept
+    current by AddressService on every create/update/delete, so typing
+    in the form never reaches SQLite.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._built = False
+        self._fields = {name: PrefixIndex() for name in SUGGEST_FIELDS}
+
+    @property
+    def built(self) -> bool:
+        return self._built
+
+    def build(self, db: Session) -> None:
+        with self._lock:
+            for name, index in self._fields.items():
+                col = getattr(Address, name)
+                rows = db.execute(select(col, func.count()).group_by(col))
+                index.load({value: count for value, count in rows})
+            self._built = True
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._built = False
+            self._fields = {name: PrefixIndex() for name in SUGGEST_FIELDS}
+
+    @staticmethod
+    def snapshot(address: Address) -> Dict[str, str | None]:
+        """Suggestion-relevant values, taken before an update."""
+        return {name: getattr(address, name) for name in SUGGEST_FIELDS}
+
+    def apply(
+        self,
+        before: Mapping[str, str | None] | None,
+        after: Mapping[str, str | None] | None,
+    ) -> None:
+        """Move counts from the old values to the new ones."""
+        with self._lock:
+            if not self._built:
+                return
+            for name, index in self._fields.items():
+                old = before.get(name) if before else None
+                new = after.get(name) if after else None
+                if old == new:
+                    continue
+                index.discard(old)
+                index.add(new)
+
+    def suggest(
+        self, db: Session, field: str, prefix: str, limit: int = 10
+    ) -> List[Tuple[str, int]]:
+        if not self._built:
+            self.build(db)
+        with self._lock:
+            return self._fields[field].top(prefix, limit)
+
+
+suggest_index = SuggestIndex()
+
+
+__all__ = ["SUGGEST_FIELDS", "PrefixIndex", "SuggestIndex", "suggest_index"]
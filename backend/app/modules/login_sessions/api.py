@@ -1,19 +1,44 @@
 from __future__ import annotations
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import List, Union
+from fastapi import (
+    APIRouter, Depends, HTTPException, Query, Response, status,
+)
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
 from app.core.deps import get_db, require_admin
+from app.core.pagination import decode_cursor
 from .models import LoginSession
 from .repositories import LoginSessionRepository
-from .schemas import LoginSessionRead
+from .schemas import LoginSessionPage, LoginSessionRead
 from .services import LoginSessionService
 
 router = APIRouter(prefix="/api/login-sessions", tags=["login-sessions"])
 
 
-@router.get("", response_model=List[LoginSessionRead])
+def _json_response(body: bytes) -> Response:
+    # Pre-serialized from column tuples; response_model documents the shape
+    return Response(content=body, media_type="application/json")
+
+
+def _cursor_page(service: LoginSessionService, db: Session, cursor: str,
+                 **kwargs) -> Response:
+    # "?cursor=" (empty) requests the first page in cursor mode
+    try:
+        page = service.search_sessions_page(
+            db,
+            after=decode_cursor(cursor) if cursor else None,
+            as_rows=True,
+            **kwargs,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return _json_response(service.page_json(page))
+
+
+@router.get(
+    "", response_model=Union[List[LoginSessionRead], LoginSessionPage]
+)
 def list_login_sessions(
     db: Session = Depends(get_db),
     _: object = Depends(require_admin),
@@ -21,18 +46,32 @@ def list_login_sessions(
     offset: int = Query(default=0, ge=0),
     sort_field: str = Query(default="login_time"),
     sort_direction: str = Query(default="desc"),
-) -> List[LoginSession]:
+    cursor: str | None = Query(default=None),
+) -> Response:
     service = LoginSessionService()
-    return service.list_sessions(
+    if cursor is not None:
+        return _cursor_page(
+            service,
+            db,
+            cursor,
+            limit=limit,
+            offset=offset,
+            sort_field=sort_field,
+            sort_direction=sort_direction,
+        )
+    return _json_response(service.rows_json(service.list_sessions(
         db,
         limit=limit,
         offset=offset,
         sort_field=sort_field,
         sort_direction=sort_direction,
-    )
+        as_rows=True,
+    )))
 
 
-@router.get("/search", response_model=List[LoginSessionRead])
+@router.get(
+    "/search", response_model=Union[List[LoginSessionRead], LoginSessionPage]
+)
 def search_login_sessions(
     db: Session = Depends(get_db),
     _: object = Depends(require_admin),
@@ -43,9 +82,23 @@ def search_login_sessions(
     offset: int = Query(default=0, ge=0),
     sort_field: str = Query(default="login_time"),
     sort_direction: str = Query(default="desc"),
-) -> List[LoginSession]:
+    cursor: str | None = Query(default=None),
+) -> Response:
     service = LoginSessionService()
-    return service.search_sessions(
+    if cursor is not None:
+        return _cursor_page(
+            service,
+            db,
+            cursor,
+            user_id=user_id,
+            active_only=active_only,
+            q=q,
+            limit=limit,
+            offset=offset,
+            sort_field=sort_field,
+            sort_direction=sort_direction,
+        )
+    return _json_response(service.rows_json(service.search_sessions(
         db,
         user_id=user_id,
         active_only=active_only,
@@ -54,7 +107,8 @@ def search_login_sessions(
         offset=offset,
         sort_field=sort_field,
         sort_direction=sort_direction,
-    )
+        as_rows=True,
+    )))
 
 
 @router.get("/active-count")
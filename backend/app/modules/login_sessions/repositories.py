@@ -1,9 +1,11 @@
 from __future__ import annotations
 from datetime import datetime
-from typing import List, Optional
-from sqlalchemy import Select, asc, desc, select, delete, or_, func
+from typing import Any, List, Optional
+from sqlalchemy import Select, select, delete, or_, func
 from sqlalchemy.orm import Session
 
+from app.core.pagination import Cursor, Page, apply_keyset, build_page
+
 from .models import LoginSession
 
 
@@ -22,22 +24,16 @@ class LoginSessionRepository:
         offset: int = 0,
         sort_field: str = "login_time",
         sort_direction: str = "desc",
-    ) -> List[LoginSession]:
-        stmt: Select[tuple[LoginSession]] = select(LoginSession)
-        
-        # Apply sorting
-        if hasattr(LoginSession, sort_field):
-            column = getattr(LoginSession, sort_field)
-            if sort_direction == "desc":
-                stmt = stmt.order_by(desc(column))
-            else:
-                stmt = stmt.order_by(asc(column))
-        else:
-            # Default sort
-            stmt = stmt.order_by(desc(LoginSession.login_time))
-        
-        stmt = stmt.limit(limit).offset(offset)
-        return list(db.scalars(stmt).all())
+        as_rows: bool = False,
+    ) -> List[Any]:
+        return self.search(
+            db,
+            limit=limit,
+            offset=offset,
+            sort_field=sort_field,
+            sort_direction=sort_direction,
+            as_rows=as_rows,
+        )
 
     def create(
         self,
@@ -88,8 +84,38 @@ class LoginSessionRepository:
         offset: int = 0,
         sort_field: str = "login_time",
         sort_direction: str = "desc",
-    ) -> List[LoginSession]:
+        as_rows: bool = False,
+    ) -> List[Any]:
+        return self.search_page(
+            db,
+            user_id=user_id,
+            active_only=active_only,
+            q=q,
+            limit=limit,
+            offset=offset,
+            sort_field=sort_field,
+            sort_direction=sort_direction,
+            as_rows=as_rows,
+        ).items
+
+    def search_page(
+        self,
+        db: Session,
+        *,
+        user_id: int | None = None,
+        active_only: bool = False,
+        q: str | None = None,
+        limit: int = 50,
+        offset: int = 0,
+        sort_field: str = "login_time",
+        sort_direction: str = "desc",
+        after: Cursor | None = None,
+        as_rows: bool = False,
+    ) -> Page[Any]:
+        """Sessions page; ``as_rows`` yields dicts read as column tuples."""
         stmt: Select[tuple[LoginSession]] = select(LoginSession)
+        if as_rows:
+            stmt = select(*LoginSession.__table__.columns)
 
         # Filter by user_id if provided
         if user_id is not None:
@@ -110,19 +136,38 @@ class LoginSessionRepository:
                 )
             )
 
-        # Apply sorting
-        if hasattr(LoginSession, sort_field):
-            column = getattr(LoginSession, sort_field)
-            if sort_direction == "desc":
-                stmt = stmt.order_by(desc(column))
-            else:
-                stmt = stmt.order_by(asc(column))
-        else:
-            # Default sort
-            stmt = stmt.order_by(desc(LoginSession.login_time))
-
-        stmt = stmt.limit(limit).offset(offset)
-        return list(db.scalars(stmt).all())
+        # Apply sorting (default: newest logins first)
+        columns = LoginSession.__table__.columns
+        if sort_field not in columns:
+            sort_field, sort_direction = "login_time", "desc"
+        column = getattr(LoginSession, sort_field)
+
+        # The sort value rides along so the next cursor can be built
+        stmt = apply_keyset(
+            stmt.add_columns(column.label("sort_value")),
+            sort_field=sort_field,
+            sort_column=column,
+            id_column=LoginSession.id,
+            sort_direction=sort_direction,
+            limit=limit,
+            offset=offset,
+            after=after,
+            nullable=columns[sort_field].nullable,
+        )
+        rows = db.execute(stmt).all()
+        if as_rows:
+            # Rows expose .id, which is all build_page needs of an item
+            rows = [(row, row.sort_value) for row in rows]
+        page = build_page(
+            rows,
+            limit=limit,
+            sort_field=sort_field,
+            sort_direction=sort_direction,
+        )
+        if as_rows:
+            keys = LoginSession.__table__.columns.keys()
+            page.items = [dict(zip(keys, row)) for row in page.items]
+        return page
 
     def count_active_sessions(self, db: Session) -> int:
         """Count currently active sessions (not logged out)"""
@@ -1,6 +1,8 @@
 from __future__ import annotations
 from datetime import datetime
+from typing import List
 from pydantic import BaseModel, ConfigDict
+from typing_extensions import TypedDict
 
 
 class LoginSessionCreate(BaseModel):
@@ -21,6 +23,30 @@ class LoginSessionRead(BaseModel):
     user_agent: str | None
 
 
+class LoginSessionRow(TypedDict):
+    """LoginSessionRead as a plain dict built from a column tuple."""
+
+    id: int
+    user_id: int
+    login_time: datetime
+    logout_time: datetime | None
+    logout_reason: str | None
+    ip_address: str | None
+    user_agent: str | None
+
+
+class LoginSessionPageBody(TypedDict):
+    items: List[LoginSessionRow]
+    next_cursor: str | None
+
+
+class LoginSessionPage(BaseModel):
+    """Cursor-paginated response; pass ``next_cursor`` back as ``cursor``."""
+
+    items: List[LoginSessionRead]
+    next_cursor: str | None = None
+
+
 class LoginSessionUpdate(BaseModel):
     logout_time: datetime | None = None
     logout_reason: str | None = None
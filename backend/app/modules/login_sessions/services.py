@@ -1,9 +1,17 @@
 from __future__ import annotations
-from typing import List
+from typing import Any, Dict, List
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
+from app.core.pagination import Cursor, Page
+
 from .models import LoginSession
 from .repositories import LoginSessionRepository
+from .schemas import LoginSessionPageBody, LoginSessionRow
+
+# Built once; dumps column-tuple dicts without per-row model instances
+_rows_adapter = TypeAdapter(List[LoginSessionRow])
+_page_adapter = TypeAdapter(LoginSessionPageBody)
 
 
 class LoginSessionService:
@@ -45,13 +53,15 @@ class LoginSessionService:
         offset: int = 0,
         sort_field: str = "login_time",
         sort_direction: str = "desc",
-    ) -> List[LoginSession]:
+        as_rows: bool = False,
+    ) -> List[Any]:
         return self.repo.list(
             db,
             limit=limit,
             offset=offset,
             sort_field=sort_field,
             sort_direction=sort_direction,
+            as_rows=as_rows,
         )
 
     def search_sessions(
@@ -65,7 +75,8 @@ class LoginSessionService:
         offset: int = 0,
         sort_field: str = "login_time",
         sort_direction: str = "desc",
-    ) -> List[LoginSession]:
+        as_rows: bool = False,
+    ) -> List[Any]:
         return self.repo.search(
             db,
             user_id=user_id,
@@ -75,6 +86,44 @@ class LoginSessionService:
             offset=offset,
             sort_field=sort_field,
             sort_direction=sort_direction,
+            as_rows=as_rows,
+        )
+
+    def search_sessions_page(
+        self,
+        db: Session,
+        *,
+        user_id: int | None = None,
+        active_only: bool = False,
+        q: str | None = None,
+        limit: int = 50,
+        offset: int = 0,
+        sort_field: str = "login_time",
+        sort_direction: str = "desc",
+        after: Cursor | None = None,
+        as_rows: bool = False,
+    ) -> Page[Any]:
+        return self.repo.search_page(
+            db,
+            user_id=user_id,
+            active_only=active_only,
+            q=q,
+            limit=limit,
+            offset=offset,
+            sort_field=sort_field,
+            sort_direction=sort_direction,
+            after=after,
+            as_rows=as_rows,
+        )
+
+    @staticmethod
+    def rows_json(rows: List[Dict[str, Any]]) -> bytes:
+        return _rows_adapter.dump_json(rows)
+
+    @staticmethod
+    def page_json(page: Page[Dict[str, Any]]) -> bytes:
+        return _page_adapter.dump_json(
+            {"items": page.items, "next_cursor": page.next_cursor}
         )
 
     def count_active_sessions(self, db: Session) -> int:
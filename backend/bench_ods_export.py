@@ -0,0 +1,152 @@
+"""
+Benchmark for the address ODS export.
+
+Compares the previous export.ods path (every Address loaded as an ORM
+object, turned into a list of rows and saved with pyexcel_ods3) with
+the streaming writer (cursor batches compressed into content.xml as
+they arrive). Reports wall time, peak traced memory and file size, and
+checks that both files read back to the same cells. tracemalloc only
+sees Python allocations, not lxml's, so the pyexcel peak is a lower
+bound.
+
+The baseline needs pyexcel-ods3, which the app no longer depends on:
+    pip install pyexcel-ods3==0.6.1
+
+Runs against a throwaway SQLite database, never the app database.
+
+Usage:
+    python bench_ods_export.py [rows ...] [--repeats N]
+"""
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+_tmp = tempfile.mkdtemp(prefix="werbisci-bench-")
+os.environ["SQLITE_DB_PATH"] = os.path.join(_tmp, "bench.db")
+
+from collections import OrderedDict  # noqa: E402
+
+from sqlalchemy import delete, insert  # noqa: E402
+
+from app.core.db import Base, SessionLocal, engine  # noqa: E402
+from app.modules.addresses.api import _ods_export_chunks  # noqa: E402
+from app.modules.addresses.importing import _ods_rows  # noqa: E402
+from app.modules.addresses.models import Address  # noqa: E402
+from app.modules.addresses.repositories import (  # noqa: E402
+    READ_FIELDS, AddressRepository,
+)
+
+
+DEFAULT_ROWS = (10_000, 100_000)
+
+
+def seed(db, rows: int) -> None:
+    db.execute(delete(Address))
+    db.execute(insert(Address), [
+        {
+            "first_name": f"Jan{i % 97}",
+            "last_name": f"Kowalski{i % 1013}",
+            "street": f"Krakowskie Przedmieście {i % 200}",
+            "apartment_no": str(i % 40) if i % 3 else None,
+            "city": ("Lublin", "Świdnik", "Łęczna")[i % 3],
+            "postal_code": f"20-{i % 1000:03d}",
+            "description": ("uwagi  & <opis>\n" * 4) if i % 2 else None,
+            "label_marked": bool(i % 5 == 0),
+        }
+        for i in range(rows)
+    ])
+    db.commit()
+
+
+def pyexcel_export(db) -> bytes:
+    # export.ods before the streaming writer
+    from pyexcel_ods3 import save_data  # type: ignore
+
+    rows = [
+        [
+            str(a.id), a.first_name, a.last_name, a.street,
+            a.apartment_no or "", a.city, a.postal_code,
+            a.description or "", "1" if a.label_marked else "0",
+        ]
+        for a in AddressRepository().list_all(db)
+    ]
+    out = io.BytesIO()
+    save_data(out, OrderedDict({"Addresses": [list(READ_FIELDS), *rows]}))
+    db.expunge_all()
+    return out.getvalue()
+
+
+def streaming_export(db) -> int:
+    # Chunks are counted, not kept, as a client download would
+    return sum(len(chunk) for chunk in _ods_export_chunks())
+
+
+def cells(content: bytes) -> list:
+    import zipfile
+
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        with archive.open("content.xml") as xml:
+            return list(_ods_rows(xml))
+
+
+def measure(fn, db, repeats: int):
+    """Best wall time (s), peak traced memory (MB) and result."""
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn(db)
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    result = fn(db)
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def main():
+    args = sys.argv[1:]
+    repeats = 1
+    if "--repeats" in args:
+        i = args.index("--repeats")
+        repeats = int(args[i + 1])
+        del args[i:i + 2]
+    sizes = [int(a) for a in args] or list(DEFAULT_ROWS)
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        print(f"best of {repeats} runs; memory from one traced run")
+        print(f"{'rows':>7} {'path':<10} {'time':>9} {'peak':>10}"
+              f" {'size':>10}")
+        for rows in sizes:
+            seed(db, rows)
+            results = []
+            try:
+                results.append(("pyexcel",) + measure(
+                    pyexcel_export, db, repeats
+                ))
+            except ImportError:
+                print(f"{rows:>7} {'pyexcel':<10} (pyexcel-ods3 missing)")
+            results.append(("streaming",) + measure(
+                streaming_export, db, repeats
+            ))
+            content = b"".join(_ods_export_chunks())
+            if results[0][0] == "pyexcel":
+                assert cells(results[0][3]) == cells(content)
+            for name, seconds, peak, result in results:
+                size = result if isinstance(result, int) else len(result)
+                print(f"{rows:>7} {name:<10} {seconds:>7.2f} s"
+                      f" {peak:>7.1f} MB {size / 1e6:>7.2f} MB")
+    finally:
+        db.close()
+        engine.dispose()
+        shutil.rmtree(_tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Benchmark for the address / login-session list serialization paths.
+
+Compares, per row, the previous response path (ORM entities validated
+through the response model with from_attributes, then JSON-encoded the
+way FastAPI does) with the column-tuple path (Core rows dumped through
+a cached TypeAdapter over a TypedDict).
+
+Runs against a throwaway SQLite database, never the app database.
+
+Usage:
+    python bench_serialization.py [rows] [repeats]
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp(prefix="werbisci-bench-")
+os.environ["SQLITE_DB_PATH"] = os.path.join(_tmp, "bench.db")
+
+from datetime import datetime, timedelta  # noqa: E402
+from typing import List  # noqa: E402
+
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+
+from app.core.db import Base, SessionLocal, engine  # noqa: E402
+from app.modules.addresses.models import Address  # noqa: E402
+from app.modules.addresses.repositories import (  # noqa: E402
+    READ_FIELDS, AddressRepository,
+)
+from app.modules.addresses.schemas import AddressRead  # noqa: E402
+from app.modules.addresses.services import AddressService  # noqa: E402
+from app.modules.login_sessions.models import LoginSession  # noqa: E402
+from app.modules.login_sessions.schemas import LoginSessionRead  # noqa: E402
+from app.modules.login_sessions.services import (  # noqa: E402
+    LoginSessionService,
+)
+from app.modules.users.models import User  # noqa: E402
+
+
+PAGE_SIZES = (50, 500)
+
+
+def seed(db, rows: int) -> None:
+    user = User(
+        login="bench", email="bench@example.com", full_name="Bench",
+        password_hash="x", role="admin",
+    )
+    db.add(user)
+    db.flush()
+    db.execute(insert(Address), [
+        {
+            "first_name": f"Jan{i % 97}",
+            "last_name": f"Kowalski{i % 1013}",
+            "street": f"Krakowskie Przedmieście {i % 200}",
+            "apartment_no": str(i % 40) if i % 3 else None,
+            "city": ("Lublin", "Świdnik", "Łęczna")[i % 3],
+            "postal_code": f"20-{i % 1000:03d}",
+            "description": ("x" * 120) if i % 2 else None,
+            "label_marked": bool(i % 5 == 0),
+        }
+        for i in range(rows)
+    ])
+    start = datetime(2024, 1, 1)
+    db.execute(insert(LoginSession), [
+        {
+            "user_id": user.id,
+            "login_time": start + timedelta(minutes=i),
+            "logout_time": start + timedelta(minutes=i + 5) if i % 2 else None,
+            "logout_reason": "manual" if i % 2 else None,
+            "ip_address": f"10.0.{i % 256}.{i % 7}",
+            "user_agent": "Mozilla/5.0 (bench)",
+        }
+        for i in range(rows)
+    ])
+    db.commit()
+
+
+def fastapi_encode(adapter: TypeAdapter, objects) -> bytes:
+    # What FastAPI 0.115 does with a response_model and a default
+    # JSONResponse: validate, dump to JSON-able python, json.dumps
+    validated = adapter.validate_python(objects, from_attributes=True)
+    content = adapter.dump_python(validated, mode="json")
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def timed(fn, repeats: int) -> float:
+    """Best wall time of ``repeats`` runs, in seconds."""
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        seed(db, rows)
+        addresses = AddressService()
+        address_repo = AddressRepository()
+        address_adapter = TypeAdapter(List[AddressRead])
+        sessions = LoginSessionService()
+        session_adapter = TypeAdapter(List[LoginSessionRead])
+
+        cases = []
+        for limit in PAGE_SIZES:
+            def address_before(limit=limit):
+                items = list(db.scalars(
+                    select(Address).order_by(Address.id).limit(limit)
+                ))
+                db.expunge_all()
+                return fastapi_encode(address_adapter, items)
+
+            def address_after(limit=limit):
+                return addresses.rows_json(address_repo.list(
+                    db, limit=limit, columns=READ_FIELDS
+                ))
+
+            def session_before(limit=limit):
+                items = sessions.list_sessions(db, limit=limit)
+                db.expunge_all()
+                return fastapi_encode(session_adapter, items)
+
+            def session_after(limit=limit):
+                return sessions.rows_json(
+                    sessions.list_sessions(db, limit=limit, as_rows=True)
+                )
+
+            assert json.loads(address_before()) == json.loads(address_after())
+            assert json.loads(session_before()) == json.loads(session_after())
+            cases.append(("addresses", limit, address_before, address_after))
+            cases.append(("sessions", limit, session_before, session_after))
+
+        print(f"{rows} rows seeded, best of {repeats} runs")
+        print(f"{'endpoint':<10} {'page':>5} {'before':>12} {'after':>12}"
+              f" {'speedup':>8}")
+        for name, limit, before, after in cases:
+            t_before = timed(before, repeats) / limit * 1e6
+            t_after = timed(after, repeats) / limit * 1e6
+            print(f"{name:<10} {limit:>5} {t_before:>9.1f} us {t_after:>9.1f}"
+                  f" us {t_before / t_after:>7.1f}x")
+    finally:
+        db.close()
+        engine.dispose()
+        shutil.rmtree(_tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
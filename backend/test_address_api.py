@@ -0,0 +1,342 @@
+"""
+Behaviour checks for the address HTTP endpoints.
+
+Runs against a throwaway SQLite database, never the app database.
+
+Usage:
+    python test_address_api.py
+"""
+
+import functools
+import os
+import shutil
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="werbisci-test-")
+os.environ["SQLITE_DB_PATH"] = os.path.join(_tmp, "test.db")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import delete  # noqa: E402
+
+from app.core.db import SessionLocal, engine  # noqa: E402
+from app.core.security import create_access_token  # noqa: E402
+from app.main import app  # noqa: E402
+from app.modules.addresses.models import Address  # noqa: E402
+from app.modules.addresses.services import AddressService  # noqa: E402
+from app.modules.users.repositories import UserRepository  # noqa: E402
+
+
+BASE = "/api/addresses"
+
+
+@functools.lru_cache(maxsize=None)
+def client():
+    # Entering the client runs startup: tables, search index, admin user
+    test_client = TestClient(app)
+    test_client.__enter__()
+    db = SessionLocal()
+    try:
+        admin = UserRepository().get_by_login(db, "admin")
+        token = create_access_token(admin.id)
+    finally:
+        db.close()
+    test_client.headers["Authorization"] = f"Bearer {token}"
+    return test_client
+
+
+def seed(rows):
+    """Replace all addresses with ``rows`` of (first, last, street, city,
+    postal[, apartment]); returns the new ids in order."""
+    db = SessionLocal()
+    try:
+        db.execute(delete(Address))
+        db.commit()
+        service = AddressService()
+        return [
+            service.create(
+                db, first_name=first, last_name=last, street=street,
+                apartment_no=apartment[0] if apartment else None,
+                city=city, postal_code=postal,
+            ).id
+            for first, last, street, city, postal, *apartment in rows
+        ]
+    finally:
+        db.close()
+
+
+def test_label_mark_rejects_too_many_ids():
+    # More ids than SQLite allows in one statement must be a 422, not a
+    # failed UPDATE
+    api = client()
+    ids = seed([("Anna", "Kowalska", "Lipowa 10", "Lublin", "20-001")])
+    response = api.post(f"{BASE}/label-marked", json={
+        "label_marked": True, "ids": list(range(1, 5002)),
+    })
+    assert response.status_code == 422, response.text
+    response = api.post(f"{BASE}/label-marked", json={
+        "label_marked": True, "ids": ids,
+    })
+    assert response.status_code == 200, response.text
+    assert response.json()["updated"] == 1
+
+
+def walk_pages(api, path, params):
+    """ids of every page followed through next_cursor."""
+    ids, cursor = [], ""
+    while True:
+        response = api.get(path, params={**params, "cursor": cursor})
+        assert response.status_code == 200, response.text
+        page = response.json()
+        assert len(page["items"]) <= params["limit"]
+        ids += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+def test_cursor_pages_cover_every_row_once():
+    api = client()
+    # Ties on last_name and NULL apartments must not lose or repeat rows
+    # at page boundaries
+    seed([
+        (f"Jan{i}", ("Nowak", "Kowalska", "Żółw")[i % 3], f"Lipowa {i}",
+         "Lublin", f"20-{i:03d}", *([str(i % 4)] if i % 3 else []))
+        for i in range(23)
+    ])
+    for sort_field in ("id", "last_name", "apartment_no"):
+        for sort_direction in ("asc", "desc"):
+            params = {
+                "sort_field": sort_field,
+                "sort_direction": sort_direction,
+            }
+            expected = [row["id"] for row in api.get(
+                BASE, params={**params, "limit": 500}
+            ).json()]
+            assert len(expected) == 23
+            for path, extra in ((BASE, {}), (f"{BASE}/search", {"q": "lip"})):
+                got = walk_pages(api, path, {**params, **extra, "limit": 5})
+                assert got == expected, (path, params, got)
+
+
+def test_bulk_atomic_and_best_effort():
+    api = client()
+    ids = seed([
+        ("Anna", "Kowalska", "Lipowa 10", "Lublin", "20-001"),
+        ("Piotr", "Nowak", "Długa 3", "Świdnik", "21-040"),
+        ("Jerzy", "Żółw", "Ogrodowa 7", "Łęczna", "21-010"),
+    ])
+    operations = [
+        {"op": "update", "id": ids[0], "changes": {"city": "Chełm"}},
+        {"op": "delete", "id": ids[1]},
+        {"op": "update", "id": ids[2], "changes": {"postal_code": "?"}},
+        {"op": "delete", "id": 999_999},
+    ]
+
+    def cities():
+        return sorted(row["city"] for row in api.get(BASE).json())
+
+    response = api.post(f"{BASE}/bulk", json={"operations": operations})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert not body["committed"] and body["failed"] == 2
+    assert [r["status"] for r in body["results"]] == [
+        "skipped", "skipped", "error", "not_found",
+    ]
+    assert cities() == ["Lublin", "Łęczna", "Świdnik"]
+
+    response = api.post(f"{BASE}/bulk", json={
+        "operations": operations, "mode": "best_effort",
+    })
+    body = response.json()
+    assert body["committed"]
+    assert (body["updated"], body["deleted"], body["failed"]) == (1, 1, 2)
+    assert [r["status"] for r in body["results"]] == [
+        "updated", "deleted", "error", "not_found",
+    ]
+    assert cities() == ["Chełm", "Łęczna"]
+    # Bulk updates refresh the folded columns the search runs on
+    found = api.get(f"{BASE}/search", params={"q": "chelm"}).json()
+    assert [row["id"] for row in found] == [ids[0]]
+
+    response = api.post(f"{BASE}/bulk", json={"operations": [
+        {"op": "delete", "id": ids[0]}, {"op": "delete", "id": ids[0]},
+    ]})
+    assert [r["status"] for r in response.json()["results"]] == [
+        "skipped", "error",
+    ]
+
+
+def test_cursor_must_match_sort_order():
+    api = client()
+    seed([
+        (f"Jan{i}", "Nowak", f"Lipowa {i}", "Lublin", f"20-{i:03d}")
+        for i in range(4)
+    ])
+    first = api.get(BASE, params={"limit": 2, "cursor": ""}).json()
+    assert first["next_cursor"]
+    response = api.get(BASE, params={
+        "limit": 2, "cursor": first["next_cursor"], "sort_direction": "desc",
+    })
+    assert response.status_code == 400, response.text
+    response = api.get(BASE, params={"limit": 2, "cursor": "not-a-cursor"})
+    assert response.status_code == 400, response.text
+
+
+def test_duplicates_found_and_merged():
+    api = client()
+    ids = seed([
+        ("Anna", "Kowalska", "Lipowa 10", "Lublin", "20-001"),
+        ("Anna", "Kowalska", "ul. Lipowa 10", "Lublin", "20-001", "4"),
+        # Swapped name fields
+        ("Kowalska", "Anna", "Lipowa 10", "Lublin", "20-001"),
+        # Same family or same name next door: not duplicates
+        ("Ewa", "Kowalska", "Lipowa 10", "Lublin", "20-001", "7"),
+        ("Anna", "Kowalska", "Lipowa 12", "Lublin", "20-001"),
+        ("Piotr", "Nowak", "Długa 3", "Świdnik", "21-040"),
+    ])
+    report = api.get(f"{BASE}/duplicates").json()
+    assert [c["ids"] for c in report["clusters"]] == [ids[:3]], report
+    # The row with an apartment number is the most complete
+    assert report["clusters"][0]["keep_id"] == ids[1]
+
+    api.post(f"{BASE}/label-marked", json={
+        "label_marked": True, "ids": [ids[2]],
+    })
+    response = api.post(f"{BASE}/duplicates/merge", json={
+        "keep_id": ids[0], "merge_ids": [ids[1], ids[2]],
+    })
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["deleted_ids"] == [ids[1], ids[2]]
+    # Gaps of the kept row are filled from the merged ones
+    assert body["kept"]["apartment_no"] == "4"
+    assert body["kept"]["label_marked"] is True
+    remaining = [row["id"] for row in api.get(BASE).json()]
+    assert remaining == [ids[0], *ids[3:]]
+    assert api.get(f"{BASE}/duplicates").json()["clusters"] == []
+
+    response = api.post(f"{BASE}/duplicates/merge", json={
+        "keep_id": ids[0], "merge_ids": [ids[1]],
+    })
+    assert response.status_code == 404, response.text
+    response = api.post(f"{BASE}/duplicates/merge", json={
+        "keep_id": ids[0], "merge_ids": [ids[0]],
+    })
+    assert response.status_code == 400, response.text
+
+
+def test_etag_revalidation():
+    api = client()
+    ids = seed([("Anna", "Kowalska", "Lipowa 10", "Lublin", "20-001")])
+    first = api.get(f"{BASE}/search", params={"q": "lublin"})
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and first.json()
+
+    again = api.get(
+        f"{BASE}/search", params={"q": "lublin"},
+        headers={"If-None-Match": f"W/{etag}"},
+    )
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["ETag"] == etag
+    # The tag covers the query, so another one is answered in full
+    other = api.get(
+        f"{BASE}/search", params={"q": "lipowa"},
+        headers={"If-None-Match": etag},
+    )
+    assert other.status_code == 200
+    assert other.headers["ETag"] != etag
+
+    # Any write makes the stored tag stale
+    for write in (
+        lambda: api.post(f"{BASE}/label-marked", json={
+            "label_marked": True, "ids": ids,
+        }),
+        lambda: api.post(BASE, json={
+            "first_name": "Ewa", "last_name": "Lis", "street": "Polna 5",
+            "city": "Lublin", "postal_code": "20-002",
+        }),
+    ):
+        assert write().status_code in (200, 201)
+        fresh = api.get(
+            f"{BASE}/search", params={"q": "lublin"},
+            headers={"If-None-Match": etag},
+        )
+        assert fresh.status_code == 200
+        assert fresh.headers["ETag"] != etag
+        etag = fresh.headers["ETag"]
+    assert len(fresh.json()) == 2
+
+
+def test_fuzzy_rejects_filters_it_cannot_apply():
+    api = client()
+    seed([
+        ("Anna", "Kowalska", "Lipowa 10", "Lublin", "20-001"),
+        ("Anna", "Kowalski", "Długa 3", "Świdnik", "21-040"),
+    ])
+    found = api.get(f"{BASE}/search", params={"q": "Kowalsky", "fuzzy": 1})
+    assert found.status_code == 200, found.text
+    assert {row["city"] for row in found.json()} == {"Lublin", "Świdnik"}
+    for extra in (
+        {"city": "Lublin"},
+        {"last_name": "Kowalska"},
+        {"sort_field": "last_name"},
+        {"sort_direction": "desc"},
+        {"with_total": 1},
+    ):
+        response = api.get(f"{BASE}/search", params={
+            "q": "Kowalsky", "fuzzy": 1, **extra,
+        })
+        assert response.status_code == 400, (extra, response.text)
+    # Blank filters are no filters, as in the plain search
+    response = api.get(f"{BASE}/search", params={
+        "q": "Kowalsky", "fuzzy": 1, "city": " ",
+    })
+    assert response.status_code == 200, response.text
+
+
+def test_totals_and_facets_cover_every_match():
+    api = client()
+    ids = seed([
+        ("Anna", "Kowalska", "Lipowa 10", "Lublin", "20-001"),
+        ("Piotr", "Kowalski", "Długa 3", "Świdnik", "21-040"),
+        ("Jan", "Kowalski", "Polna 1", "Lublin", "20-002"),
+        ("Jerzy", "Żółw", "Ogrodowa 7", "Łęczna", "21-010"),
+    ])
+
+    def page():
+        response = api.get(f"{BASE}/search", params={
+            "q": "kowalsk", "limit": 1, "with_total": 1,
+        })
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    body = page()
+    assert len(body["items"]) == 1
+    assert body["total"] == 3
+    assert body["facets"]["city"] == [
+        {"value": "Lublin", "count": 2}, {"value": "Świdnik", "count": 1},
+    ]
+    assert body["facets"]["label_marked"] == {"true": 0, "false": 3}
+    # Cached counts are dropped by the next write
+    api.post(f"{BASE}/label-marked", json={
+        "label_marked": True, "ids": ids[:2],
+    })
+    assert page()["facets"]["label_marked"] == {"true": 2, "false": 1}
+    listing = api.get(BASE, params={"limit": 2, "with_total": 1}).json()
+    assert listing["total"] == 4
+
+
+def main():
+    try:
+        for name, test in sorted(globals().items()):
+            if name.startswith("test_") and callable(test):
+                test()
+                print(f"{name}: ok")
+    finally:
+        engine.dispose()
+        shutil.rmtree(_tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
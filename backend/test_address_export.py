@@ -0,0 +1,132 @@
+"""
+Behaviour checks for the streaming ODS address export.
+
+Runs against a throwaway SQLite database, never the app database.
+
+Usage:
+    python test_address_export.py
+"""
+
+import io
+import os
+import shutil
+import struct
+import tempfile
+import zipfile
+import zlib
+
+_tmp = tempfile.mkdtemp(prefix="werbisci-test-")
+os.environ["SQLITE_DB_PATH"] = os.path.join(_tmp, "test.db")
+
+from sqlalchemy import delete  # noqa: E402
+
+from app.core.db import Base, SessionLocal, engine  # noqa: E402
+from app.modules.addresses.api import _ods_export_chunks  # noqa: E402
+from app.modules.addresses.importing import (  # noqa: E402
+    _ods_rows, open_ods,
+)
+from app.modules.addresses.models import Address  # noqa: E402
+from app.modules.addresses.ods_writer import MIMETYPE, iter_ods  # noqa: E402
+from app.modules.addresses.repositories import READ_FIELDS  # noqa: E402
+from app.modules.addresses.search_index import (  # noqa: E402
+    ensure_search_index,
+)
+from app.modules.addresses.services import AddressService  # noqa: E402
+
+
+# Local file header: signature, version, flags, method, time, date, CRC,
+# compressed size, size, name length, extra length
+LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+DATA_DESCRIPTOR_FLAG = 0x08
+
+
+def local_header(data: bytes, info: zipfile.ZipInfo) -> tuple:
+    offset = info.header_offset
+    return LOCAL_HEADER.unpack(data[offset:offset + LOCAL_HEADER.size])
+
+
+def test_mimetype_header_is_complete():
+    # ODF readers sniff the type at offset 30 and may trust the local
+    # header alone, so it needs real sizes and no data descriptor
+    data = b"".join(iter_ods(["a"], [[["1"]], [["2"]]]))
+    mimetype = MIMETYPE.encode("ascii")
+    (signature, _, flags, method, _, _, crc, compressed, size,
+     name_length, extra_length) = LOCAL_HEADER.unpack(data[:30])
+    assert signature == 0x04034B50
+    assert not flags & DATA_DESCRIPTOR_FLAG
+    assert method == zipfile.ZIP_STORED
+    assert crc == zlib.crc32(mimetype)
+    assert compressed == size == len(mimetype)
+    assert (name_length, extra_length) == (len("mimetype"), 0)
+    assert data[30:38] == b"mimetype"
+    assert data[38:38 + len(mimetype)] == mimetype
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        infos = {info.filename: info for info in archive.infolist()}
+    manifest = local_header(data, infos["META-INF/manifest.xml"])
+    assert not manifest[2] & DATA_DESCRIPTOR_FLAG
+    assert manifest[6] == infos["META-INF/manifest.xml"].CRC
+    # Only the streamed entry defers its sizes
+    assert local_header(data, infos["content.xml"])[2] & (
+        DATA_DESCRIPTOR_FLAG
+    )
+
+
+def test_cells_read_back():
+    rows = [
+        ["Zażółć", "gęślą jaźń"],
+        ["  two  spaces  ", "tab\there"],
+        ["line\nbreak", "a & <b> \"c\""],
+        ["", "control\x01char"],
+    ]
+    data = b"".join(iter_ods(["x", "y"], [rows[:2], [], rows[2:]]))
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        with archive.open("content.xml") as content:
+            read = list(_ods_rows(content))
+    expected = [row[:] for row in rows]
+    expected[3][1] = "controlchar"  # not representable in XML
+    assert read == [["x", "y"], *expected], read
+
+
+def test_export_reads_back_as_import():
+    Base.metadata.create_all(bind=engine)
+    ensure_search_index(engine)
+    db = SessionLocal()
+    try:
+        db.execute(delete(Address))
+        db.commit()
+        created = AddressService().create(
+            db, first_name="Anna", last_name="Kowalska",
+            street="Lipowa 10", apartment_no="4", city="Lublin",
+            postal_code="20-001",
+        )
+    finally:
+        db.close()
+
+    data = b"".join(_ods_export_chunks())
+    source = open_ods(io.BytesIO(data))
+    assert source.raw_headers == list(READ_FIELDS)
+    records = list(source.rows)
+    assert len(records) == 1
+    line_no, row = records[0]
+    assert line_no == 2
+    assert row["id"] == str(created.id)
+    assert row["last_name"] == "Kowalska"
+    assert row["apartment_no"] == "4"
+    assert row["label_marked"] == "0"
+
+
+def main():
+    try:
+        for name, test in sorted(globals().items()):
+            if name.startswith("test_") and callable(test):
+                test()
+                print(f"{name}: ok")
+    finally:
+        engine.dispose()
+        shutil.rmtree(_tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Regression checks for the batched CSV address import.
+
+Runs against a throwaway SQLite database, never the app database.
+
+Usage:
+    python test_address_import.py
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from xml.sax.saxutils import escape
+
+_tmp = tempfile.mkdtemp(prefix="werbisci-test-")
+os.environ["SQLITE_DB_PATH"] = os.path.join(_tmp, "test.db")
+
+from sqlalchemy import delete, func, select  # noqa: E402
+
+from app.core.db import Base, SessionLocal, engine  # noqa: E402
+from app.modules.addresses.importing import (  # noqa: E402
+    import_odt_archive, import_rows, open_csv,
+)
+from app.modules.addresses.models import Address  # noqa: E402
+from app.modules.addresses.odt_extraction import (  # noqa: E402
+    archive_members,
+)
+from app.modules.addresses.search_index import (  # noqa: E402
+    ensure_search_index,
+)
+
+
+HEADER = (
+    "first_name;last_name;street;apartment_no;city;postal_code;label_marked"
+)
+
+
+def run_import(db, text: str, **kwargs):
+    source = open_csv(io.BytesIO(text.encode("utf-8")))
+    return import_rows(db, source.rows, **kwargs)
+
+
+def empty_db():
+    Base.metadata.create_all(bind=engine)
+    ensure_search_index(engine)
+    db = SessionLocal()
+    db.execute(delete(Address))
+    db.commit()
+    return db
+
+
+def cities(db):
+    return sorted(db.scalars(select(Address.city)))
+
+
+def odt_letter(paragraphs) -> bytes:
+    """Minimal .odt holding ``paragraphs`` as text:p elements."""
+    body = "".join(f"<text:p>{escape(p)}</text:p>" for p in paragraphs)
+    content = (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        "<office:document-content"
+        ' xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"'
+        ' xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0">'
+        f"<office:body><office:text>{body}</office:text></office:body>"
+        "</office:document-content>"
+    )
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w") as odt:
+        odt.writestr("content.xml", content)
+    return out.getvalue()
+
+
+def letters_archive(files) -> zipfile.ZipFile:
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w") as archive:
+        for name, data in files:
+            archive.writestr(name, data)
+    return zipfile.ZipFile(out)
+
+
+def test_odt_archive_import():
+    archive = letters_archive([
+        ("a.odt", odt_letter([
+            "Lublin, 1 maja", "Sz. P.", "Anna Kowalska", "ul. Lipowa 10/4",
+            "20-001 Lublin", "Szanowna Pani,",
+        ])),
+        ("listy/b.odt", odt_letter([
+            "Sz. P.", "P i o t r  N o w a k", "Długa 3",
+            "21-040 Ś w i d n i k",
+        ])),
+        ("c.odt", odt_letter(["Dzień dobry", "List bez adresu"])),
+        ("d.odt", b"not an odt"),
+        ("e.odt", odt_letter(["Sz. P.", "Jan Nowak", "Krótka 5", "Lublin"])),
+        ("__MACOSX/._a.odt", b"resource fork"),
+        ("notes.txt", b"not a letter"),
+    ])
+    names = archive_members(archive)
+    assert names == ["a.odt", "listy/b.odt", "c.odt", "d.odt", "e.odt"]
+    db = empty_db()
+    try:
+        result, outcomes = import_odt_archive(db, archive, names)
+        assert [(o["file"], o["status"]) for o in outcomes] == [
+            ("a.odt", "imported"),
+            ("listy/b.odt", "imported"),
+            ("c.odt", "no_address"),
+            ("d.odt", "error"),
+            ("e.odt", "invalid"),
+        ], outcomes
+        assert result.inserted == 2, result
+        rows = db.execute(select(
+            Address.first_name, Address.last_name, Address.street,
+            Address.apartment_no, Address.city, Address.postal_code,
+            Address.label_marked,
+        ).order_by(Address.id)).all()
+        assert [tuple(row) for row in rows] == [
+            ("Anna", "Kowalska", "ul. Lipowa", "10/4", "Lublin", "20-001",
+             True),
+            ("Piotr", "Nowak", "Długa", "3", "Świdnik", "21-040", True),
+        ]
+
+        # The same letters again in merge mode change nothing
+        result, outcomes = import_odt_archive(
+            db, archive, names, mode="merge"
+        )
+        assert [o["status"] for o in outcomes[:2]] == ["merged", "merged"]
+        assert (result.inserted, result.unchanged) == (0, 2), result
+        assert len(cities(db)) == 2
+    finally:
+        db.close()
+
+
+def test_row_longer_than_header():
+    # Fields past the header arrive from csv.DictReader as a list under
+    # the key None; they must not abort the whole import
+    db = empty_db()
+    try:
+        result = run_import(db, "\n".join([
+            HEADER,
+            "Jan;Kowalski;Lipowa 1;;Lublin;20-001;0",
+            "Anna;Nowak;Długa 2;5;Lublin;20-002;1;extra;fields",
+            ";;;;;;;;",
+            ";;;;;;;;oops",
+            "Piotr;Wójcik;Krótka 3;;Lublin;20-003;0",
+        ]) + "\n")
+        assert result.imported == 3, result
+        assert result.total_rows == 5, result
+        # The blank over-long row is skipped; one with data only past the
+        # header is rejected on its own line
+        assert [(e.line, e.code) for e in result.errors] == [
+            (5, "required")
+        ], result.errors
+        assert db.scalar(select(func.count()).select_from(Address)) == 3
+    finally:
+        db.close()
+
+
+def test_merge_updates_instead_of_duplicating():
+    db = empty_db()
+    try:
+        run_import(db, "\n".join([
+            HEADER,
+            "Jan;Kowalski;Lipowa 1;;Lublin;20-001;1",
+            "Anna;Nowak;Długa 2;5;Lublin;20-002;0",
+        ]) + "\n")
+        result = run_import(db, "\n".join([
+            HEADER,
+            # Same person and address, new city: updated, label kept
+            "Jan;Kowalski;Lipowa 1;;Świdnik;20-001;0",
+            "Anna;Nowak;Długa 2;5;Lublin;20-002;0",
+            "Piotr;Wójcik;Krótka 3;;Łęczna;20-003;0",
+        ]) + "\n", mode="merge")
+        assert (result.inserted, result.updated, result.unchanged) == (
+            1, 1, 1
+        ), result
+        assert result.skipped == []
+        assert cities(db) == ["Lublin", "Łęczna", "Świdnik"]
+        jan = db.scalar(select(Address).where(Address.first_name == "Jan"))
+        assert jan.label_marked
+    finally:
+        db.close()
+
+
+def test_merge_keeps_last_line_for_same_address():
+    # Lines of one batch aimed at the same row: the last one is written
+    # and the others are reported as skipped, not counted as updates
+    db = empty_db()
+    try:
+        run_import(db, HEADER + "\nJan;Kowalski;Lipowa 1;;Lublin;20-001;0\n")
+        jan_id = db.scalar(select(Address.id))
+        result = run_import(db, "\n".join([
+            "id;" + HEADER,
+            ";Jan;Kowalski;Lipowa 1;;Świdnik;20-001;0",
+            f"{jan_id};Jan;Kowalski;Lipowa 1;;Łęczna;20-001;0",
+            ";Jan;Kowalski;Lipowa 1;;Puławy;20-001;0",
+            ";Ewa;Lis;Polna 1;;Lublin;20-005;0",
+            ";Ewa;Lis;Polna 1;;Chełm;20-005;0",
+        ]) + "\n", mode="merge")
+        assert (result.inserted, result.updated, result.unchanged) == (
+            1, 1, 0
+        ), result
+        assert result.skipped == [2, 3, 5], result.skipped
+        assert result.imported == 2
+        assert cities(db) == ["Chełm", "Puławy"]
+    finally:
+        db.close()
+
+
+def test_dry_run_writes_nothing():
+    db = empty_db()
+    try:
+        result = run_import(db, "\n".join([
+            HEADER,
+            "Jan;Kowalski;Lipowa 1;;Lublin;20-001;0",
+            ";Nowak;Długa 2;;Lublin;20-002;0",
+        ]) + "\n", dry_run=True)
+        assert result.dry_run
+        assert (result.valid_rows, result.imported) == (1, 0), result
+        assert [(e.line, e.column) for e in result.errors] == [
+            (3, "first_name")
+        ]
+        assert cities(db) == []
+    finally:
+        db.close()
+
+
+def main():
+    try:
+        for name, test in sorted(globals().items()):
+            if name.startswith("test_") and callable(test):
+                test()
+                print(f"{name}: ok")
+    finally:
+        engine.dispose()
+        shutil.rmtree(_tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Behaviour checks for the in-memory fuzzy search and suggest rankings.
+
+Both answer a top-k without ranking everything; these compare the
+shortcut with the full ranking on random data and random edits.
+
+Runs against a throwaway SQLite database, never the app database.
+
+Usage:
+    python test_address_ranking.py
+"""
+
+import os
+import random
+import shutil
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="werbisci-test-")
+os.environ["SQLITE_DB_PATH"] = os.path.join(_tmp, "test.db")
+
+from sqlalchemy import delete, insert  # noqa: E402
+
+from app.core.db import Base, SessionLocal, engine  # noqa: E402
+from app.modules.addresses.folding import fold_text  # noqa: E402
+from app.modules.addresses.fuzzy import TrigramIndex  # noqa: E402
+from app.modules.addresses.models import Address  # noqa: E402
+from app.modules.addresses.suggest import (  # noqa: E402
+    SCAN_LIMIT, PrefixIndex,
+)
+
+
+FIRST = ["Jan", "Anna", "Łucja", "Piotr", "Zofia", "Jerzy", "Ewa"]
+LAST = [
+    "Kowalski", "Kowalska", "Nowak", "Wiśniewski", "Wójcik", "Kamiński",
+    "Lewandowski", "Zieliński", "Szymański", "Woźniak", "Dąbrowski",
+]
+STREETS = ["Lipowa", "Długa", "Krakowskie Przedmieście", "Ogrodowa"]
+CITIES = ["Lublin", "Świdnik", "Łęczna", "Puławy", "Chełm"]
+
+
+def typo(rng, word):
+    """``word`` with one character dropped, doubled or swapped."""
+    i = rng.randrange(len(word))
+    edit = rng.randrange(3)
+    if edit == 0:
+        return word[:i] + word[i + 1:]
+    if edit == 1:
+        return word[:i] + word[i] + word[i:]
+    j = min(i + 1, len(word) - 1)
+    chars = list(word)
+    chars[i], chars[j] = chars[j], chars[i]
+    return "".join(chars)
+
+
+def test_fuzzy_top_k_matches_full_ranking():
+    rng = random.Random(5)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        db.execute(delete(Address))
+        db.execute(insert(Address), [
+            {
+                "first_name": rng.choice(FIRST),
+                "last_name": rng.choice(LAST) + rng.choice(["", "ak", "e"]),
+                "street": f"{rng.choice(STREETS)} {i % 50}",
+                "city": rng.choice(CITIES),
+                "postal_code": "20-001",
+                "label_marked": False,
+            }
+            for i in range(2000)
+        ])
+        db.commit()
+        index = TrigramIndex()
+        index.build(db)
+        for _ in range(150):
+            words = rng.sample(FIRST + LAST + CITIES, rng.randint(1, 3))
+            q = " ".join(typo(rng, w) if rng.random() < 0.7 else w
+                         for w in words)
+            full = index.search(db, q)
+            for limit in (1, 7, 50):
+                assert index.search(db, q, limit=limit) == full[:limit], (
+                    q, limit
+                )
+    finally:
+        db.close()
+
+
+def brute_top(counts, prefix, limit):
+    folded = fold_text(prefix) or ""
+    matches = sorted(
+        (-n, v) for v, n in counts.items()
+        if (fold_text(v) or "").startswith(folded)
+    )
+    return [(v, -n) for n, v in matches[:limit]]
+
+
+def test_suggest_top_k_follows_edits():
+    # Enough values that the empty and one-letter prefixes are answered
+    # from the precomputed rankings, which edits update in place
+    rng = random.Random(11)
+    letters = "abł"
+    values = sorted({
+        "".join(rng.choice(letters) for _ in range(rng.randint(1, 9)))
+        for _ in range(SCAN_LIMIT * 8)
+    })
+    counts = {v: rng.randint(1, 4) for v in values}
+    index = PrefixIndex()
+    index.load(counts)
+    assert sum(v.startswith("a") for v in values) > SCAN_LIMIT
+    prefixes = ["", "a", "Ł", "ab", "bl", "aaa"]
+    for step in range(2000):
+        value = rng.choice(values)
+        if rng.random() < 0.5:
+            index.add(value)
+            counts[value] = counts.get(value, 0) + 1
+        elif value in counts:
+            index.discard(value)
+            counts[value] -= 1
+            if not counts[value]:
+                del counts[value]
+        if step % 100 == 0:
+            for prefix in prefixes:
+                expected = brute_top(counts, prefix, 50)
+                for limit in (1, 10, 50):
+                    got = index.top(prefix, limit)
+                    assert got == expected[:limit], (step, prefix, limit)
+
+
+def main():
+    try:
+        for name, test in sorted(globals().items()):
+            if name.startswith("test_") and callable(test):
+                test()
+                print(f"{name}: ok")
+    finally:
+        engine.dispose()
+        shutil.rmtree(_tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
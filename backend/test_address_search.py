@@ -0,0 +1,173 @@
+"""
+Behaviour checks for address search.
+
+Runs against a throwaway SQLite database, never the app database.
+
+Usage:
+    python test_address_search.py
+"""
+
+import json
+import os
+import shutil
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="werbisci-test-")
+os.environ["SQLITE_DB_PATH"] = os.path.join(_tmp, "test.db")
+
+from sqlalchemy import delete, text, update  # noqa: E402
+
+from app.core.db import Base, SessionLocal, engine  # noqa: E402
+from app.modules.addresses.models import Address  # noqa: E402
+from app.modules.addresses.repositories import (  # noqa: E402
+    AddressRepository,
+)
+from app.modules.addresses.search_index import (  # noqa: E402
+    ensure_search_index,
+)
+from app.modules.addresses.services import AddressService  # noqa: E402
+
+
+ADDRESSES = [
+    ("Anna", "Kowalska", "Lipowa 10", "Lublin", "20-001"),
+    ("Piotr", "Nowak", "Długa 3", "Świdnik", "21-040"),
+    ("Jerzy", "Żółw", "Ogrodowa 7", "Łęczna", "21-010"),
+]
+
+
+def fresh_db():
+    Base.metadata.create_all(bind=engine)
+    ensure_search_index(engine)
+    db = SessionLocal()
+    db.execute(delete(Address))
+    db.commit()
+    service = AddressService()
+    for first, last, street, city, postal in ADDRESSES:
+        service.create(
+            db, first_name=first, last_name=last, street=street,
+            apartment_no=None, city=city, postal_code=postal,
+        )
+    return db
+
+
+def last_names(db, q):
+    return sorted(a.last_name for a in AddressRepository().search(db, q=q))
+
+
+def test_index_follows_writes():
+    # The FTS table is external content kept in step by triggers, so
+    # every write path has to show up in the next search
+    db = fresh_db()
+    service = AddressService()
+    try:
+        ewa = service.create(
+            db, first_name="Ewa", last_name="Lis", street="Polna 5",
+            apartment_no=None, city="Chełm", postal_code="22-100",
+        )
+        assert last_names(db, "chelm") == ["Lis"]
+        service.update(db, ewa, city="Zamość")
+        assert last_names(db, "chelm") == []
+        assert last_names(db, "zamosc") == ["Lis"]
+        # Statement-level UPDATE, bypassing the ORM
+        db.execute(update(Address).where(Address.id == ewa.id).values(
+            city="Puławy", city_folded="pulawy"
+        ))
+        db.commit()
+        assert last_names(db, "zamosc") == []
+        assert last_names(db, "pulawy") == ["Lis"]
+        service.delete(db, ewa.id)
+        assert last_names(db, "pulawy") == []
+        assert last_names(db, "lublin") == ["Kowalska"]
+    finally:
+        db.close()
+
+
+def test_index_rebuilt_when_trigger_missing():
+    db = fresh_db()
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("DROP TRIGGER addresses_fts_ai"))
+        AddressService().create(
+            db, first_name="Ewa", last_name="Lis", street="Polna 5",
+            apartment_no=None, city="Chełm", postal_code="22-100",
+        )
+        assert last_names(db, "chelm") == []
+        db.close()
+        # Startup recreates the trigger and rebuilds what it missed
+        ensure_search_index(engine)
+        db = SessionLocal()
+        assert last_names(db, "chelm") == ["Lis"]
+    finally:
+        db.close()
+
+
+def cached_last_names(db, q):
+    body = AddressService().search_json(db, q=q)
+    return sorted(row["last_name"] for row in json.loads(body))
+
+
+def test_cached_results_keep_phrase_spacing():
+    # Spacing between terms is irrelevant, inside a phrase it is not, so
+    # the result cache must not share those entries
+    db = fresh_db()
+    try:
+        assert cached_last_names(db, '"lipowa 10"') == ["Kowalska"]
+        assert cached_last_names(db, '"lipowa  10"') == []
+        assert cached_last_names(db, " lipowa   10 ") == ["Kowalska"]
+        assert cached_last_names(db, "lipowa 10") == ["Kowalska"]
+    finally:
+        db.close()
+
+
+def test_query_language():
+    db = fresh_db()
+    try:
+        assert last_names(db, "city:lublin") == ["Kowalska"]
+        assert last_names(db, "miasto:ŁĘCZNA") == ["Żółw"]
+        assert last_names(db, "postal:21-*") == ["Nowak", "Żółw"]
+        assert last_names(db, "last:kow*") == ["Kowalska"]
+        # Field values are exact unless starred
+        assert last_names(db, "last:kow") == []
+        assert last_names(db, "-city:lublin") == ["Nowak", "Żółw"]
+        assert last_names(db, "postal:21-* -nowak") == ["Żółw"]
+        assert last_names(db, '"dluga 3"') == ["Nowak"]
+        # Unknown qualifiers are searched as typed text
+        assert last_names(db, "foo:bar") == []
+        repo = AddressRepository()
+        found = repo.search(db, q="anna", fields={"city": "Lub*"})
+        assert [a.last_name for a in found] == ["Kowalska"]
+    finally:
+        db.close()
+
+
+def test_short_terms_match_inside_words():
+    # One- and two-character terms are below the trigram index and fall
+    # back to a substring match, like the search before the index
+    db = fresh_db()
+    try:
+        assert last_names(db, "a") == ["Kowalska", "Nowak", "Żółw"]
+        assert last_names(db, "ak") == ["Nowak"]
+        assert last_names(db, "wa") == ["Kowalska", "Nowak", "Żółw"]
+        assert last_names(db, "10") == ["Kowalska", "Żółw"]  # 21-010
+        assert last_names(db, "3") == ["Nowak"]
+        assert last_names(db, "ol") == ["Żółw"]  # folded "zolw"
+        assert last_names(db, "-ka") == ["Nowak", "Żółw"]
+        # LIKE wildcards in the term are literal
+        assert last_names(db, "1%") == []
+    finally:
+        db.close()
+
+
+def main():
+    try:
+        for name, test in sorted(globals().items()):
+            if name.startswith("test_") and callable(test):
+                test()
+                print(f"{name}: ok")
+    finally:
+        engine.dispose()
+        shutil.rmtree(_tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()